@@ -1,136 +1,903 @@
 import os
 import json
-from pydantic import BaseModel, Field
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+import asyncio
+import threading
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from langchain_core.exceptions import OutputParserException
+from langchain_core.outputs import ChatGeneration
 from auth_utils import GEMINI_API_KEY
 from youtube_transcript_api import YouTubeTranscriptApi
+from transcript_cache import transcript_cache, TRANSCRIPT_UNAVAILABLE_PREFIX
+from llm_cache import llm_cache, make_cache_key
+from transcript_chunks import estimate_tokens, format_timestamp, chunk_snippets, select_within_budget
+from metrics import track_stage, LLM_TOKENS, LLM_ROUTED_GENERATIONS, LLM_VALIDATION_FAILURES
+from generation_engine import GenerationEngine, GeminiProvider
+from generation_config import resolve_generation_mode, MODEL_TIERS, GENERATION_MODEL, MODEL_ROUTE
 
 # -----------------------------------------------------------------
 # 1. AI Output Schema
 # -----------------------------------------------------------------
+# Every model answer is validated against these schemas, semantic rules
+# included (see 3c. Model Routing); an answer that breaks one is repaired
+# or escalated, never saved.
+
+def _require_distinct(values: list[str], what: str):
+    normalized = [value.strip().casefold() for value in values]
+    if len(set(normalized)) != len(normalized):
+        raise ValueError(f"{what} must be distinct")
 
 class QuizQuestion(BaseModel):
     """Schema for a single multiple-choice question."""
-    question: str = Field(description="The question text.")
-    options: list[str] = Field(description="List of 4 possible answers.")
-    correct: int = Field(description="The 0-based index of the correct option (0, 1, 2, or 3).")
-    explaination: str = Field(description="A brief explanation of the correct answer.")
+    question: str = Field(min_length=1, description="The question text.")
+    options: list[str] = Field(min_length=4, max_length=4, description="List of 4 possible answers.")
+    correct: int = Field(ge=0, le=3, description="The 0-based index of the correct option (0, 1, 2, or 3).")
+    explaination: str = Field(min_length=1, description="A brief explanation of the correct answer.")
+
+    @model_validator(mode="after")
+    def check_options(self):
+        if any(not option.strip() for option in self.options):
+            raise ValueError("options must not be blank")
+        _require_distinct(self.options, "options")
+        return self
     
 class GeneratedQuiz(BaseModel):
     """The final quiz structure the AI must output."""
-    video_title: str = Field(description="The title of the YouTube video.")
-    quiz: list[QuizQuestion] = Field(description="A list of 3 high-quality, knowledge-based quiz questions.")
+    video_title: str = Field(min_length=1, description="The title of the YouTube video.")
+    quiz: list[QuizQuestion] = Field(
+        min_length=3, max_length=3, description="A list of 3 high-quality, knowledge-based quiz questions."
+    )
+
+    @model_validator(mode="after")
+    def check_questions(self):
+        _require_distinct([item.question for item in self.quiz], "quiz questions")
+        return self
 
 class FlashcardItem(BaseModel):
     """Schema for a single flashcard (Front: Concept, Back: Definition)."""
-    front: str = Field(description="Question on key concept or term from the video. ")
-    back: str = Field(description="The definition or explanation of the concept.")
+    front: str = Field(min_length=1, description="Question on key concept or term from the video. ")
+    back: str = Field(min_length=1, description="The definition or explanation of the concept.")
 
 class GeneratedFlashcards(BaseModel):
     """The final flashcard structure the AI must output."""
-    video_title: str = Field(description="The title of the YouTube video.")
-    flashcards: list[FlashcardItem] = Field(description="A list of 5 key-concept flashcards.")
+    video_title: str = Field(min_length=1, description="The title of the YouTube video.")
+    flashcards: list[FlashcardItem] = Field(min_length=5, max_length=5, description="A list of 5 key-concept flashcards.")
+
+    @model_validator(mode="after")
+    def check_fronts(self):
+        _require_distinct([item.front for item in self.flashcards], "flashcard fronts")
+        return self
+
+class GeneratedCourseContent(BaseModel):
+    """Quiz and flashcards together, for combined (single-call) generation."""
+    video_title: str = Field(min_length=1, description="The title of the YouTube video.")
+    quiz: list[QuizQuestion] = Field(
+        min_length=3, max_length=3, description="A list of 3 high-quality, knowledge-based quiz questions."
+    )
+    flashcards: list[FlashcardItem] = Field(min_length=5, max_length=5, description="A list of 5 key-concept flashcards.")
+
+    @model_validator(mode="after")
+    def check_items(self):
+        _require_distinct([item.question for item in self.quiz], "quiz questions")
+        _require_distinct([item.front for item in self.flashcards], "flashcard fronts")
+        return self
+
+# --- Map step schemas (one transcript segment of a long video) ---
+
+class QuizCandidates(BaseModel):
+    """Candidate questions generated from a single transcript segment."""
+    video_title: str = Field(description="Best guess at the title of the YouTube video.")
+    quiz: list[QuizQuestion] = Field(description="Candidate multiple-choice questions drawn from this segment.")
+
+class FlashcardCandidates(BaseModel):
+    """Candidate flashcards generated from a single transcript segment."""
+    video_title: str = Field(description="Best guess at the title of the YouTube video.")
+    flashcards: list[FlashcardItem] = Field(description="Candidate key-concept flashcards drawn from this segment.")
 
 # -----------------------------------------------------------------
 # 2. Pipeline Utility Functions
 # -----------------------------------------------------------------
 
-def get_transcript(youtube_id: str) -> str:
-    """Fetches the transcript for a given YouTube video ID."""
+TRANSCRIPT_LANGUAGES = ['en', 'hi']
+
+def load_transcript(youtube_id: str) -> tuple[str, list[dict] | None]:
+    """
+    Fetches the transcript for a given YouTube video ID, serving repeats from
+    the transcript cache. Returns the joined text and the timestamped
+    snippets ({"text", "start", "duration"}), or None when they're unknown.
+    """
+    cached = transcript_cache.get(youtube_id, TRANSCRIPT_LANGUAGES)
+    if cached is not None:
+        return cached["text"], cached["snippets"]
+
     try:
         yt_api = YouTubeTranscriptApi()
-        transcript_list = yt_api.fetch(youtube_id, languages=['en', 'hi'])
+        transcript_list = yt_api.fetch(youtube_id, languages=TRANSCRIPT_LANGUAGES)
+        snippets = [
+            {"text": item.text, "start": item.start, "duration": item.duration}
+            for item in transcript_list.snippets
+        ]
         # Concatenate all lines into a single string
-        transcript = " ".join([item.text for item in transcript_list.snippets])
-        return transcript
+        transcript = " ".join([item["text"] for item in snippets])
     except Exception as e:
-        # Fallback if transcript isn't available
-        return f"Transcript not available. Use the video ID and topic to generate the quiz. Error: {e}"
+        # Fallback if transcript isn't available (never cached, so the next request retries YouTube)
+        return f"{TRANSCRIPT_UNAVAILABLE_PREFIX}. Use the video ID and topic to generate the quiz. Error: {e}", None
+
+    try:
+        transcript_cache.put(youtube_id, transcript_list.language_code, transcript, snippets)
+    except Exception as e:
+        # A cache write failure must not fail the generation itself
+        print(f"Transcript cache write failed for {youtube_id}: {e}")
+    return transcript, snippets
+
+def get_transcript(youtube_id: str) -> str:
+    """Fetches the transcript text for a given YouTube video ID."""
+    return load_transcript(youtube_id)[0]
+
+# -----------------------------------------------------------------
+# 3. LangChain Agents (Content Type Registry)
+# -----------------------------------------------------------------
+
+QUIZ_SYSTEM_PROMPT = (
+    "You are an expert educational content generator. Your task is to analyze the provided video content (transcript/topic) "
+    "and generate exactly **3 difficult, knowledge-based multiple-choice questions** that serve as a 'Mastery Gate'. "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+FLASHCARD_SYSTEM_PROMPT = (
+    "You are an expert educational content generator. Your task is to analyze the provided video content (transcript/topic) "
+    "and generate exactly **5 key concept flashcards**. Each flashcard must have a clear 'front' (term) and 'back' (definition). "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+# Every content type is an output schema plus a system prompt. All registered
+# types are generated concurrently from one transcript, so adding a new one
+# (e.g. summaries, glossaries) does not add to the pipeline's wall-clock time.
+CONTENT_TYPES: dict[str, tuple[type[BaseModel], str]] = {
+    "quiz": (GeneratedQuiz, QUIZ_SYSTEM_PROMPT),
+    "flashcards": (GeneratedFlashcards, FLASHCARD_SYSTEM_PROMPT),
+}
+
+# The list field of each content type that astream_content() emits item by item
+STREAM_ITEM_FIELDS: dict[str, str] = {
+    "quiz": "quiz",
+    "flashcards": "flashcards",
+}
+
+COMBINED_SYSTEM_PROMPT = (
+    "You are an expert educational content generator. Your task is to analyze the provided video content (transcript/topic) "
+    "and generate both exactly **3 difficult, knowledge-based multiple-choice questions** that serve as a 'Mastery Gate' "
+    "and exactly **5 key concept flashcards**, each with a clear 'front' (term) and 'back' (definition). "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+# Content types that "combined" mode (see generation_config.py) asks for in a single call
+COMBINED_CONTENT_TYPES = ("quiz", "flashcards")
+
+# Upper bound on a single chain call, in seconds
+CHAIN_TIMEOUT_SECONDS = float(os.getenv("CHAIN_TIMEOUT_SECONDS", "120"))
+
+# The engine holds the prebuilt prompts and warm model clients (see
+# generation_engine.py). It is created on first use; main.py warms it at startup.
+_engine: GenerationEngine | None = None
+_engine_lock = threading.Lock()
+
+def registered_prompts() -> list[tuple[type[BaseModel], str]]:
+    """Every (schema, system prompt) pair the pipeline sends."""
+    prompts = list(CONTENT_TYPES.values())
+    for content_type, spec in MAP_REDUCE_TYPES.items():
+        prompts += [spec["map"], (CONTENT_TYPES[content_type][0], spec["reduce_prompt"])]
+    prompts.append((GeneratedCourseContent, COMBINED_SYSTEM_PROMPT))
+    return prompts
+
+def get_engine() -> GenerationEngine:
+    """The process-wide generation engine, with every pipeline prompt registered."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            engine = GenerationEngine(GeminiProvider(GEMINI_API_KEY))
+            for schema, system_prompt in registered_prompts():
+                engine.register(schema, system_prompt)
+            _engine = engine
+        return _engine
+
+def build_prompt_parts(schema: type[BaseModel], system_prompt: str, model: str = GENERATION_MODEL):
+    """The (prompt, llm, parser) for an output schema and system prompt."""
+    engine = get_engine()
+    spec = engine.spec(schema, system_prompt)
+    return spec.prompt, engine.chat_model(model), spec.parser
+
+def build_prompt_chain(schema: type[BaseModel], system_prompt: str, model: str = GENERATION_MODEL):
+    """Builds a `prompt | llm | parser` chain for an output schema and system prompt."""
+    prompt, llm, parser = build_prompt_parts(schema, system_prompt, model)
+    return prompt | llm | parser
+
+def build_chain(content_type: str, model: str = GENERATION_MODEL):
+    """Builds the chain for a registered content type."""
+    return build_prompt_chain(*CONTENT_TYPES[content_type], model=model)
+
+# -----------------------------------------------------------------
+# 3b. Response Cache (temperature is 0.0, so identical prompts give identical answers)
+# -----------------------------------------------------------------
+
+def prompt_cache_key(schema: type[BaseModel], system_prompt: str, content: str) -> str:
+    """Hashes everything that determines a chain's output."""
+    format_instructions = get_engine().spec(schema, system_prompt).format_instructions
+    return make_cache_key(MODEL_ROUTE, system_prompt, format_instructions, content)
+
+def response_cache_key(content_type: str, transcript_text: str) -> str:
+    """Cache key of a registered content type's chain for a transcript."""
+    return prompt_cache_key(*CONTENT_TYPES[content_type], transcript_text)
+
+def _is_cacheable(transcript_text: str) -> bool:
+    # Output generated from the "no transcript" fallback is a guess, not worth keeping
+    return not transcript_text.startswith(TRANSCRIPT_UNAVAILABLE_PREFIX)
 
 # -----------------------------------------------------------------
-# 3. LangChain Agents (Adding Flashcard Generator)
+# 3c. Model Routing (cheap model first, escalate only on invalid output)
 # -----------------------------------------------------------------
 
-def generate_quiz_content(youtube_id: str) -> dict:
+# Repair prompts sent to a model whose answer failed validation, before
+# moving on to the next tier
+REPAIR_ATTEMPTS = int(os.getenv("GENERATION_REPAIR_ATTEMPTS", "1"))
+
+def describe_problems(error: Exception) -> str:
+    """Validation (or JSON parsing) errors as a short bullet list for the repair prompt."""
+    if isinstance(error, ValidationError):
+        return "\n".join(
+            f"- {'.'.join(str(part) for part in item['loc']) or 'output'}: {item['msg']}"
+            for item in error.errors()[:20]
+        )
+    return f"- {str(error).splitlines()[0] if str(error) else error.__class__.__name__}"
+
+def _count_tokens(label: str, model: str, input_text: str, message):
+    # Provider-reported usage when available, else the same estimate used for chunking
+    usage = getattr(message, "usage_metadata", None) or {}
+    LLM_TOKENS.labels(model, label, "input").inc(usage.get("input_tokens") or estimate_tokens(input_text))
+    LLM_TOKENS.labels(model, label, "output").inc(
+        usage.get("output_tokens") or estimate_tokens(str(message.content))
+    )
+
+async def _call_model(label: str, model: str, prompt, llm, parser, inputs: dict, timeout: float, on_partial=None):
     """
-    Core function to orchestrate content generation using Gemini and LangChain.
+    One LLM call bounded by `timeout` seconds; returns the raw message. With
+    `on_partial` the output is streamed and each partial JSON parse is passed on.
     """
+    message = None
 
-    # Use a powerful model for complex JSON generation
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.0)
-    parser = JsonOutputParser(pydantic_object=GeneratedQuiz)
+    async def consume():
+        nonlocal message
+        if on_partial is None:
+            message = await (prompt | llm).ainvoke(inputs)
+            return
+        async for chunk in (prompt | llm).astream(inputs):
+            message = chunk if message is None else message + chunk
+            # Re-parsing the whole prefix is cheap: the outputs are a few KB
+            on_partial(parser.parse_result([ChatGeneration(message=message)], partial=True))
 
-    # --- Data Retrieval ---
-    transcript_text = get_transcript(youtube_id)
-    
-    # --- System Prompt ---
-    system_prompt = (
-        "You are an expert educational content generator. Your task is to analyze the provided video content (transcript/topic) "
-        "and generate exactly **3 difficult, knowledge-based multiple-choice questions** that serve as a 'Mastery Gate'. "
-        "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
-    )
-    
-    # --- Template ---
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_prompt),
-            ("user", "Video Content: {content}"),
-            ("user", "Output Format: {format_instructions}"),
-        ]
-    ).partial(format_instructions=parser.get_format_instructions())
-    
-    # --- Chain Execution ---
-    chain = prompt | llm | parser
+    try:
+        with track_stage("llm", label):
+            await asyncio.wait_for(consume(), timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"'{label}' generation on {model} timed out after {timeout}s")
+    if message is None:
+        raise RuntimeError(f"'{label}' generation on {model} returned no output")
 
-    # NOTE: In a real app, we'd handle the response if parsing failed.
-    response = chain.invoke({"content": transcript_text})
+    _count_tokens(label, model, prompt.format(**inputs), message)
+    return message
 
-    # The output is already a Python dictionary matching the GeneratedQuiz schema
-    return response 
+async def _generate_routed(
+    label: str,
+    schema: type[BaseModel],
+    system_prompt: str,
+    content: str,
+    timeout: float,
+    on_partial=None,
+    on_discard=None,
+) -> dict:
+    """
+    Generates `schema` output, trying MODEL_TIERS cheapest first. Each answer
+    is validated strictly against `schema`; an invalid one gets up to
+    REPAIR_ATTEMPTS repair prompts on the same model before the next tier is
+    tried, and a tier that errors or times out is skipped. `on_discard` is
+    called whenever streamed output is thrown away.
 
-def generate_flashcard_content(youtube_id: str) -> dict:
+    Returns the validated output, with the model that produced it under "generated_by".
     """
-    Orchestrates content generation for flashcards using Gemini and LangChain.
+    engine = get_engine()
+    spec = engine.spec(schema, system_prompt)
+    parser = spec.parser
+    problems = []
+    for tier, model in enumerate(MODEL_TIERS):
+        prompt, llm = spec.prompt, engine.chat_model(model)
+        inputs = {"content": content}
+        for attempt in range(REPAIR_ATTEMPTS + 1):
+            try:
+                message = await _call_model(label, model, prompt, llm, parser, inputs, timeout, on_partial)
+            except Exception as e:
+                problems.append(f"{model}: {str(e) or e.__class__.__name__}")
+                if on_discard:
+                    on_discard()
+                break
+
+            try:
+                with track_stage("parse", label):
+                    output = schema.model_validate(parser.invoke(message)).model_dump()
+            except (OutputParserException, ValidationError) as e:
+                errors = describe_problems(e)
+                LLM_VALIDATION_FAILURES.labels(label, model).inc()
+                problems.append(f"{model}: {errors}")
+                if on_discard:
+                    on_discard()
+                prompt = spec.repair_prompt
+                inputs = {"content": content, "previous": str(message.content), "errors": errors}
+                continue
+
+            outcome = "escalated" if tier else ("repaired" if attempt else "first_try")
+            LLM_ROUTED_GENERATIONS.labels(label, model, outcome).inc()
+            output["generated_by"] = model
+            return output
+
+    raise RuntimeError(f"'{label}' produced no valid output on any model ({'; '.join(problems)})")
+
+# -----------------------------------------------------------------
+# 3d. Long Transcripts (Map-Reduce)
+# -----------------------------------------------------------------
+
+# Transcripts above this size are split into chunks instead of sent whole
+MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("MAP_REDUCE_THRESHOLD_TOKENS", "12000"))
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "4000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "200"))
+# Total transcript tokens sent across all map calls of one content type
+MAP_TOKEN_BUDGET = int(os.getenv("MAP_TOKEN_BUDGET", "32000"))
+# Map calls in flight at once, across all content types of one video
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+
+QUIZ_MAP_PROMPT = (
+    "You are an expert educational content generator. You are given ONE SEGMENT of a longer video transcript, "
+    "prefixed with its timestamp range. Generate up to **2 difficult, knowledge-based multiple-choice questions** "
+    "that can be answered from this segment alone. "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+QUIZ_REDUCE_PROMPT = (
+    "You are an expert educational content generator. You are given candidate multiple-choice questions, each generated "
+    "from a different timestamped segment of the same video, plus guesses at the video's title. Select exactly **3** "
+    "questions that together best serve as a 'Mastery Gate' for the whole video: prefer difficult questions, cover "
+    "different segments and never repeat a concept. You may lightly edit wording but keep each answer correct. "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+FLASHCARD_MAP_PROMPT = (
+    "You are an expert educational content generator. You are given ONE SEGMENT of a longer video transcript, "
+    "prefixed with its timestamp range. Generate up to **3 key concept flashcards** from this segment. "
+    "Each flashcard must have a clear 'front' (term) and 'back' (definition). "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+FLASHCARD_REDUCE_PROMPT = (
+    "You are an expert educational content generator. You are given candidate flashcards, each generated from a "
+    "different timestamped segment of the same video, plus guesses at the video's title. Select exactly **5** "
+    "flashcards covering the most important, distinct concepts of the whole video, merging near-duplicates. "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+# Content types that support map-reduce: the per-segment schema and prompt,
+# the prompt that picks the final set, the list field, its final size and
+# the item field that must be distinct.
+MAP_REDUCE_TYPES: dict[str, dict] = {
+    "quiz": {
+        "map": (QuizCandidates, QUIZ_MAP_PROMPT),
+        "reduce_prompt": QUIZ_REDUCE_PROMPT,
+        "items": "quiz",
+        "count": 3,
+        "distinct": "question",
+    },
+    "flashcards": {
+        "map": (FlashcardCandidates, FLASHCARD_MAP_PROMPT),
+        "reduce_prompt": FLASHCARD_REDUCE_PROMPT,
+        "items": "flashcards",
+        "count": 5,
+        "distinct": "front",
+    },
+}
+
+def plan_chunks(transcript_text: str, snippets: list[dict] | None) -> list[dict] | None:
+    """Returns the chunks to map over, or None when the transcript fits one prompt."""
+    if not snippets or estimate_tokens(transcript_text) <= MAP_REDUCE_THRESHOLD_TOKENS:
+        return None
+    chunks = chunk_snippets(snippets, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS)
+    return select_within_budget(chunks, MAP_TOKEN_BUDGET)
+
+def _fallback_reduce(content_type: str, titles: list[str], candidates: list[dict]) -> dict:
     """
-    os.environ["GEMINI_API_KEY"] = GEMINI_API_KEY
+    Deterministic reduce used if the reduce call fails: round-robin across
+    segments, skipping repeats. The result is validated against the final
+    schema like any model answer; too few distinct candidates fail the
+    content type rather than saving a short set.
+    """
+    spec = MAP_REDUCE_TYPES[content_type]
+    by_segment: dict[str, list[dict]] = {}
+    for candidate in candidates:
+        by_segment.setdefault(candidate["segment"], []).append(candidate)
 
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-pro", temperature=0.0)
-    parser = JsonOutputParser(pydantic_object=GeneratedFlashcards)
-    transcript_text = get_transcript(youtube_id)
-    
-    system_prompt = (
-        "You are an expert educational content generator. Your task is to analyze the provided video content (transcript/topic) "
-        "and generate exactly **5 key concept flashcards**. Each flashcard must have a clear 'front' (term) and 'back' (definition). "
-        "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
-    )
-    
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", system_prompt),
-            ("user", "Video Content: {content}"),
-            ("user", "Output Format: {format_instructions}"),
-        ]
-    ).partial(format_instructions=parser.get_format_instructions())
-    
-    chain = prompt | llm | parser
+    picked, seen = [], set()
+    queues = list(by_segment.values())
+    while len(picked) < spec["count"] and any(queues):
+        for queue in queues:
+            if queue and len(picked) < spec["count"]:
+                item = dict(queue.pop(0))
+                item.pop("segment")
+                key = item[spec["distinct"]].strip().casefold()
+                if key not in seen:
+                    seen.add(key)
+                    picked.append(item)
 
-    response = chain.invoke({"content": transcript_text})
-    return response
+    video_title = max(set(titles), key=titles.count) if titles else ""
+    final_schema = CONTENT_TYPES[content_type][0]
+    try:
+        output = final_schema.model_validate({"video_title": video_title, spec["items"]: picked}).model_dump()
+    except ValidationError as e:
+        raise RuntimeError(f"'{content_type}' round-robin fallback is not valid ({'; '.join(describe_problems(e).splitlines())})") from e
+    output["generated_by"] = "round-robin"
+    return output
+
+async def _map_chunks(
+    content_type: str,
+    chunks: list[dict],
+    semaphore: asyncio.Semaphore,
+    timeout: float,
+    force_refresh: bool,
+) -> tuple[list[str], list[dict]]:
+    """The map step: generates candidates per chunk in parallel. Returns (title guesses, candidates)."""
+    spec = MAP_REDUCE_TYPES[content_type]
+    map_schema, map_prompt = spec["map"]
+
+    async def map_chunk(chunk: dict) -> dict:
+        segment = f"{format_timestamp(chunk['start'])}-{format_timestamp(chunk['end'])}"
+        async with semaphore:
+            output = await _run_prompt(
+                f"{content_type}:map", map_schema, map_prompt,
+                f"[Segment {segment}] {chunk['text']}", timeout, force_refresh
+            )
+        return {"segment": segment, "output": output}
+
+    outcomes = await asyncio.gather(*(map_chunk(chunk) for chunk in chunks), return_exceptions=True)
+
+    titles, candidates = [], []
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            print(f"AI Generation Warning ({content_type}:map): {outcome}")
+            continue
+        output = outcome["output"]
+        if output.get("video_title"):
+            titles.append(output["video_title"])
+        for item in output.get(spec["items"], []):
+            candidates.append({"segment": outcome["segment"], **item})
+
+    if not candidates:
+        raise RuntimeError(f"'{content_type}' map step produced no candidates")
+    return titles, candidates
+
+def _reduce_input(titles: list[str], candidates: list[dict]) -> str:
+    return json.dumps({"video_title_guesses": titles, "candidates": candidates})
+
+async def _map_reduce(
+    content_type: str,
+    chunks: list[dict],
+    semaphore: asyncio.Semaphore,
+    timeout: float,
+    force_refresh: bool,
+) -> dict:
+    """Generates candidates per chunk in parallel, then reduces them to the final set."""
+    spec = MAP_REDUCE_TYPES[content_type]
+    titles, candidates = await _map_chunks(content_type, chunks, semaphore, timeout, force_refresh)
+
+    final_schema = CONTENT_TYPES[content_type][0]
+    try:
+        return await _run_prompt(
+            f"{content_type}:reduce", final_schema, spec["reduce_prompt"],
+            _reduce_input(titles, candidates), timeout, force_refresh
+        )
+    except Exception as e:
+        print(f"AI Generation Warning ({content_type}:reduce): {e}. Falling back to round-robin selection.")
+        return _fallback_reduce(content_type, titles, candidates)
 
 # -----------------------------------------------------------------
 # 4. Agent Orchestrator (Combine all generation steps)
 # -----------------------------------------------------------------
 
-def generate_all_content(youtube_id: str) -> tuple[dict, dict]:
+async def _run_prompt(
+    label: str,
+    schema: type[BaseModel],
+    system_prompt: str,
+    content: str,
+    timeout: float,
+    force_refresh: bool = False,
+) -> dict:
+    """Runs one chain asynchronously through the response cache, bounded by `timeout` seconds."""
+    cacheable = _is_cacheable(content)
+    key = prompt_cache_key(schema, system_prompt, content) if cacheable else None
+    if cacheable and not force_refresh:
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            return cached
+
+    response = await _generate_routed(label, schema, system_prompt, content, timeout)
+
+    if cacheable:
+        await asyncio.to_thread(llm_cache.put, key, response["generated_by"], label, response)
+    return response
+
+async def _run_chain(content_type: str, transcript_text: str, timeout: float, force_refresh: bool = False) -> dict:
+    """Runs a registered content type's chain over the whole transcript."""
+    schema, system_prompt = CONTENT_TYPES[content_type]
+    return await _run_prompt(content_type, schema, system_prompt, transcript_text, timeout, force_refresh)
+
+def _combined_types(content_types: list[str], chunks: list[dict] | None, mode: str | None) -> list[str]:
+    """The content types a single combined call should generate ([] to run each type on its own)."""
+    if resolve_generation_mode(mode) != "combined" or chunks:
+        return []
+    combined = [name for name in content_types if name in COMBINED_CONTENT_TYPES]
+    return combined if len(combined) > 1 else []
+
+def _split_combined(output: dict, content_types: list[str]) -> tuple[dict, dict]:
+    """Splits a combined output into per-type outputs, validating each against its own schema."""
+    results, errors = {}, {}
+    for name in content_types:
+        schema = CONTENT_TYPES[name][0]
+        try:
+            part = {field: output.get(field) for field in schema.model_fields}
+            results[name] = schema.model_validate(part).model_dump()
+            results[name]["generated_by"] = output.get("generated_by")
+        except ValidationError as e:
+            errors[name] = f"combined output failed validation ({e.error_count()} error(s))"
+    return results, errors
+
+async def _run_combined(content_types: list[str], transcript_text: str, timeout: float, force_refresh: bool) -> tuple[dict, dict]:
+    """
+    Generates several content types from one LLM call. A part that fails
+    validation is regenerated by its own chain, so it can't sink the others.
+    """
+    try:
+        output = await _run_prompt(
+            "combined", GeneratedCourseContent, COMBINED_SYSTEM_PROMPT, transcript_text, timeout, force_refresh
+        )
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+        return {}, {name: error for name in content_types}
+
+    results, invalid = _split_combined(output, content_types)
+    if not invalid:
+        return results, {}
+
+    for name, error in invalid.items():
+        print(f"AI Generation Warning ({name}): {error}. Regenerating it on its own.")
+    retried = list(invalid)
+    outcomes = await asyncio.gather(
+        *(_run_chain(name, transcript_text, timeout, force_refresh) for name in retried), return_exceptions=True
+    )
+    errors = {}
+    for name, outcome in zip(retried, outcomes):
+        if isinstance(outcome, Exception):
+            errors[name] = str(outcome) or outcome.__class__.__name__
+        else:
+            results[name] = outcome
+    return results, errors
+
+async def agenerate_content(
+    youtube_id: str,
+    content_types: list[str] | None = None,
+    timeout: float = CHAIN_TIMEOUT_SECONDS,
+    force_refresh: bool = False,
+    mode: str | None = None,
+) -> tuple[dict, dict]:
+    """
+    Fetches the transcript once and runs every requested chain concurrently.
+    Long transcripts are chunked and map-reduced instead of sent whole.
+
+    Returns (results, errors), both keyed by content type. A chain that fails
+    or times out lands in `errors` without discarding the others' results.
+    `force_refresh` bypasses (and then overwrites) the LLM response cache.
+    `mode` overrides GENERATION_MODE ("separate" or "combined").
+    """
+    content_types = list(content_types or CONTENT_TYPES)
+
+    # The transcript fetch is blocking I/O, so keep it off the event loop
+    with track_stage("transcript"):
+        transcript_text, snippets = await asyncio.to_thread(load_transcript, youtube_id)
+    chunks = plan_chunks(transcript_text, snippets)
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+    combined = _combined_types(content_types, chunks, mode)
+    separate = [name for name in content_types if name not in combined]
+
+    def run(name: str):
+        if chunks and name in MAP_REDUCE_TYPES:
+            return _map_reduce(name, chunks, semaphore, timeout, force_refresh)
+        return _run_chain(name, transcript_text, timeout, force_refresh)
+
+    async def run_combined():
+        if not combined:
+            return {}, {}
+        return await _run_combined(combined, transcript_text, timeout, force_refresh)
+
+    (results, errors), *outcomes = await asyncio.gather(
+        run_combined(), *(run(name) for name in separate), return_exceptions=True
+    )
+    for name, outcome in zip(separate, outcomes):
+        if isinstance(outcome, Exception):
+            errors[name] = str(outcome) or outcome.__class__.__name__
+        else:
+            results[name] = outcome
+    return results, errors
+
+async def agenerate_all_content(
+    youtube_id: str,
+    timeout: float = CHAIN_TIMEOUT_SECONDS,
+    force_refresh: bool = False,
+    mode: str | None = None,
+) -> tuple[dict | None, dict | None]:
+    """
+    Runs the quiz and flashcard pipelines concurrently (or as one call in combined mode).
+
+    Either value may be None if its chain failed; raises only if both failed.
+    """
+    results, errors = await agenerate_content(youtube_id, ["quiz", "flashcards"], timeout, force_refresh, mode)
+    if not results:
+        raise RuntimeError(f"All generation chains failed: {errors}")
+    for name, error in errors.items():
+        print(f"AI Generation Warning ({name}): {error}")
+    return results.get("quiz"), results.get("flashcards")
+
+# -----------------------------------------------------------------
+# 4b. Streaming (items are emitted as soon as the model has written them)
+# -----------------------------------------------------------------
+
+async def _stream_prompt(
+    label: str,
+    schema: type[BaseModel],
+    system_prompt: str,
+    content: str,
+    timeout: float,
+    force_refresh: bool,
+    items_fields: list[str],
+    on_item,
+    on_reset,
+) -> dict:
+    """
+    Like _run_prompt, but streams the model's output and calls
+    on_item(field, index, item) for each element of the `items_fields` lists
+    as soon as the partial JSON holds it whole: once the next item (or a
+    later field) has started, or the output has ended. If an answer is
+    rejected by validation, on_reset(field) withdraws the items sent so far
+    and the repaired or escalated answer is streamed from index 0.
+    """
+    emitted = dict.fromkeys(items_fields, 0)
+
+    def emit_complete(partial, final: bool = False):
+        if not isinstance(partial, dict):
+            return
+        keys = list(partial)
+        for field in items_fields:
+            items = partial.get(field)
+            if not isinstance(items, list):
+                continue
+            closed = final or keys.index(field) < len(keys) - 1
+            complete = len(items) if closed else len(items) - 1
+            while emitted[field] < complete:
+                on_item(field, emitted[field], items[emitted[field]])
+                emitted[field] += 1
+
+    def discard():
+        for field, count in emitted.items():
+            if count:
+                on_reset(field)
+                emitted[field] = 0
+
+    cacheable = _is_cacheable(content)
+    key = prompt_cache_key(schema, system_prompt, content) if cacheable else None
+    if cacheable and not force_refresh:
+        cached = await asyncio.to_thread(llm_cache.get, key)
+        if cached is not None:
+            emit_complete(cached, final=True)
+            return cached
+
+    response = await _generate_routed(
+        label, schema, system_prompt, content, timeout, on_partial=emit_complete, on_discard=discard
+    )
+    emit_complete(response, final=True)
+
+    if cacheable:
+        await asyncio.to_thread(llm_cache.put, key, response["generated_by"], label, response)
+    return response
+
+async def _stream_content_type(
+    content_type: str,
+    transcript_text: str,
+    chunks: list[dict] | None,
+    semaphore: asyncio.Semaphore | None,
+    timeout: float,
+    force_refresh: bool,
+    on_item,
+    on_reset,
+) -> dict:
+    """Generates one content type, streaming its items. Long transcripts stream the reduce step."""
+    items_fields = [STREAM_ITEM_FIELDS[content_type]] if content_type in STREAM_ITEM_FIELDS else []
+
+    def item(field: str, index: int, value: dict):
+        on_item(content_type, index, value)
+
+    def reset(field: str):
+        on_reset(content_type)
+
+    if not (chunks and content_type in MAP_REDUCE_TYPES):
+        schema, system_prompt = CONTENT_TYPES[content_type]
+        return await _stream_prompt(
+            content_type, schema, system_prompt, transcript_text, timeout, force_refresh, items_fields, item, reset
+        )
+
+    spec = MAP_REDUCE_TYPES[content_type]
+    titles, candidates = await _map_chunks(content_type, chunks, semaphore, timeout, force_refresh)
+    try:
+        return await _stream_prompt(
+            f"{content_type}:reduce", CONTENT_TYPES[content_type][0], spec["reduce_prompt"],
+            _reduce_input(titles, candidates), timeout, force_refresh, items_fields, item, reset
+        )
+    except Exception as e:
+        print(f"AI Generation Warning ({content_type}:reduce): {e}. Falling back to round-robin selection.")
+        output = _fallback_reduce(content_type, titles, candidates)
+        for field in items_fields:
+            for index, value in enumerate(output.get(field) or []):
+                item(field, index, value)
+        return output
+
+async def _stream_combined(
+    content_types: list[str],
+    transcript_text: str,
+    timeout: float,
+    force_refresh: bool,
+    on_item,
+    on_reset,
+    on_outcome,
+):
+    """
+    Streams several content types from one combined call, reporting each
+    through on_outcome(content_type, output, error). A part that fails
+    validation is withdrawn and regenerated on its own.
+    """
+    type_of_field = {STREAM_ITEM_FIELDS[name]: name for name in content_types if name in STREAM_ITEM_FIELDS}
+
+    def item(field: str, index: int, value: dict):
+        on_item(type_of_field[field], index, value)
+
+    def reset(field: str):
+        on_reset(type_of_field[field])
+
+    try:
+        output = await _stream_prompt(
+            "combined", GeneratedCourseContent, COMBINED_SYSTEM_PROMPT, transcript_text, timeout, force_refresh,
+            list(type_of_field), item, reset
+        )
+    except Exception as e:
+        for name in content_types:
+            on_outcome(name, None, str(e) or e.__class__.__name__)
+        return
+
+    results, invalid = _split_combined(output, content_types)
+    for name, result in results.items():
+        on_outcome(name, result, None)
+
+    async def retry(name: str):
+        print(f"AI Generation Warning ({name}): {invalid[name]}. Regenerating it on its own.")
+        if name in STREAM_ITEM_FIELDS:
+            on_reset(name)
+        try:
+            result = await _stream_content_type(
+                name, transcript_text, None, None, timeout, force_refresh, on_item, on_reset
+            )
+            on_outcome(name, result, None)
+        except Exception as e:
+            on_outcome(name, None, str(e) or e.__class__.__name__)
+
+    await asyncio.gather(*(retry(name) for name in invalid))
+
+async def astream_content(
+    youtube_id: str,
+    content_types: list[str] | None = None,
+    timeout: float = CHAIN_TIMEOUT_SECONDS,
+    force_refresh: bool = False,
+    mode: str | None = None,
+):
+    """
+    Streaming counterpart of agenerate_content(): an async generator of
+    (event, data) pairs, emitted as the work progresses:
+
+      ("transcript", {"available", "characters", "segments"})   once, first
+      ("item", {"content_type", "index", "item"})               per list item
+      ("reset", {"content_type"})                               items so far were rejected
+      ("result", {"content_type", "output"})                    per finished type
+      ("error", {"content_type", "error"})                      per failed type
+
+    Content types run concurrently (or share one call in combined mode), so
+    their items interleave. After a reset, that type's items restart at index 0.
+    """
+    content_types = list(content_types or CONTENT_TYPES)
+
+    with track_stage("transcript"):
+        transcript_text, snippets = await asyncio.to_thread(load_transcript, youtube_id)
+    chunks = plan_chunks(transcript_text, snippets)
+    yield "transcript", {
+        "available": _is_cacheable(transcript_text),
+        "characters": len(transcript_text),
+        "segments": len(chunks) if chunks else 1,
+    }
+
+    events: asyncio.Queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+    combined = _combined_types(content_types, chunks, mode)
+
+    def on_item(name: str, index: int, item: dict):
+        events.put_nowait(("item", {"content_type": name, "index": index, "item": item}))
+
+    def on_reset(name: str):
+        events.put_nowait(("reset", {"content_type": name}))
+
+    def on_outcome(name: str, output: dict | None, error: str | None):
+        if error is None:
+            events.put_nowait(("result", {"content_type": name, "output": output}))
+        else:
+            events.put_nowait(("error", {"content_type": name, "error": error}))
+
+    async def run(name: str):
+        try:
+            output = await _stream_content_type(
+                name, transcript_text, chunks, semaphore, timeout, force_refresh, on_item, on_reset
+            )
+            on_outcome(name, output, None)
+        except Exception as e:
+            on_outcome(name, None, str(e) or e.__class__.__name__)
+
+    tasks = [asyncio.create_task(run(name)) for name in content_types if name not in combined]
+    if combined:
+        tasks.append(asyncio.create_task(
+            _stream_combined(combined, transcript_text, timeout, force_refresh, on_item, on_reset, on_outcome)
+        ))
+    try:
+        remaining = len(content_types)
+        while remaining:
+            event, data = await events.get()
+            if event in ("result", "error"):
+                remaining -= 1
+            yield event, data
+    finally:
+        # The consumer stopped early (or was cancelled): don't leave chains running
+        for task in tasks:
+            task.cancel()
+
+def generate_all_content(youtube_id: str, force_refresh: bool = False, mode: str | None = None) -> tuple[dict | None, dict | None]:
     """
     Runs both the quiz and flashcard pipelines and returns their results.
+    Synchronous entry point for callers that are not running an event loop.
     """
-    quiz_data = generate_quiz_content(youtube_id)
-    flashcard_data = generate_flashcard_content(youtube_id)
-    
-    return quiz_data, flashcard_data
+    return get_engine().run(agenerate_all_content(youtube_id, force_refresh=force_refresh, mode=mode))
+
+def _generate_one(content_type: str, youtube_id: str, force_refresh: bool) -> dict:
+    results, errors = get_engine().run(agenerate_content(youtube_id, [content_type], force_refresh=force_refresh))
+    if content_type in errors:
+        raise RuntimeError(errors[content_type])
+    return results[content_type]
+
+def generate_quiz_content(youtube_id: str, force_refresh: bool = False) -> dict:
+    """
+    Core function to orchestrate content generation using Gemini and LangChain.
+    """
+    # The output is already a Python dictionary matching the GeneratedQuiz schema
+    return _generate_one("quiz", youtube_id, force_refresh)
+
+def generate_flashcard_content(youtube_id: str, force_refresh: bool = False) -> dict:
+    """
+    Orchestrates content generation for flashcards using Gemini and LangChain.
+    """
+    return _generate_one("flashcards", youtube_id, force_refresh)
 
 # Placeholder for LangGraph Agent (Will be expanded in Milestone 4B)
 # def run_generation_agent(youtube_id: str) -> dict:
@@ -5,11 +5,14 @@ from jose import jwt, JWTError
 
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import event, select, Update, Delete
+from sqlalchemy.engine import Engine
+from database import AsyncReadSessionLocal
 from models import User
-from schemas import TokenData
+from schemas import TokenData, User as UserSchema
+from ttl_cache import TTLCache
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,6 +23,12 @@ GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 # Token lasts 30 minutes
 
+# Authenticated principals are cached per user ID. UPDATE/DELETE statements
+# on users run in this process (ORM or Core) invalidate immediately; the TTL
+# bounds how long a deactivation done by another process can go unnoticed.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # --- Password Hashing ---
@@ -49,23 +58,88 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
 # Defines the path where the token will be sent (login endpoint)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """A FastAPI dependency that verifies the JWT and returns the User object."""
+# --- Authenticated Principal Caches ---
+
+# bearer token -> verified claims, so a token is HMAC-verified once, not per request
+token_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, ttl_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# user id -> UserSchema (id, email, is_active)
+principal_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_principal(user_id: int | None = None):
+    """Drops one user's cached principal, or every cached principal."""
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    """Drops the cached principal whenever a user row is changed or removed through the ORM."""
+    invalidate_principal(target.id)
+
+@event.listens_for(Engine, "after_execute")
+def _invalidate_on_users_write(conn, clauseelement, multiparams, params, execution_options, result):
+    """
+    Core and bulk UPDATE/DELETE statements bypass the ORM events above and
+    may touch any number of users: drop every cached principal.
+    """
+    if isinstance(clauseelement, (Update, Delete)) and clauseelement.table.name == User.__tablename__:
+        invalidate_principal()
+
+def decode_access_token(token: str) -> dict:
+    """Verifies a JWT (or reuses an earlier verification) and returns its claims."""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Never keep a token cached past its own expiry
+    remaining = payload["exp"] - time.time() if "exp" in payload else None
+    token_cache.put(token, payload, ttl_seconds=remaining)
+    return payload
+
+async def load_principal(user_id: int | None, email: str) -> UserSchema | None:
+    """Returns the cached principal for a token's claims, loading it from the DB on a miss."""
+    if user_id is not None:
+        principal = principal_cache.get(user_id)
+        # A changed email no longer matches the token: recheck the DB
+        if principal is not None and principal.email == email:
+            return principal
+
+    async with AsyncReadSessionLocal() as db:
+        # Tokens issued before the uid claim existed only carry the email
+        condition = (User.id == user_id) if user_id is not None else (User.email == email)
+        user = (await db.execute(select(User).where(condition))).scalars().first()
+        if user is None or user.email != email:
+            return None
+        principal = UserSchema.model_validate(user)
+
+    principal_cache.put(principal.id, principal)
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserSchema:
+    """
+    A FastAPI dependency that verifies the JWT and returns the authenticated
+    principal (id, email, is_active). Warm requests don't touch the database.
+    """
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = await load_principal(token_data.user_id, token_data.email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
@@ -0,0 +1,221 @@
+# batch.py
+
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import GenerationBatch
+from generation_config import resolve_generation_mode
+from services import get_or_create_playlist_course, save_playlist_video
+from course_cache import course_cache
+from metrics import track_stage
+from leases import claim_values, lease_keeper
+
+# --- Configuration ---
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "3"))
+
+RESUMABLE_STATUSES = ("queued", "failed")
+
+# ------------------------------------------------------------------
+# --- MANIFESTS ---
+# ------------------------------------------------------------------
+
+def normalize_manifest(manifest: dict) -> dict:
+    """
+    Fills in order_index for every video (1-based list position when the
+    manifest doesn't provide one) and drops duplicate youtube_ids.
+    """
+    videos, seen = [], set()
+    for position, entry in enumerate(manifest["videos"], start=1):
+        if entry["youtube_id"] in seen:
+            continue
+        seen.add(entry["youtube_id"])
+        video = dict(entry)
+        if video.get("order_index") is None:
+            video["order_index"] = position
+        videos.append(video)
+
+    if not videos:
+        raise ValueError("A playlist manifest needs at least one video.")
+    return {**manifest, "videos": videos}
+
+def manifest_from_video_ids(video_ids: list[str], title: str | None = None) -> dict:
+    """Builds a minimal manifest from a plain list of YouTube video IDs."""
+    return normalize_manifest({
+        "title": title,
+        "videos": [{"youtube_id": video_id} for video_id in video_ids]
+    })
+
+def load_manifest(path: str) -> dict:
+    """Reads a playlist manifest file (e.g. course_data.json)."""
+    with open(path, "r") as f:
+        return normalize_manifest(json.load(f))
+
+def batch_to_dict(batch: GenerationBatch) -> dict:
+    """Flattens a batch row for GenerationBatchSchema."""
+    return {
+        "id": batch.id,
+        "course_id": batch.course_id,
+        "status": batch.status,
+        "concurrency": batch.concurrency,
+        "generation_mode": batch.generation_mode,
+        "total_videos": len(json.loads(batch.manifest)["videos"]),
+        "completed_video_ids": json.loads(batch.completed_video_ids),
+        "errors": json.loads(batch.errors),
+        "created_at": batch.created_at,
+        "started_at": batch.started_at,
+        "finished_at": batch.finished_at,
+    }
+
+# ------------------------------------------------------------------
+# --- BATCH LIFECYCLE ---
+# ------------------------------------------------------------------
+
+def create_batch(
+    db: Session,
+    manifest: dict,
+    user_id: int | None = None,
+    concurrency: int = BATCH_CONCURRENCY,
+    force_refresh: bool = False,
+    generation_mode: str | None = None,
+) -> GenerationBatch:
+    """Creates the target course and a queued batch row for a manifest."""
+    manifest = normalize_manifest(manifest)
+    if generation_mode is not None:
+        resolve_generation_mode(generation_mode)
+    try:
+        course = get_or_create_playlist_course(db, manifest)
+        batch = GenerationBatch(
+            id=uuid.uuid4().hex,
+            course_id=course.id,
+            requested_by=user_id,
+            manifest=json.dumps(manifest),
+            concurrency=max(1, concurrency),
+            force_refresh=force_refresh,
+            generation_mode=generation_mode,
+            status="queued",
+            completed_video_ids="[]",
+            errors="{}",
+            created_at=datetime.utcnow()
+        )
+        db.add(batch)
+        db.commit()
+        db.refresh(batch)
+        return batch
+    except Exception as e:
+        db.rollback()
+        raise e
+
+async def get_batch(db: AsyncSession, batch_id: str) -> GenerationBatch | None:
+    """Fetches a playlist batch by ID."""
+    return await db.get(GenerationBatch, batch_id)
+
+def _save_video(session_factory, batch_id: str, course_id: int, entry: dict, quiz_data, flashcard_data) -> list[str]:
+    """
+    Saves one video and, if both content types were generated, marks it
+    completed on the batch, in a single transaction. Returns the content
+    types that are missing: the video is then left for a resumed run.
+    """
+    missing = [name for name, data in (("quiz", quiz_data), ("flashcards", flashcard_data)) if data is None]
+    db = session_factory()
+    try:
+        with track_stage("save"):
+            save_playlist_video(db, course_id, entry, quiz_data, flashcard_data)
+            if not missing:
+                batch = db.get(GenerationBatch, batch_id)
+                completed = json.loads(batch.completed_video_ids)
+                completed.append(entry["youtube_id"])
+                batch.completed_video_ids = json.dumps(completed)
+            db.commit()
+        course_cache.invalidate(course_id)
+        return missing
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def arun_batch(batch_id: str, session_factory=SessionLocal, on_progress=None) -> dict:
+    """
+    Generates every not-yet-completed video of a batch, at most
+    `batch.concurrency` at a time, and returns the final batch state.
+    """
+    from ai_pipeline import agenerate_all_content
+
+    db = session_factory()
+    try:
+        batch = db.get(GenerationBatch, batch_id)
+        if batch is None:
+            raise ValueError(f"Batch {batch_id} not found.")
+
+        # Atomically claim the batch so two workers never run it at once.
+        # Failed batches are claimable too: that is how a batch is resumed.
+        claimed = db.query(GenerationBatch).filter(
+            GenerationBatch.id == batch_id,
+            GenerationBatch.status.in_(RESUMABLE_STATUSES)
+        ).update(
+            {**claim_values(GenerationBatch), GenerationBatch.finished_at: None},
+            synchronize_session=False
+        )
+        db.commit()
+        db.refresh(batch)
+        if not claimed:
+            return batch_to_dict(batch)
+        lease_keeper.start()
+
+        manifest = json.loads(batch.manifest)
+        completed = set(json.loads(batch.completed_video_ids))
+        course_id, concurrency, force_refresh = batch.course_id, batch.concurrency, batch.force_refresh
+        generation_mode = batch.generation_mode
+    finally:
+        db.close()
+
+    pending = [entry for entry in manifest["videos"] if entry["youtube_id"] not in completed]
+    semaphore = asyncio.Semaphore(concurrency)
+    # SQLite has a single writer; serialize the (short) saves, not the generation
+    save_lock = asyncio.Lock()
+    errors = {}
+
+    async def process(entry: dict):
+        youtube_id = entry["youtube_id"]
+        try:
+            async with semaphore:
+                quiz_data, flashcard_data = await agenerate_all_content(
+                    youtube_id, force_refresh=force_refresh, mode=generation_mode
+                )
+            async with save_lock:
+                missing = await asyncio.to_thread(
+                    _save_video, session_factory, batch_id, course_id, entry, quiz_data, flashcard_data
+                )
+            if missing:
+                raise RuntimeError(f"No {' or '.join(missing)} generated; saved the rest, resume the batch to retry")
+        except Exception as e:
+            print(f"AI Generation Error (batch {batch_id}, video {youtube_id}): {e}")
+            errors[youtube_id] = str(e)
+        if on_progress:
+            on_progress(youtube_id, youtube_id not in errors)
+
+    await asyncio.gather(*(process(entry) for entry in pending))
+
+    db = session_factory()
+    try:
+        batch = db.get(GenerationBatch, batch_id)
+        batch.errors = json.dumps(errors)
+        batch.status = "failed" if errors else "succeeded"
+        batch.finished_at = datetime.utcnow()
+        db.commit()
+        return batch_to_dict(batch)
+    finally:
+        db.close()
+
+def run_batch(batch_id: str, session_factory=SessionLocal, on_progress=None) -> dict:
+    """Synchronous entry point for worker threads and the CLI."""
+    from ai_pipeline import get_engine
+
+    return get_engine().run(arun_batch(batch_id, session_factory, on_progress))
@@ -0,0 +1,69 @@
+import argparse
+import json
+from database import SessionLocal, engine
+from migrations import migrate
+from models import GenerationBatch
+from leases import lease_expired, JOB_LEASE_SECONDS
+from batch import create_batch, load_manifest, manifest_from_video_ids, run_batch, BATCH_CONCURRENCY
+from generation_config import GENERATION_MODES
+
+# Usage:
+#   python batch_generate.py --manifest course_data.json --concurrency 4
+#   python batch_generate.py VIDEO_ID [VIDEO_ID ...] --title "My Playlist"
+#   python batch_generate.py --resume BATCH_ID
+
+def print_progress(youtube_id: str, ok: bool):
+    print(f"  {'✅' if ok else '❌'} {youtube_id}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate AI content for a whole playlist into one course.")
+    parser.add_argument("video_ids", nargs="*", help="YouTube video IDs, in playlist order.")
+    parser.add_argument("--manifest", help="Path to a playlist manifest (same shape as course_data.json).")
+    parser.add_argument("--title", help="Course title when only video IDs are given.")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Videos generated at the same time.")
+    parser.add_argument("--force-refresh", action="store_true", help="Bypass the LLM response cache.")
+    parser.add_argument("--generation-mode", choices=GENERATION_MODES,
+                        help="One LLM call per content type, or one for both (default: GENERATION_MODE).")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Resume an interrupted or failed batch.")
+    args = parser.parse_args()
+
+    migrate(engine)
+    db = SessionLocal()
+    try:
+        if args.resume:
+            batch = db.get(GenerationBatch, args.resume)
+            if batch is None:
+                parser.error(f"Batch {args.resume} not found.")
+            if batch.status == "running":
+                # Only take over a batch whose owner stopped renewing its lease (it died)
+                if not lease_expired(db, GenerationBatch, batch.id):
+                    parser.error(f"Batch {batch.id} is running in {batch.claimed_by}; if that process died, "
+                                 f"retry once its lease expires ({JOB_LEASE_SECONDS}s without a heartbeat).")
+                batch.status = "queued"
+                db.commit()
+            batch_id = batch.id
+        else:
+            if args.manifest:
+                manifest = load_manifest(args.manifest)
+            elif args.video_ids:
+                manifest = manifest_from_video_ids(args.video_ids, title=args.title)
+            else:
+                parser.error("Provide video IDs, --manifest or --resume.")
+            batch = create_batch(
+                db, manifest, concurrency=args.concurrency, force_refresh=args.force_refresh,
+                generation_mode=args.generation_mode
+            )
+            batch_id = batch.id
+    finally:
+        db.close()
+
+    print(f"Running batch {batch_id} (resume with: python batch_generate.py --resume {batch_id})")
+    result = run_batch(batch_id, on_progress=print_progress)
+
+    print(f"Batch {result['status']}: {len(result['completed_video_ids'])}/{result['total_videos']} videos "
+          f"in course {result['course_id']}.")
+    if result["errors"]:
+        print(json.dumps(result["errors"], indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# benchmarks/__init__.py
+#
+# Offline load and benchmark suite. Nothing here talks to Gemini or YouTube:
+# fakes.py stands in for both, synthetic.py builds a database of any size,
+# and run.py drives every API endpoint in-process and writes the latency
+# percentiles to JSON (compare two runs with compare.py).
+#
+#   python -m benchmarks.run --courses 10000 --progress 1000000
+#   python -m benchmarks.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+#   python -m benchmarks.generation_modes        # separate vs combined generation: tokens, cost, latency
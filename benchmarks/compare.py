@@ -0,0 +1,51 @@
+# benchmarks/compare.py
+
+import argparse
+import json
+import sys
+
+# Usage:
+#   python -m benchmarks.compare benchmarks/results/BASE.json benchmarks/results/NEW.json [--threshold 0.10]
+#
+# Prints the per-workload change in p50/p95/p99 and throughput, and exits
+# non-zero if any workload's p95 regressed by more than the threshold.
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+def change(base: float, new: float) -> float:
+    return (new - base) / base if base else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative p95 regression.")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{base.get('commit')} -> {new.get('commit')}")
+    regressions = []
+    for name, new_summary in new["workloads"].items():
+        base_summary = base["workloads"].get(name)
+        if base_summary is None:
+            print(f"  {name:<28} (new workload)")
+            continue
+        cells = []
+        for metric in METRICS:
+            delta = change(base_summary[metric], new_summary[metric])
+            cells.append(f"{metric} {base_summary[metric]:8.1f} -> {new_summary[metric]:8.1f} ({delta:+.0%})")
+        print(f"  {name:<28} " + "  ".join(cells))
+        if change(base_summary["p95_ms"], new_summary["p95_ms"]) > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"❌ p95 regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("✅ No p95 regressions.")
+
+if __name__ == "__main__":
+    main()
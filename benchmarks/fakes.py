@@ -0,0 +1,167 @@
+# benchmarks/fakes.py
+
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from generation_engine import LLMProvider
+from transcript_chunks import estimate_tokens
+
+# ------------------------------------------------------------------
+# --- FAKE LLM ---
+# ------------------------------------------------------------------
+
+def fake_quiz(count: int = 3) -> list[dict]:
+    return [
+        {
+            "question": f"Synthetic question {i + 1}?",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "correct": i % 4,
+            "explaination": "Synthetic explanation.",
+        }
+        for i in range(count)
+    ]
+
+def fake_flashcards(count: int = 5) -> list[dict]:
+    return [{"front": f"Synthetic term {i + 1}", "back": "Synthetic definition."} for i in range(count)]
+
+class FakeChatModel(BaseChatModel):
+    """
+    A drop-in for ChatGoogleGenerativeAI that sleeps for `latency_seconds`
+    and answers with valid JSON for whichever output schema the prompt's
+    format instructions ask for (quiz, flashcards or both), reporting
+    estimated token usage. `seconds_per_output_token` adds generation time
+    proportional to the answer's length. Streaming spreads the same latency
+    evenly over `stream_chunks` pieces of the answer. `invalid_rates` maps a
+    model name to the share of its answers that break a validation rule,
+    drawn from `rng` (a random.Random) when given.
+    """
+
+    model: str = "fake"
+    temperature: float = 0.0
+    latency_seconds: float = 0.0
+    seconds_per_output_token: float = 0.0
+    stream_chunks: int = 20
+    invalid_rates: dict[str, float] = {}
+    rng: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages) -> ChatResult:
+        prompt = " ".join(str(message.content) for message in messages)
+        response = {"video_title": "Synthetic Video"}
+        if '"quiz"' in prompt:
+            response["quiz"] = fake_quiz()
+        if '"flashcards"' in prompt:
+            response["flashcards"] = fake_flashcards()
+        if (self.rng or random).random() < self.invalid_rates.get(self.model, 0.0):
+            # Three options, or four flashcards: well-formed JSON that strict validation rejects
+            if "quiz" in response:
+                response["quiz"][0]["options"].pop()
+            else:
+                response.get("flashcards", []).pop()
+        text = json.dumps(response)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _latency(self, result: ChatResult) -> float:
+        usage = result.generations[0].message.usage_metadata
+        return self.latency_seconds + self.seconds_per_output_token * usage["output_tokens"]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._respond(messages)
+        time.sleep(self._latency(result))
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._respond(messages)
+        await asyncio.sleep(self._latency(result))
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        result = self._respond(messages)
+        latency = self._latency(result)
+        text = result.generations[0].message.content
+        size = -(-len(text) // self.stream_chunks)
+        for start in range(0, len(text), size):
+            await asyncio.sleep(latency / self.stream_chunks)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + size]))
+
+class FakeProvider(LLMProvider):
+    """
+    Serves FakeChatModel for every model name. The invalid answers are drawn
+    from one generator seeded with `seed`, so a run is repeatable.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_seconds: float = 0.0, seconds_per_output_token: float = 0.0,
+                 invalid_rates: dict[str, float] | None = None, seed: int = 0):
+        self.latency_seconds = latency_seconds
+        self.seconds_per_output_token = seconds_per_output_token
+        self.invalid_rates = dict(invalid_rates or {})
+        self.rng = random.Random(seed)
+
+    def chat_model(self, model: str) -> FakeChatModel:
+        return FakeChatModel(
+            model=model,
+            latency_seconds=self.latency_seconds,
+            seconds_per_output_token=self.seconds_per_output_token,
+            invalid_rates=self.invalid_rates,
+            rng=self.rng,
+        )
+
+# ------------------------------------------------------------------
+# --- FAKE TRANSCRIPTS ---
+# ------------------------------------------------------------------
+
+class FakeTranscriptApi:
+    """
+    A drop-in for YouTubeTranscriptApi: fetch() sleeps for `latency_seconds`
+    and returns `duration_seconds` of synthetic captions, one 5s snippet at a time.
+    """
+
+    latency_seconds = 0.0
+    duration_seconds = 600
+
+    def fetch(self, video_id: str, languages=("en",)):
+        time.sleep(self.latency_seconds)
+        snippets = [
+            SimpleNamespace(text=f"Synthetic caption {i} for {video_id} about a key concept.", start=i * 5.0, duration=5.0)
+            for i in range(int(self.duration_seconds // 5))
+        ]
+        return SimpleNamespace(snippets=snippets, language_code=languages[0])
+
+def install_fakes(llm_latency: float = 0.0, transcript_latency: float = 0.0, transcript_seconds: int = 600,
+                  llm_seconds_per_token: float = 0.0, llm_invalid_rates: dict[str, float] | None = None):
+    """
+    Points ai_pipeline at the fakes: the generation engine gets a
+    FakeProvider (dropping any clients it already built) and transcripts
+    come from FakeTranscriptApi, which the pipeline creates per fetch.
+    """
+    import ai_pipeline
+
+    class BenchmarkTranscriptApi(FakeTranscriptApi):
+        latency_seconds = transcript_latency
+        duration_seconds = transcript_seconds
+
+    ai_pipeline.get_engine().set_provider(FakeProvider(
+        latency_seconds=llm_latency,
+        seconds_per_output_token=llm_seconds_per_token,
+        invalid_rates=llm_invalid_rates,
+    ))
+    ai_pipeline.YouTubeTranscriptApi = BenchmarkTranscriptApi
@@ -0,0 +1,138 @@
+# benchmarks/generation_modes.py
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Usage:
+#   python -m benchmarks.generation_modes                              # fake LLM and transcripts
+#   python -m benchmarks.generation_modes --videos 50 --llm-seconds-per-token 0.005
+#   python -m benchmarks.generation_modes --live VIDEO_ID [VIDEO_ID ...] # real Gemini + YouTube (costs money)
+#
+# Generates the same videos in "separate" mode (one call per content type)
+# and "combined" mode (one call for both), bypassing the LLM response cache,
+# and compares LLM calls, tokens, estimated cost and latency. Transcripts are
+# fetched once up front so both modes start from the same cached transcript.
+
+# Gemini 2.5 Pro list prices (USD per 1M tokens, prompts up to 200k tokens)
+INPUT_PRICE_PER_MILLION = 1.25
+OUTPUT_PRICE_PER_MILLION = 10.0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare separate and combined generation modes.")
+    parser.add_argument("--live", nargs="+", metavar="VIDEO_ID", help="Use real Gemini and YouTube for these videos.")
+    parser.add_argument("--videos", type=int, default=20, help="Synthetic videos to generate (fake mode).")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Fixed seconds per fake LLM call.")
+    parser.add_argument("--llm-seconds-per-token", type=float, default=0.002,
+                        help="Extra fake LLM seconds per output token.")
+    parser.add_argument("--transcript-seconds", type=int, default=600, help="Length of the fake videos.")
+    parser.add_argument("--input-price", type=float, default=INPUT_PRICE_PER_MILLION)
+    parser.add_argument("--output-price", type=float, default=OUTPUT_PRICE_PER_MILLION)
+    parser.add_argument("--out", type=Path, help="Also write the report to this JSON file.")
+    return parser.parse_args()
+
+def _llm_totals() -> dict:
+    """Cumulative LLM calls and tokens from the pipeline's Prometheus metrics."""
+    from metrics import LLM_TOKENS, PIPELINE_STAGE_LATENCY
+
+    totals = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    for sample in PIPELINE_STAGE_LATENCY.collect()[0].samples:
+        if sample.name.endswith("_count") and sample.labels["stage"] == "llm":
+            totals["calls"] += int(sample.value)
+    for sample in LLM_TOKENS.collect()[0].samples:
+        if sample.name.endswith("_total"):
+            totals[f"{sample.labels['direction']}_tokens"] += int(sample.value)
+    return totals
+
+async def run_mode(mode: str, video_ids: list[str], concurrency: int, args) -> dict:
+    from ai_pipeline import agenerate_content
+    from benchmarks.workloads import percentile
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(youtube_id: str):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            results, failed = await agenerate_content(
+                youtube_id, ["quiz", "flashcards"], force_refresh=True, mode=mode
+            )
+            latencies.append(time.perf_counter() - started)
+            errors += len(failed)
+
+    before = _llm_totals()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(youtube_id) for youtube_id in video_ids))
+    wall = time.perf_counter() - started
+    after = _llm_totals()
+
+    usage = {key: after[key] - before[key] for key in after}
+    cost = (usage["input_tokens"] * args.input_price + usage["output_tokens"] * args.output_price) / 1_000_000
+    latencies.sort()
+    return {
+        "videos": len(video_ids),
+        "failed_content_types": errors,
+        "llm_calls": usage["calls"],
+        "input_tokens": usage["input_tokens"],
+        "output_tokens": usage["output_tokens"],
+        "cost_usd": cost,
+        "cost_per_video_usd": cost / len(video_ids),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "wall_seconds": wall,
+    }
+
+def change(base: float, new: float) -> str:
+    return f"{(new - base) / base:+.0%}" if base else "n/a"
+
+def main():
+    args = parse_args()
+
+    # The caches' engine is configured from DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp(prefix='upskiller-modes-')) / 'modes.db'}"
+    os.environ.pop("DATABASE_READ_URL", None)
+
+    from database import engine, Base
+    from ai_pipeline import load_transcript
+
+    Base.metadata.create_all(bind=engine)
+    if args.live:
+        video_ids = args.live
+    else:
+        from benchmarks.fakes import install_fakes
+        install_fakes(
+            llm_latency=args.llm_latency,
+            transcript_seconds=args.transcript_seconds,
+            llm_seconds_per_token=args.llm_seconds_per_token,
+        )
+        video_ids = [f"modes{index}" for index in range(args.videos)]
+
+    for youtube_id in video_ids:
+        load_transcript(youtube_id)
+
+    report = {"created_at": datetime.utcnow().isoformat(), "live": bool(args.live), "modes": {}}
+    for mode in ("separate", "combined"):
+        print(f"Running {mode} mode over {len(video_ids)} video(s) ...")
+        report["modes"][mode] = asyncio.run(run_mode(mode, video_ids, args.concurrency, args))
+    engine.dispose()
+
+    separate, combined = report["modes"]["separate"], report["modes"]["combined"]
+    for key in ("llm_calls", "input_tokens", "output_tokens", "cost_per_video_usd", "p50_ms", "p95_ms"):
+        print(f"  {key:<20} {separate[key]:>12.4g} -> {combined[key]:>12.4g}  ({change(separate[key], combined[key])})")
+    if separate["failed_content_types"] or combined["failed_content_types"]:
+        print(f"  failed content types: separate {separate['failed_content_types']}, "
+              f"combined {combined['failed_content_types']}")
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"✅ Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/run.py
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Usage:
+#   python -m benchmarks.run                                   # small default dataset
+#   python -m benchmarks.run --courses 10000 --progress 1000000 --requests 2000 --concurrency 32
+#   python -m benchmarks.run --workloads course_detail,progress_dashboard --llm-latency 2.0
+#   python -m benchmarks.run --workloads pipeline_end_to_end --invalid-rate gemini-2.5-flash=0.2
+#
+# The app runs in-process (httpx over ASGI) against a fresh database, never
+# sql_app.db. Results land in benchmarks/results/<timestamp>-<commit>.json.
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline load test of every API endpoint with fake AI providers.")
+    parser.add_argument("--database-url", help="An EMPTY database to benchmark against (default: a temporary SQLite file).")
+    parser.add_argument("--courses", type=int, default=1000)
+    parser.add_argument("--videos-per-course", type=int, default=8)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--progress", type=int, default=100_000, help="Total user_progress rows.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per workload (scaled by each workload's share).")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=10, help="Users whose tokens the workloads rotate through.")
+    parser.add_argument("--workloads", help="Comma-separated subset of workloads to run.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake LLM call.")
+    parser.add_argument("--transcript-latency", type=float, default=0.2, help="Seconds per fake transcript fetch.")
+    parser.add_argument("--transcript-seconds", type=int, default=600, help="Length of the fake videos.")
+    parser.add_argument("--invalid-rate", action="append", default=[], metavar="MODEL=RATE",
+                        help="Share of a model's fake answers that fail validation (repeatable).")
+    parser.add_argument("--out", type=Path, default=RESULTS_DIR)
+    return parser.parse_args()
+
+async def run(args, dataset: dict) -> dict:
+    import httpx
+    import main
+    from benchmarks.workloads import BenchmarkContext, WORKLOADS, run_workload
+
+    selected = set(args.workloads.split(",")) if args.workloads else None
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            ctx = BenchmarkContext(client, dataset, seed=args.seed)
+            await ctx.login(args.logins)
+
+            for name, workload, expected, share, setup in WORKLOADS:
+                if selected and name not in selected:
+                    continue
+                if setup:
+                    await setup(ctx)
+                requests = max(1, int(args.requests * share))
+                results[name] = await run_workload(ctx, workload, expected, requests, args.concurrency)
+                summary = results[name]
+                print(f"  {name:<28} p50 {summary['p50_ms']:8.1f}ms  p95 {summary['p95_ms']:8.1f}ms  "
+                      f"p99 {summary['p99_ms']:8.1f}ms  {summary['throughput_rps']:8.1f} req/s  "
+                      f"errors {summary['errors']}")
+    return results
+
+def main():
+    args = parse_args()
+
+    # The app's engines are configured from DATABASE_URL at import time
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{Path(tempfile.mkdtemp(prefix='upskiller-bench-')) / 'bench.db'}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("DATABASE_READ_URL", None)
+
+    from database import engine
+    from migrations import migrate
+    from benchmarks.synthetic import generate_dataset
+    from benchmarks.fakes import install_fakes
+
+    migrate(engine)
+    print(f"Generating dataset in {database_url} ...")
+    dataset = generate_dataset(
+        engine,
+        courses=args.courses,
+        videos_per_course=args.videos_per_course,
+        users=args.users,
+        progress_rows=args.progress,
+        seed=args.seed,
+    )
+    print(f"  {dataset['courses']} courses, {dataset['videos']} videos, {dataset['user_progress']} progress rows "
+          f"in {dataset['seconds']:.1f}s")
+
+    install_fakes(
+        llm_latency=args.llm_latency,
+        transcript_latency=args.transcript_latency,
+        transcript_seconds=args.transcript_seconds,
+        llm_invalid_rates={model: float(rate) for model, rate in (item.split("=", 1) for item in args.invalid_rate)},
+    )
+    print("Running workloads ...")
+    workloads = asyncio.run(run(args, dataset))
+
+    commit = git_commit()
+    started = datetime.utcnow()
+    report = {
+        "commit": commit,
+        "created_at": started.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": database_url.split(":", 1)[0],
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("out", "database_url")},
+        "dataset": dataset,
+        "workloads": workloads,
+    }
+    args.out.mkdir(parents=True, exist_ok=True)
+    path = args.out / f"{started:%Y%m%d-%H%M%S}-{commit or 'nogit'}.json"
+    path.write_text(json.dumps(report, indent=2))
+    print(f"✅ Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# benchmarks/startup.py
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Usage:
+#   python -m benchmarks.startup                 # every mode, 5 fresh processes each
+#   python -m benchmarks.startup --runs 10 --out startup.json
+#
+# Starts the API in a fresh interpreter per run (import main + lifespan
+# startup, against a temporary database) and reports startup time, resident
+# memory and whether the AI stack got loaded, for each way of running
+# generation:
+#
+#   lazy      GENERATION_RUNNER=inline (default): AI stack imported by the first generation
+#   eager     inline with PRELOAD_AI_STACK=true: imported and warmed at startup
+#   external  GENERATION_RUNNER=external: never imported; generation_worker.py runs the jobs
+#
+# For lazy mode, "first_generation" is the import cost the first generation pays.
+
+MODES = {
+    "lazy": {"GENERATION_RUNNER": "inline", "PRELOAD_AI_STACK": "false"},
+    "eager": {"GENERATION_RUNNER": "inline", "PRELOAD_AI_STACK": "true"},
+    "external": {"GENERATION_RUNNER": "external", "PRELOAD_AI_STACK": "false"},
+}
+
+AI_MODULES = ("ai_pipeline", "langchain_core", "langchain_google_genai", "youtube_transcript_api")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare API startup time and memory across generation modes.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per mode.")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of modes.")
+    parser.add_argument("--out", type=Path, help="Also write the report to this JSON file.")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def rss_mb() -> float:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    # Peak rather than current RSS, but the best available off Linux (KB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def probe() -> dict:
+    """Runs inside the child process: one cold API startup."""
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    async def startup():
+        async with main.app.router.lifespan_context(main.app):
+            pass
+    asyncio.run(startup())
+    ready = time.perf_counter()
+
+    result = {
+        "import_seconds": imported - started,
+        "startup_seconds": ready - started,
+        "rss_mb": rss_mb(),
+        "ai_stack_loaded": [name for name in AI_MODULES if name in sys.modules],
+    }
+    if "ai_pipeline" not in sys.modules and os.getenv("GENERATION_RUNNER") != "external":
+        # What the first generation in this process would pay
+        started = time.perf_counter()
+        import ai_pipeline  # noqa: F401
+        result["first_generation"] = {"import_seconds": time.perf_counter() - started, "rss_mb": rss_mb()}
+    return result
+
+def run_probe(env: dict) -> dict:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--probe"],
+        env=env, capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process_seconds"] = time.perf_counter() - started
+    return result
+
+def summarize(runs: list[dict]) -> dict:
+    summary = {
+        key: statistics.median(run[key] for run in runs)
+        for key in ("process_seconds", "import_seconds", "startup_seconds", "rss_mb")
+    }
+    summary["ai_stack_loaded"] = runs[0]["ai_stack_loaded"]
+    if "first_generation" in runs[0]:
+        summary["first_generation"] = {
+            key: statistics.median(run["first_generation"][key] for run in runs)
+            for key in ("import_seconds", "rss_mb")
+        }
+    return summary
+
+def main():
+    args = parse_args()
+    if args.probe:
+        print(json.dumps(probe()))
+        return
+
+    database_url = f"sqlite:///{Path(tempfile.mkdtemp(prefix='upskiller-startup-')) / 'startup.db'}"
+    base_env = {**os.environ, "DATABASE_URL": database_url}
+    base_env.pop("DATABASE_READ_URL", None)
+    # The eager mode builds Gemini clients, which refuse to exist without a key; nothing is called
+    base_env.setdefault("GOOGLE_API_KEY", "startup-benchmark-placeholder")
+
+    # Create and migrate the database once so no run pays for it
+    run_probe({**base_env, **MODES["external"]})
+
+    report = {"created_at": datetime.utcnow().isoformat(), "runs": args.runs, "modes": {}}
+    for mode in args.modes.split(","):
+        print(f"Starting {mode} mode {args.runs} time(s) ...")
+        runs = [run_probe({**base_env, **MODES[mode]}) for _ in range(args.runs)]
+        summary = report["modes"][mode] = summarize(runs)
+        line = (f"  {mode:<9} process {summary['process_seconds']:6.2f}s  import main {summary['import_seconds']:6.2f}s  "
+                f"startup {summary['startup_seconds']:6.2f}s  RSS {summary['rss_mb']:7.1f}MB  "
+                f"AI stack {'loaded' if summary['ai_stack_loaded'] else 'not loaded'}")
+        if "first_generation" in summary:
+            first = summary["first_generation"]
+            line += f"  (first generation +{first['import_seconds']:.2f}s, RSS {first['rss_mb']:.1f}MB)"
+        print(line)
+
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+        print(f"✅ Results written to {args.out}")
+
+if __name__ == "__main__":
+    main()
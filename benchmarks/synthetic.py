@@ -0,0 +1,122 @@
+# benchmarks/synthetic.py
+
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import insert, text
+from sqlalchemy.engine import Engine
+
+from models import User, Course, Video, Quiz, Flashcard, UserProgress
+from services import course_progress_upsert, backfill_review_states
+from search_index import rebuild_index
+from auth_utils import get_password_hash
+from benchmarks.fakes import fake_quiz, fake_flashcards
+
+# Every synthetic user logs in with this password (hashed once, not per user)
+BENCHMARK_PASSWORD = "benchmark-password"
+INSERT_CHUNK_ROWS = 5000
+
+def benchmark_email(index: int) -> str:
+    return f"bench-user-{index}@example.com"
+
+def _insert_chunked(conn, model, rows) -> int:
+    """Bulk inserts an iterable of row dicts, INSERT_CHUNK_ROWS at a time."""
+    rows = iter(rows)
+    total = 0
+    while chunk := list(islice(rows, INSERT_CHUNK_ROWS)):
+        conn.execute(insert(model), chunk)
+        total += len(chunk)
+    return total
+
+def _sync_sequences(conn, models):
+    # Rows were inserted with explicit ids; move Postgres' id sequences past them
+    if conn.dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+def generate_dataset(
+    engine: Engine,
+    courses: int = 1000,
+    videos_per_course: int = 8,
+    users: int = 100,
+    progress_rows: int = 100_000,
+    seed: int = 0,
+) -> dict:
+    """
+    Fills an EMPTY database (tables already created) with synthetic users,
+    courses, videos, quizzes, flashcards and progress, plus the matching
+    course progress summaries, search documents and review queues. The same seed always builds the same data.
+
+    Returns the row counts and how long generation took.
+    """
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    total_videos = courses * videos_per_course
+    quiz, flashcards = fake_quiz(), fake_flashcards()
+    hashed_password = get_password_hash(BENCHMARK_PASSWORD)
+
+    counts = {}
+    with engine.begin() as conn:
+        counts["users"] = _insert_chunked(conn, User, (
+            {"id": i, "email": benchmark_email(i), "hashed_password": hashed_password, "is_active": True}
+            for i in range(1, users + 1)
+        ))
+        counts["courses"] = _insert_chunked(conn, Course, (
+            {
+                "id": i,
+                "title": f"Synthetic Course {i}",
+                "description": f"Benchmark course {i}.",
+                "playlist_id": f"PLBENCH{i}",
+                "thumbnail_url": None,
+            }
+            for i in range(1, courses + 1)
+        ))
+        # Video i belongs to course ceil(i / videos_per_course)
+        counts["videos"] = _insert_chunked(conn, Video, (
+            {
+                "id": i,
+                "course_id": (i - 1) // videos_per_course + 1,
+                "order_index": (i - 1) % videos_per_course + 1,
+                "title": f"Synthetic Video {i}",
+                "youtube_id": f"bench{i:07d}",
+                "duration_seconds": rng.randint(120, 3600),
+            }
+            for i in range(1, total_videos + 1)
+        ))
+        counts["quizzes"] = _insert_chunked(conn, Quiz, (
+            {"id": i, "video_id": i, "question_data": quiz} for i in range(1, total_videos + 1)
+        ))
+        counts["flashcards"] = _insert_chunked(conn, Flashcard, (
+            {"id": i, "video_id": i, "flashcard_data": flashcards} for i in range(1, total_videos + 1)
+        ))
+
+        # Each user has progress on a distinct random sample of videos
+        per_user = min(progress_rows // max(users, 1), total_videos)
+        def progress():
+            for user_id in range(1, users + 1):
+                for video_id in rng.sample(range(1, total_videos + 1), per_user):
+                    completed = rng.random() < 0.6
+                    started_at = now - timedelta(minutes=rng.randint(1, 60 * 24 * 365))
+                    yield {
+                        "user_id": user_id,
+                        "video_id": video_id,
+                        "is_completed": completed,
+                        "quiz_score": rng.randint(0, 100),
+                        "started_at": started_at,
+                        "completed_at": started_at + timedelta(minutes=10) if completed else None,
+                    }
+        counts["user_progress"] = _insert_chunked(conn, UserProgress, progress())
+        counts["course_progress"] = conn.execute(course_progress_upsert(conn.dialect.name)).rowcount
+        counts["search_documents"] = rebuild_index(conn)
+        counts["review_states"] = backfill_review_states(conn)
+        _sync_sequences(conn, (User, Course, Video, Quiz, Flashcard))
+
+    counts["seconds"] = time.perf_counter() - started
+    return counts
@@ -0,0 +1,254 @@
+# benchmarks/workloads.py
+
+import asyncio
+import itertools
+import random
+import time
+import uuid
+
+from benchmarks.synthetic import BENCHMARK_PASSWORD, benchmark_email
+
+# ------------------------------------------------------------------
+# --- CONTEXT ---
+# ------------------------------------------------------------------
+
+class BenchmarkContext:
+    """Dataset shape plus the logged-in clients' auth headers, shared by all workloads."""
+
+    def __init__(self, client, dataset: dict, seed: int = 0):
+        self.client = client
+        self.courses = dataset["courses"]
+        self.videos = dataset["videos"]
+        self.users = dataset["users"]
+        self.rng = random.Random(seed)
+        self.headers: list[dict] = []
+        self.job_ids: list[str] = []
+        self.batch_ids: list[str] = []
+        self.generated_video: str | None = None
+        self._counter = itertools.count()
+
+    async def login(self, count: int):
+        """Logs in the first `count` synthetic users (bcrypt is slow, so only once)."""
+        for index in range(1, min(count, self.users) + 1):
+            response = await self.client.post(
+                "/api/auth/login", data={"username": benchmark_email(index), "password": BENCHMARK_PASSWORD}
+            )
+            response.raise_for_status()
+            self.headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+    def auth(self) -> dict:
+        return self.rng.choice(self.headers)
+
+    def unique(self, prefix: str) -> str:
+        return f"{prefix}{next(self._counter)}{uuid.uuid4().hex[:6]}"
+
+    def course_id(self) -> int:
+        return self.rng.randint(1, self.courses)
+
+    def video_id(self) -> int:
+        return self.rng.randint(1, self.videos)
+
+    async def wait_for_job(self, job_id: str, timeout: float = 120.0, interval: float = 0.02) -> dict:
+        deadline = time.perf_counter() + timeout
+        while True:
+            job = (await self.client.get(f"/api/content/jobs/{job_id}", headers=self.auth())).json()
+            if job["status"] in ("succeeded", "failed") or time.perf_counter() > deadline:
+                return job
+            await asyncio.sleep(interval)
+
+# ------------------------------------------------------------------
+# --- WORKLOADS ---
+# ------------------------------------------------------------------
+# Each workload issues one request (or one scripted flow) and returns the
+# final response; its latency is one sample. `expected` lists the status
+# codes that count as success.
+
+async def auth_register(ctx):
+    email = f"{ctx.unique('bench-signup-')}@example.com"
+    return await ctx.client.post("/api/auth/register", json={"email": email, "password": BENCHMARK_PASSWORD})
+
+async def auth_login(ctx):
+    index = ctx.rng.randint(1, ctx.users)
+    return await ctx.client.post(
+        "/api/auth/login", data={"username": benchmark_email(index), "password": BENCHMARK_PASSWORD}
+    )
+
+async def users_me(ctx):
+    return await ctx.client.get("/api/users/me", headers=ctx.auth())
+
+async def courses_list(ctx):
+    return await ctx.client.get(
+        "/api/courses", params={"cursor": ctx.rng.randint(0, ctx.courses), "limit": 20}, headers=ctx.auth()
+    )
+
+async def course_detail(ctx):
+    return await ctx.client.get(f"/api/courses/{ctx.course_id()}", headers=ctx.auth())
+
+async def search_selective(ctx):
+    """A query matching a handful of documents (one course's title, prefix-matched)."""
+    return await ctx.client.get("/api/search", params={"q": f"course {ctx.course_id()}"}, headers=ctx.auth())
+
+async def search_broad(ctx):
+    """A query matching every synthetic quiz question: ranking cost grows with the catalog."""
+    return await ctx.client.get(
+        "/api/search", params={"q": "synthetic question", "kind": "quiz_question"}, headers=ctx.auth()
+    )
+
+async def progress_submit(ctx):
+    body = {"video_id": ctx.video_id(), "quiz_score": ctx.rng.randint(0, 100), "is_completed": ctx.rng.random() < 0.5}
+    return await ctx.client.post("/api/progress", json=body, headers=ctx.auth())
+
+async def progress_batch(ctx):
+    body = [
+        {"video_id": ctx.video_id(), "quiz_score": ctx.rng.randint(0, 100), "is_completed": True}
+        for _ in range(50)
+    ]
+    return await ctx.client.post("/api/progress/batch", json=body, headers=ctx.auth())
+
+async def progress_list(ctx):
+    return await ctx.client.get("/api/progress", headers=ctx.auth())
+
+async def progress_dashboard(ctx):
+    return await ctx.client.get("/api/progress/courses", headers=ctx.auth())
+
+async def progress_course(ctx):
+    return await ctx.client.get(f"/api/progress/courses/{ctx.course_id()}", headers=ctx.auth())
+
+async def review_due(ctx):
+    """The next cards to review, out of the thousands each synthetic user has queued."""
+    return await ctx.client.get("/api/review/due", params={"limit": 20}, headers=ctx.auth())
+
+async def review_submit(ctx):
+    """A 20-answer review session (synthetic flashcard ids match video ids; 5 cards each)."""
+    body = [
+        {"flashcard_id": ctx.video_id(), "card_index": ctx.rng.randint(0, 4), "quality": ctx.rng.randint(0, 5)}
+        for _ in range(20)
+    ]
+    return await ctx.client.post("/api/review", json=body, headers=ctx.auth())
+
+async def content_generate(ctx):
+    """Queues a never-seen video (the job itself runs in the background)."""
+    url = f"https://www.youtube.com/watch?v={ctx.unique('gen')}"
+    response = await ctx.client.post("/api/content/generate", json={"youtube_url": url}, headers=ctx.auth())
+    if response.status_code == 202:
+        ctx.job_ids.append(response.json()["id"])
+    return response
+
+async def content_generate_existing(ctx):
+    """Re-requests a video that is already generated (no pipeline run)."""
+    url = f"https://www.youtube.com/watch?v={ctx.generated_video}"
+    return await ctx.client.post("/api/content/generate", json={"youtube_url": url}, headers=ctx.auth())
+
+async def content_job(ctx):
+    return await ctx.client.get(f"/api/content/jobs/{ctx.rng.choice(ctx.job_ids)}", headers=ctx.auth())
+
+async def content_batch(ctx):
+    body = {"video_ids": [ctx.unique("batch") for _ in range(3)], "title": "Benchmark Playlist"}
+    response = await ctx.client.post("/api/content/generate/batch", json=body, headers=ctx.auth())
+    if response.status_code == 202:
+        ctx.batch_ids.append(response.json()["id"])
+    return response
+
+async def content_batch_status(ctx):
+    return await ctx.client.get(f"/api/content/batches/{ctx.rng.choice(ctx.batch_ids)}", headers=ctx.auth())
+
+async def content_batch_resume(ctx):
+    # Batches that aren't failed answer 409; this measures the endpoint, not a rerun
+    return await ctx.client.post(f"/api/content/batches/{ctx.rng.choice(ctx.batch_ids)}/resume", headers=ctx.auth())
+
+async def pipeline_end_to_end(ctx):
+    """Submits a new video and polls until its job finishes: the full pipeline with fake providers."""
+    url = f"https://www.youtube.com/watch?v={ctx.unique('e2e')}"
+    response = await ctx.client.post("/api/content/generate", json={"youtube_url": url}, headers=ctx.auth())
+    job = await ctx.wait_for_job(response.json()["id"])
+    response.status_code = 200 if job["status"] == "succeeded" else 500
+    return response
+
+async def _prepare_generated_video(ctx):
+    ctx.generated_video = ctx.unique("done")
+    url = f"https://www.youtube.com/watch?v={ctx.generated_video}"
+    response = await ctx.client.post("/api/content/generate", json={"youtube_url": url}, headers=ctx.auth())
+    await ctx.wait_for_job(response.json()["id"])
+
+async def _drain_background_work(ctx, timeout: float = 600.0):
+    # Let earlier workloads' jobs and batches finish so they don't queue ahead of these
+    for job_id in ctx.job_ids:
+        await ctx.wait_for_job(job_id, timeout=timeout)
+    deadline = time.perf_counter() + timeout
+    for batch_id in ctx.batch_ids:
+        while time.perf_counter() < deadline:
+            batch = (await ctx.client.get(f"/api/content/batches/{batch_id}", headers=ctx.auth())).json()
+            if batch["status"] not in ("queued", "running"):
+                break
+            await asyncio.sleep(0.05)
+
+# (name, workload, expected status codes, share of --requests, setup)
+# Generation workloads go last so their background jobs don't skew the rest.
+WORKLOADS = [
+    ("auth_register", auth_register, {200}, 0.1, None),
+    ("auth_login", auth_login, {200}, 0.1, None),
+    ("users_me", users_me, {200}, 1.0, None),
+    ("courses_list", courses_list, {200}, 1.0, None),
+    ("course_detail", course_detail, {200}, 1.0, None),
+    ("search_selective", search_selective, {200}, 1.0, None),
+    ("search_broad", search_broad, {200}, 0.2, None),
+    ("progress_submit", progress_submit, {200}, 1.0, None),
+    ("progress_batch", progress_batch, {200}, 0.2, None),
+    ("progress_list", progress_list, {200}, 1.0, None),
+    ("progress_dashboard", progress_dashboard, {200}, 1.0, None),
+    ("progress_course", progress_course, {200}, 1.0, None),
+    ("review_due", review_due, {200}, 1.0, None),
+    ("review_submit", review_submit, {200}, 0.5, None),
+    ("content_generate_existing", content_generate_existing, {200}, 1.0, _prepare_generated_video),
+    ("content_generate", content_generate, {202}, 0.2, None),
+    ("content_job", content_job, {200}, 1.0, None),
+    ("content_batch", content_batch, {202}, 0.1, None),
+    ("content_batch_status", content_batch_status, {200}, 1.0, None),
+    ("content_batch_resume", content_batch_resume, {202, 409}, 0.2, None),
+    ("pipeline_end_to_end", pipeline_end_to_end, {200}, 0.05, _drain_background_work),
+]
+
+# ------------------------------------------------------------------
+# --- RUNNER ---
+# ------------------------------------------------------------------
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def run_workload(ctx, workload, expected: set[int], requests: int, concurrency: int) -> dict:
+    """Issues `requests` calls of a workload, `concurrency` at a time, and summarizes their latency."""
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await workload(ctx)
+                ok = response.status_code in expected
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "throughput_rps": requests / wall if wall else 0.0,
+    }
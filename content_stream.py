@@ -0,0 +1,149 @@
+# content_stream.py
+
+import asyncio
+from typing import AsyncIterator
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from jobs import job_queue
+from metrics import track_stage
+from services import get_course_payload
+
+# ------------------------------------------------------------------
+# --- SERVER-SENT EVENTS FOR CONTENT GENERATION ---
+# ------------------------------------------------------------------
+# Event stream of GET/POST /api/content/generate/stream, in order:
+#
+#   job               {job_id, youtube_id, status}          always first
+#   transcript        {available, characters, segments}
+#   quiz_question     {index, question, options, correct, ...}
+#   flashcard         {index, front, back}
+#   content_reset     {content_type}                        drop that type's items so far
+#   content_done      {content_type, video_title, items, generated_by}
+#   content_error     {content_type, error}                 per failed content type
+#   done              {job_id, status, course_id, error}    always last
+#
+# quiz_question and flashcard events interleave, as both chains run at once.
+# Items are streamed before the whole answer is validated: when validation
+# rejects it, content_reset is sent and the repaired (or escalated) answer's
+# items follow from index 0.
+# A video that is already generated replays its stored items straight away.
+# If another worker is generating the video, or jobs run in a separate
+# generation worker (GENERATION_RUNNER=external), the stream ends with
+# `in_progress` instead of `done`: poll GET /api/content/jobs/{job_id}.
+
+# SSE event name of each content type's items
+ITEM_EVENTS = {"quiz": "quiz_question", "flashcards": "flashcard"}
+
+# Generations outlive their request, so a client that disconnects mid-stream
+# still gets its course; keep the tasks referenced until they finish.
+_generations: set[asyncio.Task] = set()
+
+def sse(event: str, data: dict) -> bytes:
+    """One server-sent event."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+def _job_event(job_id: str, youtube_id: str, status: str) -> bytes:
+    return sse("job", {"job_id": job_id, "youtube_id": youtube_id, "status": status})
+
+async def open_stream(db: AsyncSession, youtube_id: str, user_id: int, force_refresh: bool = False,
+                      generation_mode: str | None = None) -> AsyncIterator[bytes]:
+    """
+    Claims generation of a video for this request, then returns its event
+    stream. The job is recorded like any queued job, so polling clients and
+    POST /api/content/generate see (and reuse) it while it streams.
+    """
+    job = await db.run_sync(
+        job_queue.submit, youtube_id, user_id=user_id, force_refresh=force_refresh, dispatch=False,
+        generation_mode=generation_mode
+    )
+    job_id, status, course_id = job.id, job.status, job.course_id
+
+    if status == "succeeded":
+        payload = await get_course_payload(db, course_id)
+        return _replay(job_id, youtube_id, course_id, orjson.loads(payload) if payload else None)
+
+    if status == "queued" and job_queue.inline and await db.run_sync(job_queue.claim, job_id):
+        return _generate(job_id, youtube_id, job.force_refresh, job.generation_mode)
+
+    return _in_progress(job_id, youtube_id, status)
+
+async def _replay(job_id: str, youtube_id: str, course_id: int, course: dict | None) -> AsyncIterator[bytes]:
+    """Streams content that was generated earlier, from the stored course."""
+    yield _job_event(job_id, youtube_id, "succeeded")
+    for video in (course or {}).get("videos", []):
+        if video["youtube_id"] != youtube_id:
+            continue
+        for content_type, rows, field in (("quiz", video["quizzes"], "question_data"),
+                                          ("flashcards", video["flashcards"], "flashcard_data")):
+            items = [item for row in rows for item in row[field]]
+            for index, item in enumerate(items):
+                yield sse(ITEM_EVENTS[content_type], {"index": index, **item})
+            yield sse("content_done", {
+                "content_type": content_type, "video_title": video["title"], "items": len(items), "generated_by": None
+            })
+    yield sse("done", {"job_id": job_id, "status": "succeeded", "course_id": course_id, "error": None})
+
+async def _in_progress(job_id: str, youtube_id: str, status: str) -> AsyncIterator[bytes]:
+    yield _job_event(job_id, youtube_id, status)
+    yield sse("in_progress", {"job_id": job_id, "detail": "Generation is running elsewhere; poll the job."})
+
+async def _generate(job_id: str, youtube_id: str, force_refresh: bool, generation_mode: str | None) -> AsyncIterator[bytes]:
+    """Runs a claimed job in the background and relays its progress."""
+    events: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_run_job(job_id, youtube_id, force_refresh, generation_mode, events))
+    _generations.add(task)
+    task.add_done_callback(_generations.discard)
+
+    yield _job_event(job_id, youtube_id, "running")
+    while True:
+        event = await events.get()
+        yield event
+        if event.startswith(b"event: done\n"):
+            return
+
+async def _run_job(job_id: str, youtube_id: str, force_refresh: bool, generation_mode: str | None,
+                   events: asyncio.Queue):
+    # Imported here so API processes only load the AI stack once they generate something
+    from ai_pipeline import astream_content
+
+    results, errors = {}, {}
+    error = None
+    try:
+        with track_stage("generate"):
+            async for event, data in astream_content(youtube_id, force_refresh=force_refresh, mode=generation_mode):
+                if event == "item":
+                    content_type = data["content_type"]
+                    name = ITEM_EVENTS.get(content_type, f"{content_type}_item")
+                    events.put_nowait(sse(name, {"index": data["index"], **data["item"]}))
+                elif event == "result":
+                    output = data["output"]
+                    results[data["content_type"]] = output
+                    items = output.get(data["content_type"])
+                    events.put_nowait(sse("content_done", {
+                        "content_type": data["content_type"],
+                        "video_title": output.get("video_title"),
+                        "items": len(items) if isinstance(items, list) else None,
+                        "generated_by": output.get("generated_by"),
+                    }))
+                elif event == "reset":
+                    events.put_nowait(sse("content_reset", data))
+                elif event == "error":
+                    errors[data["content_type"]] = data["error"]
+                    print(f"AI Generation Warning ({data['content_type']}): {data['error']}")
+                    events.put_nowait(sse("content_error", data))
+                else:
+                    events.put_nowait(sse(event, data))
+        if not results:
+            error = RuntimeError(f"All generation chains failed: {errors}")
+    except Exception as e:
+        error = e
+
+    try:
+        job = await asyncio.to_thread(job_queue.finish, job_id, results.get("quiz"), results.get("flashcards"), error)
+        done = {"job_id": job_id, "status": job.status, "course_id": job.course_id, "error": job.error}
+    except Exception as e:
+        print(f"AI Generation Error (job {job_id}): {e}")
+        done = {"job_id": job_id, "status": "failed", "course_id": None, "error": str(e)}
+    events.put_nowait(sse("done", done))
@@ -0,0 +1,30 @@
+# course_cache.py
+
+import os
+
+from ttl_cache import TTLCache
+
+# --- Configuration ---
+COURSE_CACHE_MAX_ENTRIES = int(os.getenv("COURSE_CACHE_MAX_ENTRIES", "512"))
+# Writers in this process invalidate entries immediately; the TTL bounds how
+# long a write made by another process (seed_db, the batch CLI, another
+# uvicorn worker) can stay invisible.
+COURSE_CACHE_TTL_SECONDS = float(os.getenv("COURSE_CACHE_TTL_SECONDS", "300"))
+
+# ------------------------------------------------------------------
+# --- SERIALIZED COURSE PAYLOADS ---
+# ------------------------------------------------------------------
+
+class CoursePayloadCache(TTLCache):
+    """
+    An in-process LRU of fully serialized CourseSchema JSON bytes, keyed by
+    course ID. Call invalidate(course_id) after committing any change to a
+    course's tree.
+    """
+
+    def __init__(self, max_entries: int = COURSE_CACHE_MAX_ENTRIES, ttl_seconds: float = COURSE_CACHE_TTL_SECONDS):
+        super().__init__(max_entries, ttl_seconds)
+
+
+# Shared instance used by the course read path and its writers
+course_cache = CoursePayloadCache()
@@ -0,0 +1,252 @@
+# course_import.py
+
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+from models import Course, Video, Quiz, Flashcard
+from batch import normalize_manifest
+from course_cache import course_cache
+from search_index import index_course
+from services import delete_review_states
+
+# --- Configuration ---
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 2)))
+# Manifests handed to the pool but not yet imported, per worker. Keeps
+# memory flat however long the input stream is.
+IMPORT_QUEUE_PER_WORKER = 4
+# Characters read at a time from a .json array of manifests
+JSON_READ_CHUNK = 64 * 1024
+
+COURSE_FIELDS = ("title", "description", "playlist_id", "thumbnail_url")
+VIDEO_FIELDS = ("order_index", "title", "duration_seconds")
+
+# ------------------------------------------------------------------
+# --- SOURCES ---
+# ------------------------------------------------------------------
+# Each source yields (label, json_text) with one course manifest per item,
+# reading its input lazily so only the manifests in flight are in memory.
+
+def iter_ndjson(stream, name: str = "stdin") -> Iterator[tuple[str, str]]:
+    """One manifest per non-blank line."""
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield f"{name}:{line_number}", line
+
+def iter_json(stream, name: str) -> Iterator[tuple[str, str]]:
+    """
+    A .json document: either one manifest, or a top-level array of them.
+    Arrays are split a chunk at a time, so only the manifest being decoded
+    is held in memory rather than the whole file.
+    """
+    buffer = ""
+    while not buffer:
+        chunk = stream.read(JSON_READ_CHUNK)
+        buffer = chunk.lstrip()
+        if not chunk:
+            break
+    if not buffer.startswith("["):
+        yield name, buffer + stream.read()
+        return
+
+    decoder = json.JSONDecoder()
+    buffer, index, separated = buffer[1:], 0, True
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            buffer = stream.read(JSON_READ_CHUNK)
+            if not buffer:
+                raise ValueError(f"{name}: unterminated JSON array")
+            continue
+        if buffer[0] == "]":
+            return
+        if not separated:
+            if buffer[0] != ",":
+                raise ValueError(f"{name}: expected ',' after manifest {index - 1}")
+            buffer, separated = buffer[1:], True
+            continue
+        try:
+            _, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            # Incomplete manifest: read more (at least doubling the buffer,
+            # so a large manifest is re-scanned a logarithmic number of times)
+            more = stream.read(max(JSON_READ_CHUNK, len(buffer)))
+            if not more:
+                raise
+            buffer += more
+            continue
+        yield f"{name}[{index}]", buffer[:end]
+        buffer, index, separated = buffer[end:], index + 1, False
+
+def iter_path(path: str) -> Iterator[tuple[str, str]]:
+    """
+    A .json manifest (or array of manifests), an .ndjson/.jsonl stream, or a
+    directory of either (searched recursively, in name order).
+    """
+    root = Path(path)
+    files = sorted(p for p in root.rglob("*") if p.is_file()) if root.is_dir() else [root]
+    for file in files:
+        if file.suffix in (".ndjson", ".jsonl"):
+            with open(file, "r") as f:
+                yield from iter_ndjson(f, name=str(file))
+        elif file.suffix == ".json":
+            with open(file, "r") as f:
+                yield from iter_json(f, name=str(file))
+
+# ------------------------------------------------------------------
+# --- IMPORT ---
+# ------------------------------------------------------------------
+
+def import_course(db: Session, manifest: dict) -> tuple[int, dict]:
+    """
+    Upserts one course manifest (same shape as course_data.json, optionally
+    with a "flashcards" list per video) in a single transaction, using bulk
+    statements rather than one round trip per row.
+
+    The course is matched by "id", else by "playlist_id"; videos by
+    youtube_id within the course, so their ids (and any user progress on
+    them) survive a re-import. A video's quiz/flashcards are replaced when
+    the manifest provides them, and the course's search documents are
+    rebuilt. Returns the course ID and the number of rows written per table.
+
+    The caller invalidates course_cache if its process serves the course.
+    """
+    manifest = normalize_manifest(manifest) if manifest.get("videos") else {**manifest, "videos": []}
+    course_values = {field: manifest.get(field) for field in COURSE_FIELDS}
+
+    try:
+        course_id = manifest.get("id")
+        if course_id is None and manifest.get("playlist_id"):
+            course_id = db.scalar(select(Course.id).where(Course.playlist_id == manifest["playlist_id"]))
+
+        if course_id is not None and db.scalar(select(Course.id).where(Course.id == course_id)) is not None:
+            db.execute(update(Course).where(Course.id == course_id).values(**course_values))
+        else:
+            if course_id is not None:
+                course_values["id"] = course_id
+            course_id = db.execute(insert(Course).values(**course_values).returning(Course.id)).scalar_one()
+
+        # Videos: update the ones already in the course, bulk insert the rest
+        video_ids = dict(db.execute(
+            select(Video.youtube_id, Video.id).where(Video.course_id == course_id)
+        ).all())
+        updates, inserts = [], []
+        for entry in manifest["videos"]:
+            values = {field: entry.get(field) for field in VIDEO_FIELDS}
+            if entry["youtube_id"] in video_ids:
+                updates.append({"id": video_ids[entry["youtube_id"]], **values})
+            else:
+                inserts.append({"course_id": course_id, "youtube_id": entry["youtube_id"], **values})
+        if updates:
+            db.execute(update(Video), updates)
+        if inserts:
+            new_ids = db.scalars(
+                insert(Video).returning(Video.id, sort_by_parameter_order=True), inserts
+            ).all()
+            video_ids.update(zip((row["youtube_id"] for row in inserts), new_ids))
+
+        # Generated content: replace whatever the manifest provides
+        counts = {"courses": 1, "videos": len(updates) + len(inserts)}
+        for model, key, column in ((Quiz, "quiz", "question_data"), (Flashcard, "flashcards", "flashcard_data")):
+            entries = [entry for entry in manifest["videos"] if entry.get(key) is not None]
+            if entries:
+                ids = [video_ids[entry["youtube_id"]] for entry in entries]
+                if model is Flashcard:
+                    # Replaced cards start over in everyone's review queue
+                    delete_review_states(db, ids)
+                db.execute(delete(model).where(model.video_id.in_(ids)))
+                db.execute(insert(model), [
+                    {"video_id": video_id, column: entry[key]} for video_id, entry in zip(ids, entries)
+                ])
+            counts[model.__tablename__] = len(entries)
+
+        # Everything above went out as statements, so the index sees it all
+        index_course(db, course_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return course_id, counts
+
+def _init_worker():
+    # Connections inherited through fork() belong to the parent; start fresh
+    engine.dispose(close=False)
+
+def _import_item(item: tuple[str, str]) -> tuple[str, int | None, dict | None, str | None]:
+    """Worker body: parses and imports one manifest. Returns (label, course_id, counts, error)."""
+    label, text = item
+    db = SessionLocal()
+    try:
+        return label, *import_course(db, json.loads(text)), None
+    except Exception as e:
+        # First line only: database errors go on to echo the whole statement
+        return label, None, None, f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+    finally:
+        db.close()
+
+def import_manifests(items: Iterable[tuple[str, str]], workers: int = IMPORT_WORKERS, on_result=None) -> dict:
+    """
+    Imports manifests from a source, `workers` at a time in separate
+    processes (one transaction per course). A failing manifest is reported
+    and skipped; the others still import. `on_result(label, counts, error)`
+    is called as each one finishes.
+
+    Imported courses are invalidated in this process's course_cache (the
+    workers' caches are thrown away with them). Other processes, such as
+    running API workers, see the changes once their cached payloads expire
+    (COURSE_CACHE_TTL_SECONDS) or they restart.
+
+    Returns totals per table plus elapsed seconds and rows per second.
+    """
+    totals = {"courses": 0, "videos": 0, "quizzes": 0, "flashcards": 0}
+    errors = {}
+    started = time.perf_counter()
+
+    def record(result):
+        label, course_id, counts, error = result
+        if error:
+            errors[label] = error
+        else:
+            course_cache.invalidate(course_id)
+            for table, count in counts.items():
+                totals[table] += count
+        if on_result:
+            on_result(label, counts, error)
+
+    if workers <= 1:
+        for item in items:
+            record(_import_item(item))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending = set()
+            for item in items:
+                if len(pending) >= workers * IMPORT_QUEUE_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+                pending.add(pool.submit(_import_item, item))
+            for future in wait(pending).done:
+                record(future.result())
+
+    seconds = time.perf_counter() - started
+    rows = sum(totals.values())
+    return {
+        **totals,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+        "errors": errors,
+    }
+
+def iter_source(source: str) -> Iterator[tuple[str, str]]:
+    """'-' reads NDJSON from stdin; anything else is a file or directory path."""
+    return iter_ndjson(sys.stdin) if source == "-" else iter_path(source)
@@ -0,0 +1,130 @@
+# db_cache.py
+
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+
+from database import SessionLocal, engine
+
+# ------------------------------------------------------------------
+# --- DATABASE-BACKED LRU WITH EXPIRY ---
+# ------------------------------------------------------------------
+
+class DBCache:
+    """
+    Shared machinery of the caches persisted in a table: rows expire
+    `ttl_seconds` after they were stored, the least recently used ones are
+    evicted beyond `max_size`, and hits/misses/evictions are counted in
+    process.
+
+    Subclasses set `model` (with `id` and `last_accessed_at` columns),
+    `stored_at` (the column recording when a row was written) and, to bound
+    the cache by a per-row size instead of by row count, `size_column`.
+    """
+
+    model = None
+    stored_at = "created_at"
+    size_column: Optional[str] = None
+
+    def __init__(self, session_factory=SessionLocal, ttl_seconds: int = 0, max_size: int = 0):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._table_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _ensure_table(self):
+        # The caches are also used outside the API (CLI runs of ai_pipeline),
+        # so they cannot rely on the app having created the schema.
+        if not self._table_ready:
+            self.model.__table__.create(bind=engine, checkfirst=True)
+            self._table_ready = True
+
+    def _first_fresh(self, db, rows):
+        """
+        The first of `rows` (in preference order) that hasn't expired, marked
+        as used, or None. Expired rows are deleted so the caller refetches.
+        Counts the hit or miss and commits.
+        """
+        now = datetime.utcnow()
+        for row in rows:
+            if row is None:
+                continue
+            if now - getattr(row, self.stored_at) > self.ttl:
+                db.delete(row)
+                db.commit()
+                continue
+            row.last_accessed_at = now
+            db.commit()
+            self._count("hits")
+            return row
+        self._count("misses")
+        return None
+
+    def _store(self, match: dict, values: dict):
+        """Inserts or updates the row matching `match` with `values`, then enforces the size bound."""
+        self._ensure_table()
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            row = db.query(self.model).filter_by(**match).first()
+            if row is None:
+                row = self.model(**match)
+                db.add(row)
+            for name, value in {**values, self.stored_at: now, "last_accessed_at": now}.items():
+                setattr(row, name, value)
+            db.flush()
+            self._evict(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _evict(self, db):
+        """Deletes expired rows, then least recently used rows until within max_size."""
+        model = self.model
+        expired = db.query(model).filter(
+            getattr(model, self.stored_at) < datetime.utcnow() - self.ttl
+        ).delete(synchronize_session=False)
+        self._count("evictions", expired)
+
+        if self.size_column is None:
+            overflow = db.query(func.count(model.id)).scalar() - self.max_size
+            if overflow <= 0:
+                return
+            stale_ids = [row.id for row in db.query(model.id).order_by(model.last_accessed_at.asc()).limit(overflow)]
+        else:
+            size = getattr(model, self.size_column)
+            overflow = (db.query(func.sum(size)).scalar() or 0) - self.max_size
+            if overflow <= 0:
+                return
+            stale_ids = []
+            for row in db.query(model.id, size.label("size")).order_by(model.last_accessed_at.asc()):
+                if overflow <= 0:
+                    break
+                stale_ids.append(row.id)
+                overflow -= row.size
+        db.query(model).filter(model.id.in_(stale_ids)).delete(synchronize_session=False)
+        self._count("evictions", len(stale_ids))
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def stats(self) -> dict:
+        """Returns the in-process hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,42 @@
+# generation_config.py
+
+import os
+
+# ------------------------------------------------------------------
+# --- GENERATION SETTINGS ---
+# ------------------------------------------------------------------
+# Plain settings shared by the API and the AI pipeline. Kept apart from
+# ai_pipeline.py so that importing them doesn't load LangChain, the Gemini
+# client or the transcript API (see GENERATION_RUNNER in jobs.py).
+
+# "separate" runs one chain per content type; "combined" asks for the quiz and
+# the flashcards in a single call, paying for the transcript's input tokens
+# once. Long (map-reduced) transcripts always run per type.
+GENERATION_MODES = ("separate", "combined")
+GENERATION_MODE = os.getenv("GENERATION_MODE", "separate")
+
+def resolve_generation_mode(mode: str | None = None) -> str:
+    """The requested generation mode, or the GENERATION_MODE default."""
+    mode = mode or GENERATION_MODE
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode '{mode}' (expected one of {', '.join(GENERATION_MODES)}).")
+    return mode
+
+# Models tried in order, cheapest first (see 3c. Model Routing in
+# ai_pipeline.py). The last one is the quality backstop and the default for
+# build_chain().
+MODEL_TIERS = [
+    model.strip() for model in os.getenv("GENERATION_MODEL_TIERS", "gemini-2.5-flash,gemini-2.5-pro").split(",")
+    if model.strip()
+]
+GENERATION_MODEL = MODEL_TIERS[-1]
+MODEL_ROUTE = ">".join(MODEL_TIERS)
+
+# Bump when the prompts or output schemas change. Stored with generated
+# content, so videos generated by an older version are regenerated on request.
+PROMPT_VERSION = 2
+GENERATION_VERSION = f"{MODEL_ROUTE}/prompts-v{PROMPT_VERSION}"
+
+# Build the generation engine (and import the AI stack) at API startup rather
+# than on the first generation. Only applies when jobs run in the API process.
+PRELOAD_AI_STACK = os.getenv("PRELOAD_AI_STACK", "false").lower() in ("1", "true", "yes")
@@ -0,0 +1,170 @@
+# generation_engine.py
+
+import abc
+import asyncio
+import threading
+import weakref
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+# ------------------------------------------------------------------
+# --- PROVIDERS ---
+# ------------------------------------------------------------------
+
+class LLMProvider(abc.ABC):
+    """
+    Where chat models come from. The engine asks once per model name and
+    event loop and keeps the result, so implementations may do expensive
+    client setup in chat_model(). Swap in benchmarks.fakes.FakeProvider to
+    run the whole pipeline without Gemini.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def chat_model(self, model: str) -> BaseChatModel:
+        """A chat model client for `model`."""
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through langchain-google-genai."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str | None = None, temperature: float = 0.0):
+        self.api_key = api_key
+        self.temperature = temperature
+
+    def chat_model(self, model: str) -> BaseChatModel:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        # The key is passed explicitly rather than through os.environ
+        options = {"google_api_key": self.api_key} if self.api_key else {}
+        return ChatGoogleGenerativeAI(model=model, temperature=self.temperature, **options)
+
+# ------------------------------------------------------------------
+# --- PROMPTS ---
+# ------------------------------------------------------------------
+
+REPAIR_PROMPT = (
+    "Your previous answer is not valid. Problems found:\n{errors}\n"
+    "Answer again, fixing every problem while keeping the content accurate to the video. "
+    "The output MUST strictly follow the provided JSON schema. Do not include any text outside the JSON block."
+)
+
+@dataclass(frozen=True)
+class PromptSpec:
+    """Everything about one (schema, system prompt) pair that doesn't change between calls."""
+    schema: type[BaseModel]
+    system_prompt: str
+    parser: JsonOutputParser
+    format_instructions: str
+    prompt: ChatPromptTemplate
+    # The prompt plus the rejected answer ({previous}) and its problems ({errors})
+    repair_prompt: ChatPromptTemplate
+
+def build_prompt_spec(schema: type[BaseModel], system_prompt: str) -> PromptSpec:
+    parser = JsonOutputParser(pydantic_object=schema)
+    format_instructions = parser.get_format_instructions()
+    messages = [
+        ("system", system_prompt),
+        ("user", "Video Content: {content}"),
+        ("user", "Output Format: {format_instructions}"),
+    ]
+    return PromptSpec(
+        schema=schema,
+        system_prompt=system_prompt,
+        parser=parser,
+        format_instructions=format_instructions,
+        prompt=ChatPromptTemplate.from_messages(messages).partial(format_instructions=format_instructions),
+        repair_prompt=ChatPromptTemplate.from_messages(
+            messages + [("ai", "{previous}"), ("user", REPAIR_PROMPT)]
+        ).partial(format_instructions=format_instructions),
+    )
+
+# ------------------------------------------------------------------
+# --- ENGINE ---
+# ------------------------------------------------------------------
+
+class GenerationEngine:
+    """
+    Long-lived home of everything generation reuses between requests:
+    prompt specs (templates, parsers, format instructions) built once per
+    (schema, system prompt), and chat model clients built once per model.
+
+    Async HTTP clients belong to the event loop they were first used on,
+    so chat models are kept per loop. Synchronous callers (job and batch
+    workers) go through run(), which executes on one background loop owned
+    by the engine, so they all share the same warm connections.
+    """
+
+    def __init__(self, provider: LLMProvider):
+        self.provider = provider
+        self._specs: dict[tuple[type[BaseModel], str], PromptSpec] = {}
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def set_provider(self, provider: LLMProvider):
+        """Replaces the provider; clients built by the old one are dropped."""
+        with self._lock:
+            self.provider = provider
+            self._clients = weakref.WeakKeyDictionary()
+
+    def register(self, schema: type[BaseModel], system_prompt: str) -> PromptSpec:
+        """Builds (once) and returns the spec for a schema and system prompt."""
+        key = (schema, system_prompt)
+        spec = self._specs.get(key)
+        if spec is None:
+            spec = build_prompt_spec(schema, system_prompt)
+            with self._lock:
+                spec = self._specs.setdefault(key, spec)
+        return spec
+
+    # Specs are looked up by the same pair they were registered with
+    spec = register
+
+    def chat_model(self, model: str) -> BaseChatModel:
+        """The warm client for `model` on the running event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self._ensure_loop()
+        with self._lock:
+            clients = self._clients.setdefault(loop, {})
+            client = clients.get(model)
+            if client is None:
+                client = clients[model] = self.provider.chat_model(model)
+            return client
+
+    def run(self, coroutine):
+        """Runs a coroutine on the engine's loop and waits for its result (for synchronous callers)."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    def warm(self, models: list[str]):
+        """
+        Builds the clients for `models` ahead of the first request: on the
+        engine's loop and, when called from async code, on the running loop.
+        """
+        async def build():
+            for model in models:
+                self.chat_model(model)
+        self.run(build())
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        for model in models:
+            self.chat_model(model)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="generation-engine", daemon=True
+                ).start()
+            return self._loop
@@ -0,0 +1,47 @@
+import argparse
+import time
+from database import engine
+from migrations import migrate
+from jobs import JobQueue, GENERATION_WORKERS
+from generation_config import MODEL_TIERS
+
+# Usage:
+#   GENERATION_RUNNER=external uvicorn main:app --workers 8   # lean API workers: never import the AI stack
+#   python generation_worker.py --workers 4                   # runs the jobs and batches they queue
+#
+# The API records jobs as 'queued' in generation_jobs / generation_batches and
+# this process polls for them. Several worker processes may share a database:
+# each claim is atomic, and work left 'running' is only taken over once its
+# owner stops renewing the lease (JOB_LEASE_SECONDS, see leases.py).
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued generation jobs outside the API processes.")
+    parser.add_argument("--workers", type=int, default=GENERATION_WORKERS, help="Jobs generated at the same time.")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between checks for new jobs.")
+    args = parser.parse_args()
+
+    migrate(engine)
+
+    from ai_pipeline import get_engine
+    try:
+        get_engine().warm(MODEL_TIERS)
+    except Exception as e:
+        print(f"Generation engine warm-up failed (clients will be built on first use): {e}")
+
+    queue = JobQueue(max_workers=args.workers, inline=True)
+    queue.start()
+    resumed = queue.resume_pending()
+    print(f"Generation worker running with {args.workers} worker(s); resumed {resumed} pending job(s).")
+    try:
+        while True:
+            time.sleep(args.poll_interval)
+            dispatched = queue.dispatch_queued()
+            if dispatched:
+                print(f"Dispatched {dispatched} queued job(s).")
+    except KeyboardInterrupt:
+        print("Stopping; unfinished jobs are resumed on the next start.")
+    finally:
+        queue.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+from database import engine
+from migrations import migrate
+from course_import import import_manifests, iter_source, IMPORT_WORKERS
+
+# Usage:
+#   python import_courses.py catalog/                 # every *.json / *.ndjson under a directory
+#   python import_courses.py courses.ndjson --workers 8
+#   cat courses.ndjson | python import_courses.py -
+#
+# Running API workers cache course payloads in process: they serve imported
+# changes once COURSE_CACHE_TTL_SECONDS passes (or after a restart).
+
+PROGRESS_EVERY = 500 # courses
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import (upsert) course manifests into the database.")
+    parser.add_argument("sources", nargs="+", help="Manifest files, NDJSON streams or directories; '-' reads NDJSON from stdin.")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="Import processes (1 imports in-process).")
+    args = parser.parse_args()
+
+    migrate(engine)
+
+    imported = 0
+    def print_progress(label: str, counts: dict | None, error: str | None):
+        nonlocal imported
+        if error:
+            print(f"  ❌ {label}: {error}")
+            return
+        imported += 1
+        if imported % PROGRESS_EVERY == 0:
+            print(f"  {imported} courses imported...")
+
+    def items():
+        for source in args.sources:
+            yield from iter_source(source)
+
+    result = import_manifests(items(), workers=args.workers, on_result=print_progress)
+
+    print(f"✅ Imported {result['courses']} courses ({result['videos']} videos, {result['quizzes']} quizzes, "
+          f"{result['flashcards']} flashcard sets): {result['rows']} rows in {result['seconds']:.2f}s "
+          f"({result['rows_per_second']:.0f} rows/s).")
+    if result["errors"]:
+        print(f"❌ {len(result['errors'])} manifest(s) failed.")
+
+if __name__ == "__main__":
+    main()
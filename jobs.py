@@ -0,0 +1,332 @@
+# jobs.py
+
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import GenerationJob
+from generation_config import resolve_generation_mode, GENERATION_VERSION
+from services import save_generated_content, get_generated_content
+from batch import create_batch, run_batch
+from metrics import track_stage, GENERATION_JOBS
+from models import GenerationBatch
+from leases import claim_values, expire_leases, lease_keeper
+
+# --- Configuration ---
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "2"))
+# "inline" runs jobs in the API process's thread pool, importing the AI stack
+# on the first one. "external" only records them as queued, for
+# generation_worker.py to run, so API workers never load the AI stack.
+GENERATION_RUNNER = os.getenv("GENERATION_RUNNER", "inline")
+if GENERATION_RUNNER not in ("inline", "external"):
+    raise ValueError(f"Unknown GENERATION_RUNNER '{GENERATION_RUNNER}' (expected inline or external).")
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# ------------------------------------------------------------------
+# --- JOB QUEUE ---
+# ------------------------------------------------------------------
+
+class JobQueue:
+    """
+    Runs the AI pipeline in a bounded thread pool, off the API event loop.
+
+    The `generation_jobs` table is the source of truth: a job is committed as
+    'queued' before it is handed to the pool, so anything still queued when
+    the process dies is picked up again by resume_pending() on the next start.
+    Running jobs and batches carry a lease (see leases.py): once its owner
+    stops renewing it, any started queue re-queues and runs the work again,
+    but never work another live process is still running.
+    With inline=False nothing is dispatched: jobs and batches stay queued in
+    the table for a generation worker process (see generation_worker.py).
+    """
+
+    def __init__(self, max_workers: int = GENERATION_WORKERS, session_factory=SessionLocal,
+                 inline: bool = GENERATION_RUNNER == "inline"):
+        self.max_workers = max_workers
+        self.session_factory = session_factory
+        self.inline = inline
+        self._executor: ThreadPoolExecutor | None = None
+        # IDs handed to the pool and not finished yet, so polling doesn't dispatch them twice
+        self._dispatched: set[str] = set()
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="generation")
+        if self.inline:
+            lease_keeper.add_listener(self.recover)
+            lease_keeper.start()
+
+    def shutdown(self):
+        # Queued jobs stay 'queued' in the table and are resumed on the next start
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, db: Session, youtube_id: str, user_id: int | None = None,
+               force_refresh: bool = False, dispatch: bool = True,
+               generation_mode: str | None = None) -> GenerationJob:
+        """
+        Enqueues generation for a video and returns its job. If a job for the
+        same video is already queued or running, that job is returned instead.
+
+        A video already generated by the current GENERATION_VERSION is not
+        queued at all and nothing is written: the latest job that produced its
+        course is returned, or, for content saved another way (e.g. by a
+        playlist batch), an unsaved succeeded job pointing at the course.
+        Content saved with a content type missing never matches, so it is
+        queued again. force_refresh always regenerates.
+        With dispatch=False the job is only recorded, for the caller to claim().
+        generation_mode picks "separate" or "combined" (default: GENERATION_MODE).
+        """
+        if generation_mode is not None:
+            resolve_generation_mode(generation_mode)  # reject unknown modes before recording anything
+
+        existing = self._active_job(db, youtube_id)
+        if existing:
+            return existing
+
+        generated = None if force_refresh else get_generated_content(db, youtube_id, GENERATION_VERSION)
+        if generated:
+            job = self._latest_job(db, youtube_id, generated.course_id)
+            if job:
+                return job
+            # Not added to the session: repeat requests for popular videos cost no writes
+            now = datetime.utcnow()
+            return GenerationJob(
+                id=uuid.uuid4().hex,
+                youtube_id=youtube_id,
+                requested_by=user_id,
+                status="succeeded",
+                course_id=generated.course_id,
+                created_at=now,
+                started_at=now,
+                finished_at=now
+            )
+
+        job = GenerationJob(
+            id=uuid.uuid4().hex,
+            youtube_id=youtube_id,
+            requested_by=user_id,
+            status="queued",
+            force_refresh=force_refresh,
+            generation_mode=generation_mode,
+            created_at=datetime.utcnow()
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Lost the race against a concurrent submission for the same video
+            db.rollback()
+            return self._active_job(db, youtube_id)
+
+        db.refresh(job)
+        if dispatch:
+            self._dispatch(job.id)
+        return job
+
+    def claim(self, db: Session, job_id: str) -> bool:
+        """Atomically moves a queued job to 'running'. False if someone else got it first."""
+        claimed = db.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.status == "queued"
+        ).update(claim_values(GenerationJob), synchronize_session=False)
+        db.commit()
+        if claimed:
+            lease_keeper.start()
+        return bool(claimed)
+
+    def finish(self, job_id: str, quiz_data: dict | None = None, flashcard_data: dict | None = None,
+               error: Exception | None = None) -> GenerationJob:
+        """Saves a claimed job's output (or records its failure) from a caller outside the pool."""
+        db = self.session_factory()
+        try:
+            job = self._finish(db, job_id, quiz_data, flashcard_data, error)
+            db.refresh(job)
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def submit_batch(self, db: Session, manifest: dict, user_id: int | None = None,
+                     concurrency: int | None = None, force_refresh: bool = False,
+                     generation_mode: str | None = None) -> GenerationBatch:
+        """Creates a playlist batch and hands it to the pool. One batch occupies one worker."""
+        options = {"concurrency": concurrency} if concurrency else {}
+        batch = create_batch(
+            db, manifest, user_id=user_id, force_refresh=force_refresh, generation_mode=generation_mode, **options
+        )
+        self._dispatch_batch(batch.id)
+        return batch
+
+    def resume_batch(self, batch_id: str):
+        """Re-runs a failed batch; videos it already completed are skipped."""
+        self._dispatch_batch(batch_id)
+
+    def resume_pending(self) -> int:
+        """
+        Re-dispatches queued jobs and batches, and running ones whose owner
+        stopped renewing its lease (a process that died mid-run). Work that
+        another live process is running is left to it.
+        """
+        db = self.session_factory()
+        try:
+            expire_leases(db)
+            job_ids = [
+                row.id for row in db.query(GenerationJob.id)
+                .filter(GenerationJob.status == "queued")
+                .order_by(GenerationJob.created_at)
+            ]
+            batch_ids = [
+                row.id for row in db.query(GenerationBatch.id)
+                .filter(GenerationBatch.status == "queued")
+                .order_by(GenerationBatch.created_at)
+            ]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self._dispatch(job_id)
+        for batch_id in batch_ids:
+            self._dispatch_batch(batch_id)
+        return len(job_ids) + len(batch_ids)
+
+    def recover(self) -> int:
+        """Re-queues and dispatches work whose owner's lease expired (run on every lease heartbeat)."""
+        db = self.session_factory()
+        try:
+            expired = expire_leases(db)
+        finally:
+            db.close()
+        return self.dispatch_queued() if expired else 0
+
+    def dispatch_queued(self) -> int:
+        """Dispatches queued jobs and batches not already handed to the pool (for a polling worker)."""
+        db = self.session_factory()
+        try:
+            job_ids = [
+                row.id for row in db.query(GenerationJob.id)
+                .filter(GenerationJob.status == "queued")
+                .order_by(GenerationJob.created_at)
+            ]
+            batch_ids = [
+                row.id for row in db.query(GenerationBatch.id)
+                .filter(GenerationBatch.status == "queued")
+                .order_by(GenerationBatch.created_at)
+            ]
+        finally:
+            db.close()
+
+        job_ids = [job_id for job_id in job_ids if job_id not in self._dispatched]
+        batch_ids = [batch_id for batch_id in batch_ids if batch_id not in self._dispatched]
+        for job_id in job_ids:
+            self._dispatch(job_id)
+        for batch_id in batch_ids:
+            self._dispatch_batch(batch_id)
+        return len(job_ids) + len(batch_ids)
+
+    def _active_job(self, db: Session, youtube_id: str) -> GenerationJob | None:
+        return db.query(GenerationJob).filter(
+            GenerationJob.youtube_id == youtube_id,
+            GenerationJob.status.in_(ACTIVE_STATUSES)
+        ).first()
+
+    def _latest_job(self, db: Session, youtube_id: str, course_id: int) -> GenerationJob | None:
+        """The most recent succeeded job for the video that produced `course_id`."""
+        return db.query(GenerationJob).filter(
+            GenerationJob.youtube_id == youtube_id,
+            GenerationJob.status == "succeeded",
+            GenerationJob.course_id == course_id
+        ).order_by(GenerationJob.created_at.desc()).first()
+
+    def _dispatch(self, job_id: str):
+        if not self.inline:
+            return
+        self.start()
+        self._dispatched.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _dispatch_batch(self, batch_id: str):
+        if not self.inline:
+            return
+        self.start()
+        self._dispatched.add(batch_id)
+        self._executor.submit(self._run_batch, batch_id)
+
+    def _run_batch(self, batch_id: str):
+        try:
+            run_batch(batch_id, self.session_factory)
+        except Exception as e:
+            print(f"AI Generation Error (batch {batch_id}): {e}")
+        finally:
+            self._dispatched.discard(batch_id)
+
+    def _run(self, job_id: str):
+        """Worker body: claims the job, runs the pipeline and records the outcome."""
+        # Imported here so API processes only load the AI stack once they generate something
+        from ai_pipeline import generate_all_content
+
+        db = self.session_factory()
+        try:
+            # Atomically claim the job so it never runs twice
+            if not self.claim(db, job_id):
+                return
+
+            job = db.get(GenerationJob, job_id)
+            try:
+                with track_stage("generate"):
+                    quiz_data, flashcard_data = generate_all_content(
+                        job.youtube_id, force_refresh=job.force_refresh, mode=job.generation_mode
+                    )
+            except Exception as e:
+                self._finish(db, job_id, error=e)
+                return
+            self._finish(db, job_id, quiz_data, flashcard_data)
+        finally:
+            db.close()
+            self._dispatched.discard(job_id)
+
+    def _finish(self, db: Session, job_id: str, quiz_data: dict | None = None,
+                flashcard_data: dict | None = None, error: Exception | None = None) -> GenerationJob:
+        """Persists the generated content and records the job's outcome."""
+        job = db.get(GenerationJob, job_id)
+        if error is None:
+            try:
+                with track_stage("save"):
+                    course = save_generated_content(db, quiz_data, flashcard_data, job.youtube_id, GENERATION_VERSION)
+                job.status = "succeeded"
+                job.course_id = course.id
+                job.served_by = {
+                    name: data.get("generated_by")
+                    for name, data in (("quiz", quiz_data), ("flashcards", flashcard_data)) if data is not None
+                }
+            except Exception as e:
+                error = e
+
+        if error is not None:
+            db.rollback()
+            print(f"AI Generation Error (job {job_id}): {error}")
+            job = db.get(GenerationJob, job_id)
+            job.status = "failed"
+            job.error = str(error)
+
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        GENERATION_JOBS.labels(job.status).inc()
+        return job
+
+
+async def get_job(db: AsyncSession, job_id: str) -> GenerationJob | None:
+    """Fetches a generation job by ID."""
+    return await db.get(GenerationJob, job_id)
+
+
+# Shared queue used by the API process
+job_queue = JobQueue()
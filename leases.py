@@ -0,0 +1,129 @@
+# leases.py
+
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import GenerationJob, GenerationBatch
+
+# --- Configuration ---
+# A running job or batch belongs to the process that claimed it for as long
+# as that process keeps renewing its lease. A lease not renewed for
+# JOB_LEASE_SECONDS means the owner died: the work may be re-queued.
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = max(1.0, JOB_LEASE_SECONDS / 4)
+
+LEASED_MODELS = (GenerationJob, GenerationBatch)
+
+# ------------------------------------------------------------------
+# --- OWNERSHIP ---
+# ------------------------------------------------------------------
+
+_owner: tuple[int, str] | None = None
+
+def owner_id() -> str:
+    """This process's identity in claimed_by (recomputed after a fork)."""
+    global _owner
+    if _owner is None or _owner[0] != os.getpid():
+        _owner = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _owner[1]
+
+def claim_values(model) -> dict:
+    """The UPDATE values that move a job or batch to 'running' under this process's lease."""
+    now = datetime.utcnow()
+    return {
+        model.status: "running",
+        model.started_at: now,
+        model.claimed_by: owner_id(),
+        model.heartbeat_at: now,
+    }
+
+def renew_leases(db: Session) -> int:
+    """Extends the lease on everything this process is running. Commits."""
+    renewed = 0
+    for model in LEASED_MODELS:
+        renewed += db.query(model).filter(
+            model.status == "running", model.claimed_by == owner_id()
+        ).update({model.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    return renewed
+
+def _expired(model, cutoff: datetime):
+    # Rows claimed before leases existed have no heartbeat: go by when they started
+    return and_(model.status == "running", or_(
+        model.heartbeat_at < cutoff,
+        and_(model.heartbeat_at.is_(None), or_(model.started_at.is_(None), model.started_at < cutoff)),
+    ))
+
+def lease_expired(db: Session, model, row_id: str) -> bool:
+    """True if the row is running under a lease its owner stopped renewing."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    return db.query(model.id).filter(model.id == row_id, _expired(model, cutoff)).first() is not None
+
+def expire_leases(db: Session) -> int:
+    """Re-queues running jobs and batches whose owner stopped renewing the lease. Commits."""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    expired = 0
+    for model in LEASED_MODELS:
+        expired += db.query(model).filter(_expired(model, cutoff)).update(
+            {model.status: "queued", model.started_at: None, model.claimed_by: None, model.heartbeat_at: None},
+            synchronize_session=False
+        )
+    db.commit()
+    return expired
+
+# ------------------------------------------------------------------
+# --- HEARTBEAT ---
+# ------------------------------------------------------------------
+
+class LeaseKeeper:
+    """
+    Background thread that renews this process's leases every
+    JOB_HEARTBEAT_SECONDS, then calls each listener (e.g. a queue
+    re-dispatching work whose owner died). Started by the first claim.
+    """
+
+    def __init__(self, session_factory=SessionLocal, interval: float = JOB_HEARTBEAT_SECONDS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+
+    def start(self):
+        with self._lock:
+            # Threads don't survive a fork; the child starts its own
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._loop, name="lease-keeper", daemon=True).start()
+
+    def add_listener(self, listener):
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            db = self.session_factory()
+            try:
+                renew_leases(db)
+            except Exception as e:
+                print(f"Lease renewal failed: {e}")
+            finally:
+                db.close()
+            for listener in list(self._listeners):
+                try:
+                    listener()
+                except Exception as e:
+                    print(f"Lease listener failed: {e}")
+
+lease_keeper = LeaseKeeper()
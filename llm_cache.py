@@ -0,0 +1,71 @@
+# llm_cache.py
+
+import hashlib
+import json
+import os
+from typing import Optional
+
+from database import SessionLocal
+from db_cache import DBCache
+from models import LLMResponse
+
+# --- Configuration ---
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# ------------------------------------------------------------------
+# --- CACHE KEY ---
+# ------------------------------------------------------------------
+
+def make_cache_key(model: str, system_prompt: str, format_instructions: str, content: str) -> str:
+    """Content-addresses a chain call: identical prompts always map to the same key."""
+    digest = hashlib.sha256()
+    for part in (model, system_prompt, format_instructions, content):
+        encoded = part.encode("utf-8")
+        # Length-prefix every part so that ("ab", "c") and ("a", "bc") never collide
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+# ------------------------------------------------------------------
+# --- RESPONSE STORE ---
+# ------------------------------------------------------------------
+
+class LLMResponseCache(DBCache):
+    """
+    A persistent store of parsed chain outputs, backed by the `llm_responses`
+    table. Entries expire after ttl_seconds and the least recently used ones
+    are evicted once the stored payloads exceed max_bytes.
+    """
+
+    model = LLMResponse
+    stored_at = "created_at"
+    size_column = "size_bytes"
+
+    def __init__(self, session_factory=SessionLocal, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        super().__init__(session_factory, ttl_seconds=ttl_seconds, max_size=max_bytes)
+
+    def get(self, cache_key: str) -> Optional[dict]:
+        """Returns the cached response for a key, or None on a miss or expiry."""
+        self._ensure_table()
+        db = self.session_factory()
+        try:
+            row = self._first_fresh(db, [db.query(LLMResponse).filter(LLMResponse.cache_key == cache_key).first()])
+            return json.loads(row.response_data) if row is not None else None
+        finally:
+            db.close()
+
+    def put(self, cache_key: str, model: str, content_type: str, response: dict):
+        """Stores (or replaces) the response for a key, then enforces the size bound."""
+        payload = json.dumps(response)
+        self._store({"cache_key": cache_key}, {
+            "model": model,
+            "content_type": content_type,
+            "response_data": payload,
+            "size_bytes": len(payload.encode("utf-8")),
+        })
+
+
+# Shared instance used by the generation chains
+llm_cache = LLMResponseCache()
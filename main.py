@@ -1,10 +1,14 @@
 # main.py
 
 import json
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 
 from models import UserProgress
@@ -12,28 +16,77 @@ from schemas import ProgressSubmit, UserProgressSchema
 from sqlalchemy.sql import func
 from datetime import datetime
 
-from database import get_db 
+from database import get_async_db, get_async_read_db, engine, dispose_engines
+from migrations import migrate, MIGRATE_ON_STARTUP
 from models import Course, Video, Quiz, User # Added User
 from schemas import UserCreate, User as UserSchema, Token
 from auth_utils import get_password_hash, verify_password, create_access_token, get_current_user
 from fastapi.security import OAuth2PasswordRequestForm
-from ai_pipeline import generate_all_content
-from services import save_generated_content
+from jobs import job_queue, get_job
+from content_stream import open_stream
+from batch import get_batch, batch_to_dict, RESUMABLE_STATUSES
 from schemas import ProgressSubmit, UserProgressSchema
-from pydantic import BaseModel, HttpUrl
-from services import get_all_courses 
-from schemas import CourseListSchema, CourseSchema 
-from typing import List
+from pydantic import BaseModel, HttpUrl, Field
+from services import get_courses_page, get_course_payload, COURSE_PAGE_SIZE, COURSE_PAGE_SIZE_MAX
+from services import upsert_progress, PROGRESS_BATCH_MAX_ITEMS
+from services import get_course_progress_summaries, get_course_progress_summary
+from services import get_due_reviews, record_reviews, REVIEW_DUE_LIMIT, REVIEW_DUE_LIMIT_MAX, REVIEW_BATCH_MAX_ITEMS
+from schemas import CourseListSchema, CourseSchema, GenerationJobSchema, CourseProgressSchema
+from schemas import PlaylistManifest, GenerationBatchSchema, SearchResultSchema
+from schemas import ReviewAnswer, ReviewStateSchema, ReviewCardSchema
+from typing import List, Optional, Literal
+from metrics import MetricsMiddleware, render_metrics
+from generation_config import PRELOAD_AI_STACK, MODEL_TIERS
+from search_index import search, SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE_MAX
 
 # --- Request Schema for Content Generation ---
 class ContentRequest(BaseModel):
     """Schema for the request body when generating new content."""
     youtube_url: HttpUrl # Use HttpUrl for validation
+    force_refresh: bool = False # Bypass the LLM response cache and pay for a fresh generation
+    generation_mode: Optional[Literal["separate", "combined"]] = None # One LLM call per content type, or one for both
+
+class BatchContentRequest(BaseModel):
+    """Schema for generating a whole playlist: either plain video IDs or a full manifest."""
+    video_ids: Optional[List[str]] = None
+    manifest: Optional[PlaylistManifest] = None
+    title: Optional[str] = None # Course title when only video_ids are given
+    concurrency: Optional[int] = Field(default=None, ge=1, le=16)
+    force_refresh: bool = False
+    generation_mode: Optional[Literal["separate", "combined"]] = None
 
 # --- Configuration ---
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 # Defined in auth_utils
 
-app = FastAPI()
+def warm_generation_engine():
+    """Imports the AI stack and builds the generation engine's prompts and model clients."""
+    from ai_pipeline import get_engine
+
+    try:
+        get_engine().warm(MODEL_TIERS)
+    except Exception as e:
+        print(f"Generation engine warm-up failed (clients will be built on first use): {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        # Create any tables that don't exist yet and bring existing ones up to
+        # date; migrate() serializes the workers of a multi-worker server
+        migrate(engine)
+    if job_queue.inline:
+        # Otherwise the AI stack is imported by the first generation (see GENERATION_RUNNER in jobs.py)
+        if PRELOAD_AI_STACK:
+            warm_generation_engine()
+        # Pick up generation jobs that were queued when the last process stopped
+        job_queue.start()
+        resumed = job_queue.resume_pending()
+        if resumed:
+            print(f"Resumed {resumed} pending generation job(s).")
+    yield
+    job_queue.shutdown()
+    await dispose_engines()
+
+app = FastAPI(lifespan=lifespan)
 
 # Setup CORS (Ensure your React client's URL is allowed)
 origins = [
@@ -47,18 +100,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Outermost, so the latency it records covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # --- Helper Function (CRUD) ---
 
-def create_user(db: Session, user: UserCreate):
+async def create_user(db: AsyncSession, user: UserCreate):
     """Helper function to create a new user in the database."""
-    # This ensures passwords are NEVER stored in plain text
-    hashed_password = get_password_hash(user.password)
+    # This ensures passwords are NEVER stored in plain text.
+    # bcrypt is deliberately slow, so hash in the threadpool, not on the event loop.
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     db_user = User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 # ------------------------------------------------------------------
@@ -66,23 +124,23 @@ def create_user(db: Session, user: UserCreate):
 # ------------------------------------------------------------------
 
 @app.post("/api/auth/register", response_model=UserSchema)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Handles user registration and checks for existing users."""
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    return create_user(db=db, user=user)
+    return await create_user(db=db, user=user)
 
 @app.post("/api/auth/login", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Authenticates the user and issues a JWT token."""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = (await db.execute(select(User).where(User.email == form_data.username))).scalars().first()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await run_in_threadpool(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
@@ -91,8 +149,9 @@ def login_for_access_token(
     
     # Successful login: create the token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # 'uid' lets protected endpoints identify the user without a DB lookup
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id}, expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
@@ -104,32 +163,21 @@ def login_for_access_token(
 @app.get("/api/courses/{course_id}", response_model=CourseSchema)
 async def get_course_by_id(
     course_id: int, 
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    course = db.query(Course).filter(Course.id == course_id).first()
+    # The whole tree is loaded in a fixed number of queries, validated against
+    # CourseSchema once and cached as JSON bytes until the course changes.
+    payload = await get_course_payload(db, course_id)
     
-    if not course:
+    if payload is None:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    # 🛑 CRITICAL FIX: Deserialize JSON strings for AI content
-    # This loop ensures the client receives Python objects, not JSON strings.
-    for video in course.videos:
-        # Deserialize all quizzes for this video
-        for quiz in video.quizzes:
-            if quiz.question_data:
-                quiz.question_data = json.loads(quiz.question_data)
-
-        # Deserialize all flashcards for this video
-        for flashcard in video.flashcards:
-            if flashcard.flashcard_data:
-                flashcard.flashcard_data = json.loads(flashcard.flashcard_data)
-
-    return course
+    return Response(content=payload, media_type="application/json")
 
 # --- Example Protected Endpoint for user details (Useful for initial testing) ---
 @app.get("/api/users/me", response_model=UserSchema)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: UserSchema = Depends(get_current_user)):
     """Returns the details of the currently authenticated user."""
     return current_user
 
@@ -142,96 +190,206 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 @app.post("/api/progress", response_model=UserProgressSchema)
 async def submit_progress(
     progress_data: ProgressSubmit, # All required data (including video_id) is in the body
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submits the completion status and score for a video's quiz."""
-    
-    # Use the video_id from the Pydantic model (progress_data)
-    video_id_from_body = progress_data.video_id 
-    
-    # 1. Check if progress record already exists
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.video_id == video_id_from_body # Use the ID from the body
-    ).first()
-
-    if progress:
-        # Update existing record
-        progress.quiz_score = progress_data.quiz_score
-        progress.is_completed = progress_data.is_completed
-        # Only update completed_at if it's being marked complete for the first time
-        if progress_data.is_completed and not progress.completed_at:
-            progress.completed_at = func.now()
-    else:
-        # Create new record
-        progress = UserProgress(
-            user_id=current_user.id,
-            video_id=video_id_from_body,
-            quiz_score=progress_data.quiz_score,
-            is_completed=progress_data.is_completed,
-            completed_at=func.now() if progress_data.is_completed else None
+    # A single upsert: concurrent submissions for the same video can't create duplicates
+    progress = await upsert_progress(db, current_user.id, [progress_data])
+    return progress[0]
+
+@app.post("/api/progress/batch", response_model=List[UserProgressSchema])
+async def submit_progress_batch(
+    progress_items: List[ProgressSubmit],
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Submits progress for many videos in one request and one transaction,
+    e.g. when a client syncs progress recorded offline.
+    """
+    if len(progress_items) > PROGRESS_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {PROGRESS_BATCH_MAX_ITEMS} progress items per batch."
         )
-        db.add(progress)
-        
-    db.commit()
-    db.refresh(progress)
-    return progress
+    return await upsert_progress(db, current_user.id, progress_items)
 
 # 🛑 FIX: Renamed the GET route to /api/progress and updated response_model to List
 @app.get("/api/progress", response_model=List[UserProgressSchema])
 async def get_user_all_progress(
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Returns all progress records for the logged-in user."""
-    progress_list = db.query(UserProgress).filter(
+    progress_list = (await db.execute(select(UserProgress).where(
         UserProgress.user_id == current_user.id
-    ).all()
+    ))).scalars().all()
     
     return progress_list
+
+@app.get("/api/progress/courses", response_model=List[CourseProgressSchema])
+async def get_dashboard_progress(
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Progress summaries for every course the user has started, most recent first."""
+    return await get_course_progress_summaries(db, current_user.id)
+
+@app.get("/api/progress/courses/{course_id}", response_model=CourseProgressSchema)
+async def get_course_progress(
+    course_id: int,
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """The user's progress summary for one course."""
+    summary = await get_course_progress_summary(db, current_user.id, course_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return summary
 # ------------------------------------------------------------------
 # --- AI GENERATION ENDPOINT (Milestone 4B Integration) ---
 # ------------------------------------------------------------------
 
-@app.post("/api/content/generate")
+def extract_video_id(youtube_url) -> str:
+    """The v= parameter of a YouTube watch URL; 400 if there is none."""
+    video_id = str(youtube_url).split("v=")[-1].split("&")[0]
+    if not video_id:
+        raise HTTPException(status_code=400, detail="Invalid YouTube URL provided.")
+    return video_id
+
+@app.post("/api/content/generate", response_model=GenerationJobSchema, status_code=202)
 async def generate_content(
     request: ContentRequest,
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db) # CRITICAL: Inject DB session here
+    response: Response,
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Triggers the AI pipeline, generates content, and persists it to the database.
+    Queues the AI pipeline for a video and returns the job immediately.
+    Poll GET /api/content/jobs/{job_id} for its status and resulting course_id.
+    A video that is already generated returns 200 with a succeeded job
+    carrying its course_id; there is nothing to poll.
     """
     
     # 1. Extract Video ID (Existing logic)
-    video_id = str(request.youtube_url).split("v=")[-1].split("&")[0]
+    video_id = extract_video_id(request.youtube_url)
+
+    # 2. Hand off to the worker pool; a job already in flight for this video is reused.
+    # JobQueue is shared with the (sync) worker threads, so run it on this session via run_sync.
+    job = await db.run_sync(
+        job_queue.submit, video_id, user_id=current_user.id, force_refresh=request.force_refresh,
+        generation_mode=request.generation_mode
+    )
+    if job.status == "succeeded":
+        response.status_code = 200
+    return job
+
+async def _event_stream(youtube_url, force_refresh: bool, generation_mode: Optional[str],
+                        user_id: int, db: AsyncSession) -> StreamingResponse:
+    events = await open_stream(db, extract_video_id(youtube_url), user_id, force_refresh, generation_mode)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep proxies (e.g. nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/content/generate/stream")
+async def stream_content_post(
+    request: ContentRequest,
+    current_user: UserSchema = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Generates a video's content as server-sent events: the transcript, then
+    each quiz question and flashcard as soon as the model has written it, and
+    finally `done` with the persisted course_id. See content_stream.py.
+    """
+    return await _event_stream(
+        request.youtube_url, request.force_refresh, request.generation_mode, current_user.id, db
+    )
+
+@app.get("/api/content/generate/stream")
+async def stream_content_get(
+    youtube_url: HttpUrl,
+    force_refresh: bool = False,
+    generation_mode: Optional[Literal["separate", "combined"]] = None,
+    current_user: UserSchema = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Same stream as the POST form, for SSE clients that can only issue GETs."""
+    return await _event_stream(youtube_url, force_refresh, generation_mode, current_user.id, db)
+
+@app.get("/api/content/jobs/{job_id}", response_model=GenerationJobSchema)
+async def get_generation_job(
+    job_id: str,
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Returns the state, timings and resulting course_id of a generation job."""
+    job = await get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+    
+@app.post("/api/content/generate/batch", response_model=GenerationBatchSchema, status_code=202)
+async def generate_playlist_content(
+    request: BatchContentRequest,
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Queues generation for every video of a playlist into a single course.
+    Poll GET /api/content/batches/{batch_id} for progress.
+    """
+    if request.manifest is not None:
+        manifest = request.manifest.model_dump()
+    elif request.video_ids:
+        manifest = {"title": request.title, "videos": [{"youtube_id": v} for v in request.video_ids]}
+    else:
+        raise HTTPException(status_code=400, detail="Provide either video_ids or a manifest.")
 
-    if not video_id:
-        raise HTTPException(status_code=400, detail="Invalid YouTube URL provided.")
-        
     try:
-        # 1. Run the COMBINED LangChain/Gemini pipeline
-        # 🛑 NEW: Get both quiz and flashcard data simultaneously
-        quiz_data, flashcard_data = generate_all_content(video_id)
-        
-        # 2. Call the service layer to handle persistence
-        # 🛑 NEW: Pass both data dictionaries
-        new_course = save_generated_content(db, quiz_data, flashcard_data, video_id)
-                
-        # Return success and the ID of the new course
-        return {
-            "message": "AI content successfully generated and saved.",
-            "course_id": new_course.id,
-            "video_id": video_id,
-            "title": new_course.title
-        }
+        batch = await db.run_sync(
+            job_queue.submit_batch, manifest,
+            user_id=current_user.id,
+            concurrency=request.concurrency,
+            force_refresh=request.force_refresh,
+            generation_mode=request.generation_mode
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return batch_to_dict(batch)
 
-    except Exception as e:
-        # Note: Rollback ensures database integrity if an error occurs
-        db.rollback() 
-        print(f"AI Generation Error: {e}")
-        raise HTTPException(status_code=500, detail=f"AI pipeline failed during generation or saving: {e}")
+@app.get("/api/content/batches/{batch_id}", response_model=GenerationBatchSchema)
+async def get_generation_batch(
+    batch_id: str,
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Returns the progress of a playlist batch."""
+    batch = await get_batch(db, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch_to_dict(batch)
+
+@app.post("/api/content/batches/{batch_id}/resume", response_model=GenerationBatchSchema, status_code=202)
+async def resume_generation_batch(
+    batch_id: str,
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Re-runs a failed batch, skipping the videos it already completed."""
+    batch = await get_batch(db, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch.status not in RESUMABLE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Batch is {batch.status} and cannot be resumed.")
+    batch.status = "queued"
+    await db.commit()
+    job_queue.resume_batch(batch.id)
+    return batch_to_dict(batch)
     
 # ------------------------------------------------------------------
 # --- COURSE DISCOVERY ENDPOINT (Milestone 4D) ---
@@ -239,12 +397,85 @@ async def generate_content(
 
 @app.get("/api/courses", response_model=List[CourseListSchema])
 async def list_all_courses(
-    current_user: User = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[int] = Query(default=None, description="The X-Next-Cursor value from the previous page."),
+    limit: int = Query(default=COURSE_PAGE_SIZE, ge=1, le=COURSE_PAGE_SIZE_MAX),
+    sort: Literal["id", "recent"] = "id",
+    current_user: UserSchema = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
-    Returns a list of all courses the user can view.
+    Returns one page of the courses the user can view.
+    The cursor for the next page is sent in the X-Next-Cursor header (absent on the last page).
     """
-    courses = get_all_courses(db)
+    courses, next_cursor = await get_courses_page(db, limit=limit, cursor=cursor, newest_first=(sort == "recent"))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
     # Note: In a real app, you'd filter this by user enrollment or access rights.
-    return courses
\ No newline at end of file
+    return courses
+
+@app.get("/api/search", response_model=List[SearchResultSchema])
+async def search_catalog(
+    response: Response,
+    q: str = Query(min_length=1, max_length=200, description="Words to find; the last one may be a prefix."),
+    kind: Optional[Literal["course", "video", "quiz_question", "flashcard"]] = None,
+    cursor: int = Query(default=0, ge=0, description="The X-Next-Cursor value from the previous page."),
+    limit: int = Query(default=SEARCH_PAGE_SIZE, ge=1, le=SEARCH_PAGE_SIZE_MAX),
+    current_user: UserSchema = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Full-text search over course titles and descriptions, video titles, quiz
+    questions and flashcards, best matches first.
+    The cursor for the next page is sent in the X-Next-Cursor header (absent on the last page).
+    """
+    results, next_cursor = await search(db, q, limit=limit, offset=cursor, kind=kind)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return results
+
+# ------------------------------------------------------------------
+# --- FLASHCARD REVIEWS (SPACED REPETITION) ---
+# ------------------------------------------------------------------
+
+@app.get("/api/review/due", response_model=List[ReviewCardSchema])
+async def get_review_queue(
+    limit: int = Query(default=REVIEW_DUE_LIMIT, ge=1, le=REVIEW_DUE_LIMIT_MAX),
+    current_user: UserSchema = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    The user's flashcards due for review, most overdue first. Flashcards
+    join the queue when their video is completed.
+    """
+    return await get_due_reviews(db, current_user.id, limit=limit)
+
+@app.post("/api/review", response_model=List[ReviewStateSchema])
+async def submit_reviews(
+    answers: List[ReviewAnswer],
+    current_user: UserSchema = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Records a batch of review answers (quality 0-5, applied in order) and
+    returns the cards' new SM-2 schedules.
+    """
+    if len(answers) > REVIEW_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {REVIEW_BATCH_MAX_ITEMS} answers per batch."
+        )
+    try:
+        return await record_reviews(db, current_user.id, answers)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# ------------------------------------------------------------------
+# --- METRICS ---
+# ------------------------------------------------------------------
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint: request, pipeline, LLM token, cache, pool and SQL metrics."""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
\ No newline at end of file
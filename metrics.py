@@ -0,0 +1,174 @@
+# metrics.py
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Histogram, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+from database import engine, async_engine, async_read_engine
+from course_cache import course_cache
+from auth_utils import token_cache, principal_cache
+from transcript_cache import transcript_cache
+from llm_cache import llm_cache
+
+# Metrics are per process: with several uvicorn workers, scrape each one
+# (or run prometheus_client in multiprocess mode).
+
+# ------------------------------------------------------------------
+# --- METRIC DEFINITIONS ---
+# ------------------------------------------------------------------
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "API request latency.", ["method", "route", "status"]
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed while serving one request.", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+SQL_STATEMENTS = Counter("sql_statements", "SQL statements executed, per engine.", ["engine"])
+
+PIPELINE_STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each stage of content generation.", ["stage", "content_type"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300)
+)
+LLM_TOKENS = Counter(
+    "llm_tokens", "LLM tokens used (provider-reported, else estimated).", ["model", "content_type", "direction"]
+)
+LLM_ROUTED_GENERATIONS = Counter(
+    "llm_routed_generations", "Validated LLM answers by the model tier that served them.",
+    ["content_type", "model", "outcome"]  # outcome: first_try | repaired | escalated
+)
+LLM_VALIDATION_FAILURES = Counter(
+    "llm_validation_failures", "LLM answers rejected by strict output validation.", ["content_type", "model"]
+)
+GENERATION_JOBS = Counter("generation_jobs", "Finished generation jobs by outcome.", ["status"])
+
+@contextmanager
+def track_stage(stage: str, content_type: str = ""):
+    """Times a block into pipeline_stage_duration_seconds (failures included)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PIPELINE_STAGE_LATENCY.labels(stage, content_type).observe(time.perf_counter() - started)
+
+# ------------------------------------------------------------------
+# --- SQL STATEMENT COUNTING (engine events) ---
+# ------------------------------------------------------------------
+
+# Statement counter of the request being served, if any
+_request_statements: ContextVar[list | None] = ContextVar("request_statements", default=None)
+
+def instrument_engine(sync_engine, name: str):
+    """Counts every statement an engine executes, overall and for the current request."""
+    statements = SQL_STATEMENTS.labels(name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.inc()
+        counter = _request_statements.get()
+        if counter is not None:
+            counter[0] += 1
+
+instrument_engine(engine, "primary")
+instrument_engine(async_engine.sync_engine, "async_primary")
+instrument_engine(async_read_engine.sync_engine, "async_read")
+
+# ------------------------------------------------------------------
+# --- SCRAPE-TIME COLLECTORS (caches, connection pools) ---
+# ------------------------------------------------------------------
+
+CACHES = {
+    "course_payload": course_cache,
+    "auth_token": token_cache,
+    "auth_principal": principal_cache,
+    "transcript": transcript_cache,
+    "llm_response": llm_cache,
+}
+
+POOLS = {
+    "primary": engine,
+    "async_primary": async_engine,
+    "async_read": async_read_engine,
+}
+
+class CacheCollector:
+    """Reads each cache's hit/miss counters when Prometheus scrapes."""
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits.", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses.", labels=["cache"])
+        hit_rate = GaugeMetricFamily("cache_hit_rate", "Hits / lookups since start.", labels=["cache"])
+        for name, cache in CACHES.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            hit_rate.add_metric([name], stats["hit_rate"])
+        yield from (hits, misses, hit_rate)
+
+class PoolCollector:
+    """Reports connection pool usage for each engine."""
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "db_pool_connections", "Pooled connections by state.", labels=["engine", "state"]
+        )
+        size = GaugeMetricFamily("db_pool_size", "Configured pool size.", labels=["engine"])
+        for name, pool_engine in POOLS.items():
+            pool = pool_engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue  # e.g. NullPool keeps no connections
+            connections.add_metric([name, "checked_out"], pool.checkedout())
+            connections.add_metric([name, "idle"], pool.checkedin())
+            connections.add_metric([name, "overflow"], max(pool.overflow(), 0))
+            size.add_metric([name], pool.size())
+        yield from (connections, size)
+
+REGISTRY.register(CacheCollector())
+REGISTRY.register(PoolCollector())
+
+# ------------------------------------------------------------------
+# --- REQUEST MIDDLEWARE AND EXPOSITION ---
+# ------------------------------------------------------------------
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and SQL statement count per route.
+    Routes are labelled by their path template (/api/courses/{course_id}),
+    so label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = [0]
+        token = _request_statements.set(counter)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_statements.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            REQUEST_SQL_STATEMENTS.labels(route).observe(counter[0])
+
+def render_metrics() -> tuple[bytes, str]:
+    """The current metrics in Prometheus text format, with their content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
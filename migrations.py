@@ -0,0 +1,330 @@
+# migrations.py
+
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, inspect, select, text
+from sqlalchemy.schema import CreateColumn, CreateTable
+from sqlalchemy.engine import Engine
+
+from database import engine as default_engine, Base
+from models import Course, Video, Quiz, Flashcard, UserProgress, GeneratedContent, GenerationJob, GenerationBatch, SearchDocument, ReviewState
+from models import Transcript
+from services import course_progress_upsert, backfill_review_states
+from search_index import rebuild_index, create_fts_index
+
+# Usage:
+#   python migrations.py        # creates missing tables and applies every pending migration
+#
+# Each migration runs once per database and is recorded in `schema_migrations`.
+# Migrations must tolerate a fresh database where create_all() already built
+# the tables in their final shape.
+#
+# The API migrates on startup unless MIGRATE_ON_STARTUP=false; deployments
+# that run `python migrations.py` as a release step can turn that off.
+# Either way migrate() holds a lock, so workers starting together (e.g.
+# `uvicorn --workers 8`) migrate one at a time and the rest find nothing to do.
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Postgres advisory lock key held while migrating (any constant shared by every process)
+MIGRATION_LOCK_KEY = 4_801_729_316
+
+# ------------------------------------------------------------------
+# --- MIGRATIONS ---
+# ------------------------------------------------------------------
+
+def _decode_json_text(value):
+    """Decodes a legacy json.dumps() value, unwrapping double-encoded strings."""
+    while isinstance(value, str):
+        value = json.loads(value)
+    return value
+
+def _rebuild_table(conn, table: Table, rows: list[dict]):
+    """
+    SQLite: recreates `table` from its model definition and fills it with
+    `rows`. The new table is built under a scratch name, then the old one is
+    dropped and the new one renamed into place. Renaming the old table away
+    instead would make SQLite repoint other tables' foreign keys at it.
+    """
+    scratch = MetaData()
+    for referred in {fk.column.table for fk in table.foreign_keys}:
+        referred.to_metadata(scratch)  # so the copy's foreign keys resolve
+    rebuilt = table.to_metadata(scratch, name=f"{table.name}_new")
+
+    conn.execute(CreateTable(rebuilt))
+    if rows:
+        conn.execute(rebuilt.insert(), rows)
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {table.name}_new RENAME TO {table.name}"))
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+def _migrate_json_column(conn, model, column_name: str):
+    table = model.__tablename__
+    column = model.__table__.c[column_name]
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            f"ALTER TABLE {table} ALTER COLUMN {column_name} TYPE JSON USING {column_name}::json"
+        ))
+        return
+
+    # SQLite cannot change a column's type in place: rebuild the table from
+    # the model, re-validating every row through the new column type.
+    declared = {c["name"]: str(c["type"]) for c in inspect(conn).get_columns(table)}
+    if declared.get(column_name, "").upper() == "JSON":
+        return
+
+    # Decode and validate everything before touching the schema, so bad
+    # legacy data aborts the migration while the old table is still intact
+    rows = [
+        {**row, column_name: _decode_json_text(row[column_name])}
+        for row in conn.execute(text(f"SELECT * FROM {table}")).mappings()
+    ]
+    for row in rows:
+        column.type.process_bind_param(row[column_name], conn.dialect)
+
+    _rebuild_table(conn, model.__table__, rows)
+    print(f"  migrated {len(rows)} row(s) of {table}.{column_name} to JSON")
+
+def migrate_json_content_columns(conn):
+    """Quiz.question_data and Flashcard.flashcard_data: JSON strings in TEXT -> native JSON."""
+    _migrate_json_column(conn, Quiz, "question_data")
+    _migrate_json_column(conn, Flashcard, "flashcard_data")
+
+def unique_user_progress(conn):
+    """Merges duplicate (user_id, video_id) progress rows, then makes the pair unique."""
+    groups = {}
+    table = UserProgress.__table__
+    for row in conn.execute(select(table).order_by(table.c.id)).mappings():
+        groups.setdefault((row["user_id"], row["video_id"]), []).append(row)
+
+    merged = 0
+    for rows in groups.values():
+        if len(rows) < 2:
+            continue
+        # Keep the newest row's score, but never lose a completion or an earlier start
+        keep = rows[-1]
+        completed = [r["completed_at"] for r in rows if r["completed_at"] is not None]
+        started = [r["started_at"] for r in rows if r["started_at"] is not None]
+        conn.execute(
+            table.update().where(table.c.id == keep["id"]).values(
+                is_completed=any(r["is_completed"] for r in rows),
+                completed_at=min(completed) if completed else None,
+                started_at=min(started) if started else None,
+            )
+        )
+        conn.execute(
+            table.delete().where(table.c.id.in_([r["id"] for r in rows[:-1]]))
+        )
+        merged += len(rows) - 1
+    if merged:
+        print(f"  merged {merged} duplicate user_progress row(s)")
+
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_progress_user_video ON user_progress (user_id, video_id)"
+    ))
+
+def backfill_course_progress(conn):
+    """Builds CourseProgress summaries from the existing UserProgress rows."""
+    result = conn.execute(course_progress_upsert(conn.dialect.name))
+    print(f"  built {result.rowcount} course progress summary row(s)")
+
+def index_generated_content(conn):
+    """
+    Adds the foreign-key indexes the course tree and progress queries join on,
+    and maps each AI-generated single-video course to its youtube_id.
+    """
+    for column in (Video.course_id, Video.youtube_id, Quiz.video_id, Flashcard.video_id):
+        for index in column.table.indexes:
+            if list(index.columns) == [column]:
+                index.create(bind=conn, checkfirst=True)
+
+    # Courses saved by save_generated_content before the mapping existed.
+    # Their generator is unknown, so the next request regenerates them.
+    rows = conn.execute(
+        select(Video.youtube_id, Video.course_id)
+        .join(Course, Course.id == Video.course_id)
+        .where(Course.title.like("AI Generated: %"), Video.youtube_id.is_not(None))
+        .order_by(Video.id)
+    ).all()
+    latest = {row.youtube_id: row for row in rows}  # newest video wins
+    existing = set(conn.execute(select(GeneratedContent.youtube_id)).scalars())
+    mapped = [
+        {
+            "youtube_id": row.youtube_id,
+            "course_id": row.course_id,
+            "generation_version": "unversioned",
+            "generated_at": datetime.utcnow(),
+        }
+        for youtube_id, row in latest.items() if youtube_id not in existing
+    ]
+    if mapped:
+        conn.execute(GeneratedContent.__table__.insert(), mapped)
+    print(f"  mapped {len(mapped)} generated video(s) by youtube_id")
+
+def _add_missing_columns(conn, *columns):
+    """ALTER TABLE ... ADD COLUMN for each model column the table doesn't have yet."""
+    for column in columns:
+        table = column.table.name
+        if column.name in {c["name"] for c in inspect(conn).get_columns(table)}:
+            continue
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+def add_generation_mode_columns(conn):
+    """Adds the per-request generation_mode to jobs and batches."""
+    _add_missing_columns(conn, GenerationJob.__table__.c.generation_mode, GenerationBatch.__table__.c.generation_mode)
+
+def add_job_served_by(conn):
+    """Records which model tier served each job."""
+    _add_missing_columns(conn, GenerationJob.__table__.c.served_by)
+
+def build_search_index(conn):
+    """Fills search_documents from the catalog, then builds the FTS5 index and its triggers (SQLite)."""
+    SearchDocument.__table__.create(bind=conn, checkfirst=True)
+    written = rebuild_index(conn)
+    create_fts_index(conn)
+    print(f"  indexed {written} search document(s)")
+
+def add_review_states(conn):
+    """Creates review_states and queues the flashcards of every video users have already completed."""
+    ReviewState.__table__.create(bind=conn, checkfirst=True)
+    written = backfill_review_states(conn)
+    print(f"  queued {written} flashcard(s) for review")
+
+def add_generation_leases(conn):
+    """Records which process runs each job and batch, and when it last renewed that lease."""
+    _add_missing_columns(
+        conn,
+        GenerationJob.__table__.c.claimed_by, GenerationJob.__table__.c.heartbeat_at,
+        GenerationBatch.__table__.c.claimed_by, GenerationBatch.__table__.c.heartbeat_at,
+    )
+
+def add_transcript_snippets(conn):
+    """Stores the timestamped snippets of cached transcripts (used to chunk long ones)."""
+    # The table may predate the schema being managed here (the cache used to create it)
+    Transcript.__table__.create(bind=conn, checkfirst=True)
+    _add_missing_columns(conn, Transcript.__table__.c.snippets)
+
+def repair_legacy_foreign_keys(conn):
+    """
+    Rebuilds tables whose foreign keys 0001 left pointing at the dropped
+    quizzes_legacy / flashcards_legacy tables (SQLite followed the rename).
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    repaired = []
+    for table in Base.metadata.sorted_tables:
+        if not inspect(conn).has_table(table.name):
+            continue
+        foreign_keys = inspect(conn).get_foreign_keys(table.name)
+        if any(fk["referred_table"].endswith("_legacy") for fk in foreign_keys):
+            rows = [dict(row) for row in conn.execute(select(table)).mappings()]
+            _rebuild_table(conn, table, rows)
+            repaired.append(table.name)
+    print(f"  repaired foreign keys of {len(repaired)} table(s){': ' + ', '.join(repaired) if repaired else ''}")
+
+# Ordered list of (version, migration). Append only; never reorder.
+MIGRATIONS = [
+    ("0001_json_content_columns", migrate_json_content_columns),
+    ("0002_unique_user_progress", unique_user_progress),
+    ("0003_course_progress_summaries", backfill_course_progress),
+    ("0004_index_generated_content", index_generated_content),
+    ("0005_generation_mode", add_generation_mode_columns),
+    ("0006_job_served_by", add_job_served_by),
+    ("0007_search_index", build_search_index),
+    ("0008_review_states", add_review_states),
+    ("0009_generation_leases", add_generation_leases),
+    ("0010_transcript_snippets", add_transcript_snippets),
+    ("0011_repair_legacy_foreign_keys", repair_legacy_foreign_keys),
+]
+
+# ------------------------------------------------------------------
+# --- RUNNER ---
+# ------------------------------------------------------------------
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock on `path`, shared with other processes (blocks until acquired)."""
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    # LK_LOCK gives up after ~10s; keep waiting
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+@contextmanager
+def migration_lock(engine: Engine = default_engine):
+    """Held while migrating: a Postgres advisory lock, or a lock file next to the SQLite database."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        return
+
+    database = engine.url.database
+    if engine.dialect.name == "sqlite" and database and database != ":memory:":
+        with _file_lock(f"{database}.migrate.lock"):
+            yield
+        return
+
+    # Nothing to serialize against (in-memory SQLite) or no lock available
+    yield
+
+def migrate(engine: Engine = default_engine) -> list[str]:
+    """
+    Creates any missing tables, then applies pending migrations, holding
+    migration_lock() throughout. Returns the versions applied.
+    """
+    with migration_lock(engine):
+        Base.metadata.create_all(bind=engine)
+        return run_migrations(engine)
+
+def run_migrations(engine: Engine = default_engine) -> list[str]:
+    """Applies pending migrations, each in its own transaction. Returns the versions applied."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (version VARCHAR PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    newly_applied = []
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying migration {version}")
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": version, "applied_at": datetime.utcnow()}
+            )
+        newly_applied.append(version)
+    return newly_applied
+
+if __name__ == "__main__":
+    applied = migrate()
+    print(f"✅ Applied {len(applied)} migration(s)." if applied else "✅ Database is up to date.")
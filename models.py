@@ -1,7 +1,31 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, UniqueConstraint, Index, text, JSON, Float
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
+from pydantic import TypeAdapter
 from database import Base
 from sqlalchemy.sql import func # for default timestamp values
+from schemas import QuizQuestion, FlashcardItem
+
+# --- Column Types ---
+
+class ValidatedJSONList(TypeDecorator):
+    """
+    A native JSON column holding a list of `item_schema` items. Values are
+    validated when written, so reads can trust them without re-validating.
+    """
+    impl = JSON
+    cache_ok = True
+
+    def __init__(self, item_schema):
+        super().__init__()
+        self.item_schema = item_schema
+        self._adapter = TypeAdapter(list[item_schema])
+
+    def process_bind_param(self, value, dialect):
+        if value is not None:
+            # Raises pydantic.ValidationError for malformed content
+            self._adapter.validate_python(value)
+        return value
 
 # --- Core Entities (Milestone 2) ---
 
@@ -35,10 +59,10 @@ class Video(Base):
     __tablename__ = "videos"
 
     id = Column(Integer, primary_key=True, index=True)
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     order_index = Column(Integer)
     title = Column(String)
-    youtube_id = Column(String)
+    youtube_id = Column(String, index=True)
     duration_seconds = Column(Integer)
     
     course = relationship("Course", back_populates="videos")
@@ -51,10 +75,10 @@ class Quiz(Base):
     __tablename__ = "quizzes"
 
     id = Column(Integer, primary_key=True, index=True)
-    video_id = Column(Integer, ForeignKey("videos.id"))
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True)
     
-    # Stores the list of questions as a JSON string
-    question_data = Column(Text) 
+    # The list of questions (QuizQuestion items), stored as native JSON
+    question_data = Column(ValidatedJSONList(QuizQuestion))
 
     video = relationship("Video", back_populates="quizzes")
 
@@ -63,6 +87,10 @@ class Quiz(Base):
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
+    __table_args__ = (
+        # One row per (user, video); progress writes upsert against it
+        Index("uq_user_progress_user_video", "user_id", "video_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -80,15 +108,213 @@ class UserProgress(Base):
     user = relationship("User", back_populates="progress")
     video = relationship("Video") # No back_populates needed on Video for progress
 
+# --- Per-course progress summary ---
+class CourseProgress(Base):
+    """
+    Aggregate of a user's UserProgress rows within one course, kept up to
+    date by every progress write so dashboards never scan raw progress.
+    """
+    __tablename__ = "course_progress"
+    __table_args__ = (
+        UniqueConstraint("user_id", "course_id", name="uq_course_progress_user_course"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+
+    completed_count = Column(Integer, nullable=False, default=0)
+    # Sum and count of non-null quiz scores, so the average stays exact
+    score_sum = Column(Integer, nullable=False, default=0)
+    scored_count = Column(Integer, nullable=False, default=0)
+
+    last_activity_at = Column(DateTime, nullable=True, index=True)
+
+    course = relationship("Course")
+
 # --- Flashcard ---
 class Flashcard(Base):
     __tablename__ = "flashcards"
     
     id = Column(Integer, primary_key=True, index=True)
-    video_id = Column(Integer, ForeignKey("videos.id"), nullable=False)
+    video_id = Column(Integer, ForeignKey("videos.id"), nullable=False, index=True)
     
-    # Store the list of flashcards as a JSON string
-    flashcard_data = Column(String, nullable=False) 
+    # The list of flashcards (FlashcardItem items), stored as native JSON
+    flashcard_data = Column(ValidatedJSONList(FlashcardItem), nullable=False)
     
     # Relationship to link back to the Video
-    video = relationship("Video", back_populates="flashcards")
\ No newline at end of file
+    video = relationship("Video", back_populates="flashcards")
+
+# --- Spaced Repetition Review State ---
+class ReviewState(Base):
+    """
+    A user's SM-2 schedule for one flashcard: item `card_index` of a
+    Flashcard row's list. Created when the user completes the card's video
+    (or first reviews it); deleted when the video's flashcards are replaced.
+    """
+    __tablename__ = "review_states"
+    __table_args__ = (
+        UniqueConstraint("user_id", "flashcard_id", "card_index", name="uq_review_states_user_card"),
+        # The due queue: an index range scan per user, in due order
+        Index("ix_review_states_user_due", "user_id", "next_due"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    flashcard_id = Column(Integer, ForeignKey("flashcards.id"), nullable=False, index=True)
+    card_index = Column(Integer, nullable=False)
+
+    # SM-2: successful reviews in a row, current gap and the card's ease
+    repetitions = Column(Integer, nullable=False, default=0)
+    interval_days = Column(Integer, nullable=False, default=0)
+    ease_factor = Column(Float, nullable=False, default=2.5)
+    lapses = Column(Integer, nullable=False, default=0)
+
+    next_due = Column(DateTime, nullable=False)
+    last_reviewed_at = Column(DateTime, nullable=True)
+    last_quality = Column(Integer, nullable=True)
+
+# --- Generated Content Index ---
+class GeneratedContent(Base):
+    """
+    The single-video course generated for each YouTube video, so repeat
+    requests find it by youtube_id instead of by an LLM-written title.
+    """
+    __tablename__ = "generated_content"
+
+    id = Column(Integer, primary_key=True, index=True)
+    youtube_id = Column(String, unique=True, index=True, nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+
+    # generation_config.GENERATION_VERSION that produced the content; anything
+    # older (or "incomplete", when a content type failed) is regenerated on
+    # the next request
+    generation_version = Column(String, nullable=False)
+    generated_at = Column(DateTime, nullable=False)
+
+    course = relationship("Course")
+
+# --- Transcript Cache ---
+class Transcript(Base):
+    __tablename__ = "transcripts"
+    __table_args__ = (
+        UniqueConstraint("youtube_id", "language", name="uq_transcripts_youtube_id_language"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    youtube_id = Column(String, nullable=False, index=True)
+    language = Column(String, nullable=False)
+
+    # The full transcript text, exactly as passed to the LLM chains
+    text = Column(Text, nullable=False)
+
+    # JSON list of {"text", "start", "duration"} snippets, used to chunk long
+    # transcripts by timestamp (NULL for rows cached before it was added)
+    snippets = Column(Text, nullable=True)
+
+    # fetched_at drives the TTL, last_accessed_at drives LRU eviction
+    fetched_at = Column(DateTime, nullable=False)
+    last_accessed_at = Column(DateTime, nullable=False, index=True)
+
+# --- Background Generation Jobs ---
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        # At most one in-flight job per video, enforced by the DB so that
+        # concurrent submissions (even from different workers) are merged.
+        Index(
+            "uq_generation_jobs_active_video", "youtube_id", unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex
+    youtube_id = Column(String, nullable=False, index=True)
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    # queued -> running -> succeeded | failed
+    status = Column(String, nullable=False, default="queued", index=True)
+    force_refresh = Column(Boolean, nullable=False, default=False)
+    # "separate" | "combined"; NULL follows the GENERATION_MODE setting
+    generation_mode = Column(String, nullable=True)
+    # Model that produced each content type, e.g. {"quiz": "gemini-2.5-flash"}
+    served_by = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=True)
+    # Lease of the process running the job (see leases.py)
+    claimed_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# --- LLM Response Cache ---
+class LLMResponse(Base):
+    __tablename__ = "llm_responses"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # sha256 over model name, system prompt, format instructions and transcript
+    cache_key = Column(String(64), unique=True, index=True, nullable=False)
+    model = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+
+    # The parsed chain output, stored as a JSON string
+    response_data = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, nullable=False)
+    last_accessed_at = Column(DateTime, nullable=False, index=True)
+
+# --- Playlist Batch Generation ---
+class GenerationBatch(Base):
+    __tablename__ = "generation_batches"
+
+    id = Column(String, primary_key=True, index=True)  # uuid4 hex
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    # The playlist manifest (videos with youtube_id/order_index/title) as a JSON string
+    manifest = Column(Text, nullable=False)
+    concurrency = Column(Integer, nullable=False)
+    force_refresh = Column(Boolean, nullable=False, default=False)
+    generation_mode = Column(String, nullable=True)
+
+    # queued -> running -> succeeded | failed. A failed batch can be resumed:
+    # videos listed in completed_video_ids are skipped on the next run.
+    status = Column(String, nullable=False, default="queued", index=True)
+    completed_video_ids = Column(Text, nullable=False, default="[]")
+    errors = Column(Text, nullable=False, default="{}")
+    # Lease of the process running the batch (see leases.py)
+    claimed_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# --- Search Index ---
+class SearchDocument(Base):
+    """
+    One searchable piece of the catalog: a course, a video, a quiz question
+    or a flashcard. Rewritten per course/video by search_index.py whenever
+    content is saved; on SQLite the FTS5 table `search_fts` indexes it.
+    """
+    __tablename__ = "search_documents"
+
+    id = Column(Integer, primary_key=True)
+    # "course" | "video" | "quiz_question" | "flashcard"
+    kind = Column(String, nullable=False)
+    # No foreign keys: this is a derived index, replaced after (or before)
+    # the rows it describes, in whatever order the writer deletes them
+    course_id = Column(Integer, nullable=False, index=True)
+    video_id = Column(Integer, nullable=True, index=True)
+    # Position of the question/flashcard within its video's list
+    position = Column(Integer, nullable=True)
+
+    # Course/video title, question text or flashcard front
+    title = Column(Text, nullable=False)
+    # Course description or flashcard back
+    body = Column(Text, nullable=False, default="")
@@ -1,7 +1,8 @@
 # schemas.py
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, computed_field
 from typing import List, Optional
+from datetime import datetime
 
 # --------------------------------------------------
 # --- AI-Generated Content Schemas (NEW) ---
@@ -102,6 +103,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
 
 class ProgressSubmit(BaseModel):
     video_id: int
@@ -124,4 +126,135 @@ class CourseListSchema(BaseModel):
     description: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- Search Result Schema ---
+
+class SearchResultSchema(BaseModel):
+    """
+    One search hit. `title` and `snippet` are HTML-escaped, with the matched
+    words wrapped in <mark> tags.
+    """
+    kind: str # "course" | "video" | "quiz_question" | "flashcard"
+    course_id: int
+    course_title: Optional[str] = None
+    video_id: Optional[int] = None
+    youtube_id: Optional[str] = None
+    position: Optional[int] = None # Index of the question/flashcard within its video
+    title: str
+    snippet: Optional[str] = None # Matching part of a course description or flashcard back
+    score: float # Higher is more relevant
+
+# --- Spaced Repetition Review Schemas ---
+
+class ReviewAnswer(BaseModel):
+    """One answered flashcard: SM-2 quality 0 (blackout) to 5 (perfect recall)."""
+    flashcard_id: int
+    card_index: int = Field(ge=0)
+    quality: int = Field(ge=0, le=5)
+    reviewed_at: Optional[datetime] = None # When answered offline; defaults to now
+
+class ReviewStateSchema(BaseModel):
+    """A card's schedule after a review."""
+    flashcard_id: int
+    card_index: int
+    repetitions: int
+    interval_days: int
+    ease_factor: float
+    lapses: int
+    next_due: datetime
+    last_reviewed_at: Optional[datetime] = None
+    last_quality: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class ReviewCardSchema(BaseModel):
+    """A flashcard that is due for review."""
+    flashcard_id: int
+    card_index: int
+    video_id: int
+    front: str
+    back: str
+    next_due: datetime
+    repetitions: int
+    interval_days: int
+    ease_factor: float
+
+# --- Course Progress Summary ---
+
+class CourseProgressSchema(BaseModel):
+    """A user's progress through one course."""
+    course_id: int
+    course_title: str
+    completed_count: int
+    total_videos: int
+    average_score: Optional[float] = None # None until a quiz score is submitted
+    last_activity_at: Optional[datetime] = None
+
+# --- Generation Job Schema ---
+
+class GenerationJobSchema(BaseModel):
+    """Status of a background content generation job."""
+    id: str
+    youtube_id: str
+    status: str
+    generation_mode: Optional[str] = None
+    served_by: Optional[dict[str, Optional[str]]] = None
+    course_id: Optional[int] = None
+    error: Optional[str] = None
+
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def queued_seconds(self) -> Optional[float]:
+        """Time spent waiting for a worker."""
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.created_at).total_seconds()
+
+    @computed_field
+    @property
+    def run_seconds(self) -> Optional[float]:
+        """Time spent running the pipeline and saving its output."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+    class Config:
+        from_attributes = True
+
+# --- Playlist Batch Schemas ---
+
+class ManifestVideo(BaseModel):
+    """One video entry of a playlist manifest (same shape as course_data.json)."""
+    youtube_id: str
+    order_index: Optional[int] = None
+    title: Optional[str] = None
+    duration_seconds: Optional[int] = None
+
+class PlaylistManifest(BaseModel):
+    """A playlist to generate into a single course."""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    playlist_id: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    videos: List[ManifestVideo]
+
+class GenerationBatchSchema(BaseModel):
+    """Status of a playlist batch generation run."""
+    id: str
+    course_id: int
+    status: str
+    concurrency: int
+    generation_mode: Optional[str] = None
+    total_videos: int
+    completed_video_ids: List[str]
+    errors: dict
+
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,298 @@
+# search_index.py
+
+import html
+import os
+import re
+
+from sqlalchemy import delete, insert, select, text, or_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Course, Video, Quiz, Flashcard, SearchDocument
+
+# --- Configuration ---
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+SEARCH_PAGE_SIZE_MAX = int(os.getenv("SEARCH_PAGE_SIZE_MAX", "100"))
+# How much more a match in a title counts than one in the body (bm25 column weight)
+SEARCH_TITLE_WEIGHT = float(os.getenv("SEARCH_TITLE_WEIGHT", "4.0"))
+# Words of context around the matches in a body snippet
+SEARCH_SNIPPET_TOKENS = int(os.getenv("SEARCH_SNIPPET_TOKENS", "16"))
+# Words of the query that are used; the rest are ignored
+SEARCH_MAX_TERMS = 12
+
+SEARCH_KINDS = ("course", "video", "quiz_question", "flashcard")
+
+# Rows written per INSERT when rebuilding the whole index
+REBUILD_BATCH_ROWS = 5000
+
+# ------------------------------------------------------------------
+# --- FTS5 INDEX (SQLite) ---
+# ------------------------------------------------------------------
+# search_fts is an external-content FTS5 table over search_documents: it
+# stores only the inverted index, reads titles/bodies back from
+# search_documents for highlight()/snippet(), and is kept in step by
+# triggers, so writers only ever touch search_documents. `kind` is indexed
+# too, so filtering by kind happens inside the full-text query.
+
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, body, kind, content='search_documents', content_rowid='id', "
+    "tokenize='porter unicode61 remove_diacritics 2')",
+
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, title, body, kind) VALUES (new.id, new.title, new.body, new.kind); END",
+
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body, kind) "
+    "VALUES ('delete', old.id, old.title, old.body, old.kind); END",
+
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body, kind) "
+    "VALUES ('delete', old.id, old.title, old.body, old.kind); "
+    "INSERT INTO search_fts(rowid, title, body, kind) VALUES (new.id, new.title, new.body, new.kind); END",
+]
+
+def create_fts_index(conn):
+    """Creates the FTS5 table and its triggers (SQLite only) and indexes the existing documents."""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    conn.execute(text("INSERT INTO search_fts(search_fts) VALUES ('rebuild')"))
+
+# ------------------------------------------------------------------
+# --- DOCUMENTS ---
+# ------------------------------------------------------------------
+
+def course_document(course_id: int, title: str | None, description: str | None) -> dict:
+    return {
+        "kind": "course", "course_id": course_id, "video_id": None, "position": None,
+        "title": title or "", "body": description or "",
+    }
+
+def video_documents(course_id: int, video_id: int, title: str | None,
+                    questions: list[dict] | None = None, flashcards: list[dict] | None = None) -> list[dict]:
+    """The documents of one video: its title, each quiz question and each flashcard."""
+    documents = [{
+        "kind": "video", "course_id": course_id, "video_id": video_id, "position": None,
+        "title": title or "", "body": "",
+    }]
+    for position, item in enumerate(questions or []):
+        documents.append({
+            "kind": "quiz_question", "course_id": course_id, "video_id": video_id, "position": position,
+            "title": item["question"], "body": "",
+        })
+    for position, item in enumerate(flashcards or []):
+        documents.append({
+            "kind": "flashcard", "course_id": course_id, "video_id": video_id, "position": position,
+            "title": item["front"], "body": item["back"],
+        })
+    return documents
+
+def replace_course_documents(db, course_id: int, documents: list[dict]):
+    """Replaces every document of a course. Does not commit; works on a Session or a Connection."""
+    db.execute(delete(SearchDocument).where(SearchDocument.course_id == course_id))
+    if documents:
+        db.execute(insert(SearchDocument), documents)
+
+def replace_video_documents(db, video_ids: list[int], documents: list[dict]):
+    """Replaces the documents of some videos, leaving the rest of their course alone. Does not commit."""
+    db.execute(delete(SearchDocument).where(SearchDocument.video_id.in_(video_ids)))
+    if documents:
+        db.execute(insert(SearchDocument), documents)
+
+def _content_by_video(db, model, column, video_ids: list[int]) -> dict[int, list[dict]]:
+    # A video's items across all its rows, in row order (as the course payload lists them)
+    items = {}
+    rows = db.execute(select(model.video_id, column).where(model.video_id.in_(video_ids)).order_by(model.id))
+    for video_id, data in rows:
+        items.setdefault(video_id, []).extend(data or [])
+    return items
+
+def index_course(db, course_id: int):
+    """
+    Rebuilds a course's documents from what is in the database (flushed
+    rows only). Does not commit; works on a Session or a Connection.
+    """
+    course = db.execute(select(Course.title, Course.description).where(Course.id == course_id)).first()
+    if course is None:
+        replace_course_documents(db, course_id, [])
+        return
+
+    videos = db.execute(select(Video.id, Video.title).where(Video.course_id == course_id).order_by(Video.id)).all()
+    video_ids = [video.id for video in videos]
+    questions = _content_by_video(db, Quiz, Quiz.question_data, video_ids)
+    flashcards = _content_by_video(db, Flashcard, Flashcard.flashcard_data, video_ids)
+
+    documents = [course_document(course_id, course.title, course.description)]
+    for video in videos:
+        documents += video_documents(course_id, video.id, video.title, questions.get(video.id), flashcards.get(video.id))
+    replace_course_documents(db, course_id, documents)
+
+def rebuild_index(conn) -> int:
+    """Rewrites every document from the catalog tables, streaming them in batches. Returns the count."""
+    conn.execute(delete(SearchDocument))
+    batch, written = [], 0
+
+    def add(documents: list[dict]):
+        nonlocal written
+        batch.extend(documents)
+        if len(batch) >= REBUILD_BATCH_ROWS:
+            conn.execute(insert(SearchDocument), batch)
+            written += len(batch)
+            batch.clear()
+
+    for row in conn.execute(select(Course.id, Course.title, Course.description).order_by(Course.id)):
+        add([course_document(row.id, row.title, row.description)])
+    for row in conn.execute(select(Video.id, Video.course_id, Video.title).where(Video.course_id.is_not(None))):
+        add(video_documents(row.course_id, row.id, row.title))
+
+    # One list per row here: a video with several quiz rows is rare enough
+    # (legacy data) to be fixed up by its next save
+    for model, column, key in ((Quiz, Quiz.question_data, "questions"), (Flashcard, Flashcard.flashcard_data, "flashcards")):
+        rows = conn.execute(
+            select(Video.course_id, model.video_id, column)
+            .join(Video, Video.id == model.video_id)
+            .where(Video.course_id.is_not(None))
+        )
+        for course_id, video_id, data in rows:
+            add(video_documents(course_id, video_id, None, **{key: data})[1:])
+
+    if batch:
+        conn.execute(insert(SearchDocument), batch)
+        written += len(batch)
+    return written
+
+# ------------------------------------------------------------------
+# --- SEARCH ---
+# ------------------------------------------------------------------
+
+# Placeholders for highlight()/snippet() markers, swapped for <mark> tags
+# once the rest of the text has been HTML-escaped
+_MARK_OPEN, _MARK_CLOSE = "\x02", "\x03"
+
+def query_terms(query: str) -> list[str]:
+    """The words of a user query, lowercased; punctuation and FTS5 syntax are dropped."""
+    return re.findall(r"\w+", query.lower())[:SEARCH_MAX_TERMS]
+
+def fts_query(terms: list[str], kind: str | None = None) -> str:
+    """
+    All terms must match the title or body; the last may be a prefix, so
+    results update as the user types.
+    """
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    query = f"{{title body}} : ({' '.join(quoted)})"
+    if kind:
+        query += f' AND kind : "{kind}"'
+    return query
+
+def _render(marked: str | None) -> str | None:
+    if not marked:
+        return None
+    return html.escape(marked).replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+def _mark_terms(value: str, terms: list[str]) -> str:
+    # Highlighting for the LIKE fallback: wrap every occurrence of a term
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    return pattern.sub(lambda match: f"{_MARK_OPEN}{match.group(0)}{_MARK_CLOSE}", value)
+
+FTS_SEARCH_SQL = f"""
+-- Every match is scored, but only the page's rowids are kept (rowid breaks
+-- ties, so pages never overlap). SQLite materializes the CTE: it is used thrice.
+WITH page(id, score) AS (
+    SELECT rowid, bm25(search_fts, :title_weight, 1.0, 0.0) FROM search_fts
+    WHERE search_fts MATCH :query
+    ORDER BY 2, rowid
+    LIMIT :limit OFFSET :offset
+)
+-- highlight() and snippet() need a MATCH cursor: a second, unscored pass
+-- over just the page's rowid range supplies it, joined to the page
+SELECT d.kind, d.course_id, c.title AS course_title, d.video_id, v.youtube_id, d.position,
+       highlight(search_fts, 0, '{_MARK_OPEN}', '{_MARK_CLOSE}') AS title,
+       snippet(search_fts, 1, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', :snippet_tokens) AS snippet,
+       -page.score AS score
+FROM search_fts
+CROSS JOIN page ON page.id = search_fts.rowid
+JOIN search_documents d ON d.id = page.id
+JOIN courses c ON c.id = d.course_id
+LEFT JOIN videos v ON v.id = d.video_id
+WHERE search_fts MATCH :query
+  AND search_fts.rowid BETWEEN (SELECT min(id) FROM page) AND (SELECT max(id) FROM page)
+ORDER BY page.score, page.id
+"""
+
+async def search(
+    db: AsyncSession,
+    query: str,
+    limit: int = SEARCH_PAGE_SIZE,
+    offset: int = 0,
+    kind: str | None = None,
+) -> tuple[list[dict], int | None]:
+    """
+    Ranked full-text search over courses, videos, quiz questions and
+    flashcards. `title` and `snippet` come back HTML-escaped with the
+    matched words wrapped in <mark>. On SQLite every match is ranked by
+    bm25. Returns (results, next_offset); next_offset is None on the last
+    page.
+    """
+    if kind is not None and kind not in SEARCH_KINDS:
+        raise ValueError(f"Unknown search kind '{kind}' (expected one of {', '.join(SEARCH_KINDS)}).")
+    limit = max(1, min(limit, SEARCH_PAGE_SIZE_MAX))
+    terms = query_terms(query)
+    if not terms:
+        return [], None
+
+    if db.bind.dialect.name == "sqlite":
+        rows = (await db.execute(
+            text(FTS_SEARCH_SQL),
+            {
+                "query": fts_query(terms, kind),
+                "title_weight": SEARCH_TITLE_WEIGHT,
+                "snippet_tokens": SEARCH_SNIPPET_TOKENS,
+                "limit": limit + 1,
+                "offset": offset,
+            },
+        )).mappings().all()
+        results = [
+            {**row, "title": _render(row["title"]) or "", "snippet": _render(row["snippet"])}
+            for row in rows
+        ]
+    else:
+        results = await _search_like(db, terms, limit + 1, offset, kind)
+
+    # One extra row tells whether another page exists
+    if len(results) > limit:
+        return results[:limit], offset + limit
+    return results, None
+
+async def _search_like(db: AsyncSession, terms: list[str], limit: int, offset: int, kind: str | None) -> list[dict]:
+    """
+    Fallback for databases without FTS5: every term must appear in the
+    title or body; title matches rank first. Scans search_documents.
+    """
+    query = (
+        select(
+            SearchDocument.kind, SearchDocument.course_id, Course.title.label("course_title"),
+            SearchDocument.video_id, Video.youtube_id, SearchDocument.position,
+            SearchDocument.title, SearchDocument.body,
+        )
+        .join(Course, Course.id == SearchDocument.course_id)
+        .outerjoin(Video, Video.id == SearchDocument.video_id)
+        .where(*(
+            or_(SearchDocument.title.ilike(f"%{term}%"), SearchDocument.body.ilike(f"%{term}%"))
+            for term in terms
+        ))
+    )
+    if kind:
+        query = query.where(SearchDocument.kind == kind)
+    in_title = case((SearchDocument.title.ilike(f"%{terms[0]}%"), 0), else_=1)
+    rows = (await db.execute(query.order_by(in_title, SearchDocument.id).limit(limit).offset(offset))).mappings().all()
+
+    results = []
+    for row in rows:
+        result = {key: row[key] for key in ("kind", "course_id", "course_title", "video_id", "youtube_id", "position")}
+        result["title"] = _render(_mark_terms(row["title"], terms)) or ""
+        result["snippet"] = _render(_mark_terms(row["body"], terms))
+        result["score"] = 0.0
+        results.append(result)
+    return results
@@ -1,9 +1,11 @@
 import json
 import os
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
-from models import Course, Video, Quiz, User 
+from database import SessionLocal, engine
+from models import User 
 from auth_utils import get_password_hash # We need this to hash the default user password
+from course_import import import_course
+from migrations import migrate
 
 # --- Configuration ---
 # You must have your course_data.json file present in the same directory
@@ -15,7 +17,7 @@ def seed_data():
     """Reads static JSON data and populates the database."""
     
     # 1. Ensure all tables are created (creates the sql_app.db file if it doesn't exist)
-    Base.metadata.create_all(bind=engine)
+    migrate(engine)
     
     db: Session = SessionLocal()
     
@@ -46,50 +48,13 @@ def seed_data():
         db.add(test_user)
         db.commit()
     
-    # 3. SEED COURSE CONTENT
-    course_id = course_json.get("id")
-    if db.query(Course).filter(Course.id == course_id).first():
-        print(f"Course ID {course_id} already seeded. Skipping content creation.")
+    # 3. SEED COURSE CONTENT (upserted in one transaction, so re-running refreshes it)
+    print(f"Seeding Course ID {course_json.get('id')}: {course_json['title']}")
+    try:
+        _, counts = import_course(db, course_json)
+    finally:
         db.close()
-        return
-
-    print(f"Seeding Course ID {course_id}: {course_json['title']}")
-    
-    # Create the Course entry
-    course = Course(
-        id=course_id,
-        title=course_json.get("title"),
-        description=course_json.get("description"),
-        playlist_id=course_json.get("playlist_id"),
-        thumbnail_url=course_json.get("thumbnail_url")
-    )
-    db.add(course)
-    db.commit()
-    db.refresh(course)
-
-    # Create Video and Quiz entries
-    for video_data in course_json.get("videos", []):
-        video = Video(
-            course_id=course.id,
-            order_index=video_data.get("order_index"),
-            title=video_data.get("title"),
-            youtube_id=video_data.get("youtube_id"),
-            duration_seconds=video_data.get("duration_seconds")
-        )
-        db.add(video)
-        db.commit()
-        db.refresh(video)
-        
-        # Create the Quiz entry, storing the list of questions as a JSON string
-        if video_data.get("quiz"):
-            quiz = Quiz(
-                video_id=video.id,
-                question_data=json.dumps(video_data["quiz"])
-            )
-            db.add(quiz)
-            db.commit()
-
-    db.close()
+    print(f"  {counts['videos']} videos, {counts['quizzes']} quizzes, {counts['flashcards']} flashcard sets")
     print(f"✅ Successfully seeded Course and Users into 'sql_app.db'")
 
 if __name__ == "__main__":
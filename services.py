@@ -1,31 +1,64 @@
 # services.py
 
-import json
-from sqlalchemy.orm import Session
-from models import Course, Video, Quiz, UserProgress, Flashcard
+import os
+import orjson
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, delete, func, case, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from models import Course, Video, Quiz, UserProgress, Flashcard, CourseProgress, GeneratedContent, ReviewState
+from schemas import QuizQuestion, FlashcardItem, ProgressSubmit, ReviewAnswer
+from course_cache import course_cache
+from search_index import course_document, video_documents, replace_course_documents, replace_video_documents
     
 # ------------------------------------------------------------------
 # --- PERSISTENCE HELPER FUNCTION ---
 # ------------------------------------------------------------------
 
-def save_generated_content(db: Session, quiz_data: dict, flashcard_data: dict, video_id: str) -> Course:
+# generation_version recorded when a content type failed: it never matches
+# GENERATION_VERSION, so the next request regenerates the video
+INCOMPLETE_GENERATION = "incomplete"
+
+def save_generated_content(
+    db: Session,
+    quiz_data: dict | None,
+    flashcard_data: dict | None,
+    video_id: str,
+    generation_version: str,
+) -> Course:
     """
     Saves ALL generated content (Quiz and Flashcards) into the DB.
+    Either payload may be None when its chain failed; the other is still saved,
+    but the video is recorded as INCOMPLETE_GENERATION rather than as
+    `generation_version`, so it is regenerated on the next request.
+    The video's course is found through GeneratedContent (one per youtube_id)
+    and its content replaced, so regenerating never creates a second course.
     """
+    if quiz_data is None and flashcard_data is None:
+        raise ValueError("No generated content to save.")
+
+    # Both chains are asked for the video title, so use whichever one succeeded
+    video_title = (quiz_data or flashcard_data)['video_title']
+
     try:
         # 1. Create/Update the Course and Video Entries (Logic remains the same)
-        course_title = f"AI Generated: {quiz_data['video_title']}"
+        course_title = f"AI Generated: {video_title}"
         
-        existing_course = db.query(Course).filter(Course.title == course_title).first()
-        if existing_course:
+        generated = get_generated_content(db, video_id)
+        if generated:
             # Delete old content (including flashcards) for update
-            for video in existing_course.videos:
+            course = generated.course
+            delete_review_states(db, [video.id for video in course.videos])
+            # Progress on the replaced videos no longer counts towards the
+            # course; summaries restart from the new videos' progress
+            db.query(CourseProgress).filter(CourseProgress.course_id == course.id).delete()
+            for video in course.videos:
                 db.query(Quiz).filter(Quiz.video_id == video.id).delete()
                 db.query(Flashcard).filter(Flashcard.video_id == video.id).delete() # NEW: Delete old flashcards
-            db.query(Video).filter(Video.course_id == existing_course.id).delete()
-            course = existing_course
-        else:
-            # Create a new course entry
+            db.query(Video).filter(Video.course_id == course.id).delete()
+            course.title = course_title
+        else:            # Create a new course entry
             course = Course(
                 title=course_title,
                 description=f"AI-generated content for YouTube video ID: {video_id}",
@@ -41,7 +74,7 @@ def save_generated_content(db: Session, quiz_data: dict, flashcard_data: dict, v
         video = Video(
             course_id=course.id,
             order_index=1,
-            title=quiz_data['video_title'], # Use quiz data for video title
+            title=video_title,
             youtube_id=video_id,
             duration_seconds=0
         )
@@ -50,30 +83,662 @@ def save_generated_content(db: Session, quiz_data: dict, flashcard_data: dict, v
         db.refresh(video) 
 
         # 3. Create the Quiz Entry (Logic remains the same)
-        quiz = Quiz(
-            video_id=video.id,
-            question_data=json.dumps(quiz_data['quiz'])
-        )
-        db.add(quiz)
+        if quiz_data is not None:
+            quiz = Quiz(
+                video_id=video.id,
+                question_data=quiz_data['quiz']
+            )
+            db.add(quiz)
         
         # 🛑 NEW STEP: Create the Flashcard Entry
-        flashcard = Flashcard(
-            video_id=video.id,
-            flashcard_data=json.dumps(flashcard_data['flashcards'])
-        )
-        db.add(flashcard)
+        if flashcard_data is not None:
+            flashcard = Flashcard(
+                video_id=video.id,
+                flashcard_data=flashcard_data['flashcards']
+            )
+            db.add(flashcard)
+
+        # 4. Point the video's youtube_id at this content
+        if generated is None:
+            generated = GeneratedContent(youtube_id=video_id)
+            db.add(generated)
+        generated.course_id = course.id
+        complete = quiz_data is not None and flashcard_data is not None
+        generated.generation_version = generation_version if complete else INCOMPLETE_GENERATION
+        generated.generated_at = datetime.utcnow()
+
+        # 5. Replace the course's search documents in the same transaction
+        replace_course_documents(db, course.id, [
+            course_document(course.id, course.title, course.description),
+            *video_documents(
+                course.id, video.id, video.title,
+                quiz_data['quiz'] if quiz_data is not None else None,
+                flashcard_data['flashcards'] if flashcard_data is not None else None,
+            ),
+        ])
         
         db.commit() 
         db.refresh(course)
+        course_cache.invalidate(course.id)
         return course
 
     except Exception as e:
         db.rollback() 
         raise e
     
-# --- NEW: Fetch All Courses ---
-def get_all_courses(db: Session):
+def get_generated_content(db: Session, youtube_id: str, generation_version: str | None = None) -> GeneratedContent | None:
     """
-    Fetches a list of all courses available in the database.
+    The content generated for a video, optionally only if it was produced by
+    `generation_version`. A single lookup on the unique youtube_id index.
+    """
+    query = db.query(GeneratedContent).filter(GeneratedContent.youtube_id == youtube_id)
+    if generation_version is not None:
+        query = query.filter(GeneratedContent.generation_version == generation_version)
+    return query.first()
+
+# ------------------------------------------------------------------
+# --- PLAYLIST (BATCH) PERSISTENCE ---
+# ------------------------------------------------------------------
+
+def get_or_create_playlist_course(db: Session, manifest: dict) -> Course:
     """
-    return db.query(Course).all()
\ No newline at end of file
+    Returns the course a playlist batch writes into: the existing course for
+    the manifest's playlist_id if there is one, otherwise a new course.
+    """
+    playlist_id = manifest.get("playlist_id")
+    if playlist_id:
+        course = db.query(Course).filter(Course.playlist_id == playlist_id).first()
+        if course:
+            return course
+
+    course = Course(
+        title=manifest.get("title") or f"AI Generated Playlist ({len(manifest['videos'])} videos)",
+        description=manifest.get("description") or "AI-generated content for a YouTube playlist.",
+        playlist_id=playlist_id,
+        thumbnail_url=manifest.get("thumbnail_url")
+    )
+    db.add(course)
+    db.flush()
+    replace_course_documents(db, course.id, [course_document(course.id, course.title, course.description)])
+    return course
+
+def save_playlist_video(
+    db: Session,
+    course_id: int,
+    video_entry: dict,
+    quiz_data: dict | None,
+    flashcard_data: dict | None,
+) -> Video:
+    """
+    Upserts one video of a playlist course (matched by youtube_id) and
+    replaces its generated content. Does NOT commit: the batch runner commits
+    it together with its own progress so a resumed run never redoes it, and
+    must invalidate the course payload cache afterwards.
+    """
+    if quiz_data is None and flashcard_data is None:
+        raise ValueError("No generated content to save.")
+
+    youtube_id = video_entry["youtube_id"]
+    video = db.query(Video).filter(
+        Video.course_id == course_id,
+        Video.youtube_id == youtube_id
+    ).first()
+    if video:
+        db.query(Quiz).filter(Quiz.video_id == video.id).delete()
+        delete_review_states(db, [video.id])
+        db.query(Flashcard).filter(Flashcard.video_id == video.id).delete()
+    else:
+        video = Video(course_id=course_id, youtube_id=youtube_id)
+        db.add(video)
+
+    video.order_index = video_entry["order_index"]
+    video.title = video_entry.get("title") or (quiz_data or flashcard_data)['video_title']
+    video.duration_seconds = video_entry.get("duration_seconds") or 0
+    db.flush()
+
+    if quiz_data is not None:
+        db.add(Quiz(video_id=video.id, question_data=quiz_data['quiz']))
+    if flashcard_data is not None:
+        db.add(Flashcard(video_id=video.id, flashcard_data=flashcard_data['flashcards']))
+
+    replace_video_documents(db, [video.id], video_documents(
+        course_id, video.id, video.title,
+        quiz_data['quiz'] if quiz_data is not None else None,
+        flashcard_data['flashcards'] if flashcard_data is not None else None,
+    ))
+    return video
+
+# ------------------------------------------------------------------
+# --- PROGRESS UPSERTS ---
+# ------------------------------------------------------------------
+
+# Upper bound on items per POST /api/progress/batch (5 bound values per row)
+PROGRESS_BATCH_MAX_ITEMS = int(os.getenv("PROGRESS_BATCH_MAX_ITEMS", "500"))
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+async def upsert_progress(db: AsyncSession, user_id: int, items: list[ProgressSubmit]) -> list[UserProgress]:
+    """
+    Writes progress for many videos in a single INSERT ... ON CONFLICT DO UPDATE
+    against the (user_id, video_id) unique index, and commits.
+
+    If a video appears more than once, the last item wins. completed_at is
+    only set the first time a video is completed. The affected courses'
+    CourseProgress summaries are adjusted by the difference each row made,
+    and completed videos' flashcards queued for review, before the commit.
+    """
+    latest = {item.video_id: item for item in items}
+    if not latest:
+        return []
+
+    insert = _UPSERT_DIALECTS[db.bind.dialect.name]
+    index_elements = [UserProgress.user_id, UserProgress.video_id]
+
+    # The summaries are adjusted by each row's change, so read the previous
+    # values under a write: missing rows are first created in their initial
+    # state. That takes SQLite's write lock (and creates rows Postgres can
+    # lock), so concurrent writers can't both diff against the same state.
+    await db.execute(insert(UserProgress).values([
+        {"user_id": user_id, "video_id": video_id, "is_completed": False} for video_id in latest
+    ]).on_conflict_do_nothing(index_elements=index_elements))
+    previous = (await db.execute(
+        select(UserProgress.video_id, UserProgress.is_completed, UserProgress.quiz_score, Video.course_id)
+        .join(Video, Video.id == UserProgress.video_id)
+        .where(UserProgress.user_id == user_id, UserProgress.video_id.in_(list(latest)))
+        .with_for_update(of=UserProgress)
+    )).all()
+
+    stmt = insert(UserProgress).values([
+        {
+            "user_id": user_id,
+            "video_id": item.video_id,
+            "quiz_score": item.quiz_score,
+            "is_completed": item.is_completed,
+            "completed_at": func.now() if item.is_completed else None,
+        }
+        for item in latest.values()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            "quiz_score": stmt.excluded.quiz_score,
+            "is_completed": stmt.excluded.is_completed,
+            "completed_at": func.coalesce(UserProgress.completed_at, stmt.excluded.completed_at),
+        },
+    ).returning(UserProgress)
+
+    progress = (await db.scalars(stmt, execution_options={"populate_existing": True})).all()
+
+    # Same transaction: the summaries can never disagree with the rows
+    deltas = course_progress_deltas(previous, latest)
+    if deltas:
+        await db.execute(course_progress_increment(db.bind.dialect.name, user_id, deltas))
+    # Completing a video queues its flashcards for spaced repetition
+    completed = [item.video_id for item in latest.values() if item.is_completed]
+    if completed:
+        await enroll_review_cards(db, user_id, completed)
+    await db.commit()
+    return progress
+
+# --- Per-course summaries (CourseProgress) ---
+
+def course_progress_deltas(previous, latest: dict) -> dict[int, tuple[int, int, int]]:
+    """
+    Per course, how much (completed_count, score_sum, scored_count) change
+    when each video's progress goes from its `previous` row (video_id,
+    is_completed, quiz_score, course_id) to the submitted item in `latest`.
+    Every touched course is included, so its last activity moves even when
+    nothing it counts changed.
+    """
+    deltas = {}
+    for row in previous:
+        if row.course_id is None:
+            continue
+        item = latest[row.video_id]
+        completed, score_sum, scored = deltas.get(row.course_id, (0, 0, 0))
+        deltas[row.course_id] = (
+            completed + int(item.is_completed) - int(bool(row.is_completed)),
+            score_sum + (item.quiz_score or 0) - (row.quiz_score or 0),
+            scored + (item.quiz_score is not None) - (row.quiz_score is not None),
+        )
+    return deltas
+
+def course_progress_increment(dialect_name: str, user_id: int, deltas: dict[int, tuple[int, int, int]]):
+    """
+    Builds one INSERT ... ON CONFLICT DO UPDATE adding `deltas` (from
+    course_progress_deltas) to the user's CourseProgress rows. A missing
+    row starts at the delta: a course without a summary had no progress.
+    """
+    insert = _UPSERT_DIALECTS[dialect_name]
+    stmt = insert(CourseProgress).values([
+        {
+            "user_id": user_id,
+            "course_id": course_id,
+            "completed_count": completed,
+            "score_sum": score_sum,
+            "scored_count": scored,
+            "last_activity_at": func.now(),
+        }
+        for course_id, (completed, score_sum, scored) in deltas.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[CourseProgress.user_id, CourseProgress.course_id],
+        set_={
+            "completed_count": CourseProgress.completed_count + stmt.excluded.completed_count,
+            "score_sum": CourseProgress.score_sum + stmt.excluded.score_sum,
+            "scored_count": CourseProgress.scored_count + stmt.excluded.scored_count,
+            "last_activity_at": stmt.excluded.last_activity_at,
+        },
+    )
+
+def course_progress_upsert(dialect_name: str):
+    """
+    Builds an INSERT ... SELECT ... ON CONFLICT DO UPDATE that rebuilds
+    every CourseProgress row from the UserProgress rows. Used to backfill
+    (migration 0003, benchmark data); progress writes apply deltas instead.
+    """
+    last_activity = func.max(func.coalesce(UserProgress.completed_at, UserProgress.started_at))
+    aggregate = (
+        select(
+            UserProgress.user_id,
+            Video.course_id,
+            func.sum(case((UserProgress.is_completed.is_(True), 1), else_=0)),
+            func.coalesce(func.sum(UserProgress.quiz_score), 0),
+            func.count(UserProgress.quiz_score),
+            last_activity,
+        )
+        .join(Video, Video.id == UserProgress.video_id)
+        # SQLite needs a WHERE clause to parse INSERT ... SELECT ... ON CONFLICT
+        .where(true(), Video.course_id.is_not(None))
+        .group_by(UserProgress.user_id, Video.course_id)
+    )
+
+    insert = _UPSERT_DIALECTS[dialect_name]
+    columns = ["user_id", "course_id", "completed_count", "score_sum", "scored_count", "last_activity_at"]
+    stmt = insert(CourseProgress).from_select(columns, aggregate)
+    return stmt.on_conflict_do_update(
+        index_elements=[CourseProgress.user_id, CourseProgress.course_id],
+        set_={column: stmt.excluded[column] for column in columns[2:]},
+    )
+
+def _course_progress_query(user_id: int, include_unstarted: bool = False):
+    total_videos = (
+        select(func.count(Video.id))
+        .where(Video.course_id == Course.id)
+        .correlate(Course)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            Course.id.label("course_id"),
+            Course.title.label("course_title"),
+            func.coalesce(CourseProgress.completed_count, 0).label("completed_count"),
+            CourseProgress.score_sum,
+            CourseProgress.scored_count,
+            CourseProgress.last_activity_at,
+            total_videos.label("total_videos"),
+        )
+        .select_from(Course)
+        .join(
+            CourseProgress,
+            (CourseProgress.course_id == Course.id) & (CourseProgress.user_id == user_id),
+            isouter=include_unstarted,
+        )
+    )
+
+def _summary(row) -> dict:
+    return {
+        "course_id": row.course_id,
+        "course_title": row.course_title,
+        "completed_count": row.completed_count,
+        "total_videos": row.total_videos,
+        "average_score": (row.score_sum / row.scored_count) if row.scored_count else None,
+        "last_activity_at": row.last_activity_at,
+    }
+
+async def get_course_progress_summaries(db: AsyncSession, user_id: int) -> list[dict]:
+    """Every course the user has progress in, most recently active first."""
+    query = (
+        _course_progress_query(user_id)
+        .order_by(CourseProgress.last_activity_at.desc(), Course.id)
+    )
+    return [_summary(row) for row in (await db.execute(query)).all()]
+
+async def get_course_progress_summary(db: AsyncSession, user_id: int, course_id: int) -> dict | None:
+    """The user's progress in one course (zeros if not started). None if the course doesn't exist."""
+    row = (await db.execute(
+        _course_progress_query(user_id, include_unstarted=True).where(Course.id == course_id)
+    )).first()
+    return _summary(row) if row else None
+
+# ------------------------------------------------------------------
+# --- SPACED REPETITION REVIEWS (SM-2) ---
+# ------------------------------------------------------------------
+
+# Upper bound on answers per POST /api/review (11 bound values per row)
+REVIEW_BATCH_MAX_ITEMS = int(os.getenv("REVIEW_BATCH_MAX_ITEMS", "500"))
+REVIEW_DUE_LIMIT = int(os.getenv("REVIEW_DUE_LIMIT", "20"))
+REVIEW_DUE_LIMIT_MAX = int(os.getenv("REVIEW_DUE_LIMIT_MAX", "200"))
+# Rows per executemany() when backfilling
+REVIEW_INSERT_CHUNK_ROWS = 1000
+
+SM2_INITIAL_EASE = 2.5
+SM2_MIN_EASE = 1.3
+
+# ReviewState columns rewritten by a review
+REVIEW_SCHEDULE_COLUMNS = (
+    "repetitions", "interval_days", "ease_factor", "lapses", "next_due", "last_reviewed_at", "last_quality"
+)
+
+def sm2_schedule(repetitions: int, interval_days: int, ease_factor: float, quality: int) -> tuple[int, int, float]:
+    """
+    One SM-2 step: a card's (repetitions, interval_days, ease_factor) after
+    an answer of `quality` (0-5). Answers below 3 start the card over at a
+    one-day interval; every answer adjusts the ease, never below SM2_MIN_EASE.
+    """
+    if quality >= 3:
+        if repetitions == 0:
+            interval_days = 1
+        elif repetitions == 1:
+            interval_days = 6
+        else:
+            interval_days = max(1, round(interval_days * ease_factor))
+        repetitions += 1
+    else:
+        repetitions, interval_days = 0, 1
+    ease_factor = max(SM2_MIN_EASE, ease_factor + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return repetitions, interval_days, ease_factor
+
+def new_review_rows(user_id: int, flashcards, due: datetime) -> list[dict]:
+    """Fresh ReviewState rows, due at `due`, for every card of the given (flashcard_id, flashcard_data) rows."""
+    return [
+        {
+            "user_id": user_id,
+            "flashcard_id": flashcard_id,
+            "card_index": card_index,
+            "repetitions": 0,
+            "interval_days": 0,
+            "ease_factor": SM2_INITIAL_EASE,
+            "lapses": 0,
+            "next_due": due,
+        }
+        for flashcard_id, cards in flashcards
+        for card_index in range(len(cards or []))
+    ]
+
+async def enroll_review_cards(db: AsyncSession, user_id: int, video_ids: list[int]):
+    """
+    Queues the flashcards of `video_ids` for review, due now. Cards the user
+    already has a schedule for keep it. Does not commit.
+    """
+    flashcards = (await db.execute(
+        select(Flashcard.id, Flashcard.flashcard_data).where(Flashcard.video_id.in_(video_ids))
+    )).all()
+    rows = new_review_rows(user_id, flashcards, datetime.utcnow())
+
+    if not rows:
+        return
+    # Core executemany: the statement compiles once (and is cached), where a
+    # multi-row VALUES would be recompiled for every batch size, and skips
+    # the ORM's per-row bulk bookkeeping
+    insert = _UPSERT_DIALECTS[db.bind.dialect.name]
+    await db.execute(
+        insert(ReviewState.__table__).on_conflict_do_nothing(
+            index_elements=[ReviewState.user_id, ReviewState.flashcard_id, ReviewState.card_index]
+        ),
+        rows,
+    )
+
+def backfill_review_states(conn) -> int:
+    """Queues every flashcard of every completed video for its user (used to backfill). Returns the count."""
+    rows = conn.execute(
+        select(UserProgress.user_id, Flashcard.id, Flashcard.flashcard_data)
+        .join(Flashcard, Flashcard.video_id == UserProgress.video_id)
+        .where(UserProgress.is_completed.is_(True))
+    )
+    due = datetime.utcnow()
+    batch, written = [], 0
+    for user_id, flashcard_id, cards in rows:
+        batch += new_review_rows(user_id, [(flashcard_id, cards)], due)
+        if len(batch) >= REVIEW_INSERT_CHUNK_ROWS:
+            conn.execute(ReviewState.__table__.insert(), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        conn.execute(ReviewState.__table__.insert(), batch)
+        written += len(batch)
+    return written
+
+def delete_review_states(db, video_ids: list[int]):
+    """
+    Drops the review schedules of the videos' flashcards; call before
+    replacing those flashcards. Works on a Session or a Connection.
+    """
+    db.execute(delete(ReviewState).where(ReviewState.flashcard_id.in_(
+        select(Flashcard.id).where(Flashcard.video_id.in_(video_ids))
+    )))
+
+async def get_due_reviews(db: AsyncSession, user_id: int, limit: int = REVIEW_DUE_LIMIT,
+                          now: datetime | None = None) -> list[dict]:
+    """
+    The user's cards due by `now` (default: now), most overdue first. A
+    range scan of the (user_id, next_due) index that stops after `limit`
+    rows, however many cards the user has.
+    """
+    limit = max(1, min(limit, REVIEW_DUE_LIMIT_MAX))
+    rows = (await db.execute(
+        select(
+            ReviewState.flashcard_id, ReviewState.card_index, ReviewState.next_due,
+            ReviewState.repetitions, ReviewState.interval_days, ReviewState.ease_factor,
+            Flashcard.video_id, Flashcard.flashcard_data,
+        )
+        .join(Flashcard, Flashcard.id == ReviewState.flashcard_id)
+        .where(ReviewState.user_id == user_id, ReviewState.next_due <= (now or datetime.utcnow()))
+        .order_by(ReviewState.next_due)
+        .limit(limit)
+    )).all()
+
+    cards = []
+    for row in rows:
+        if row.card_index >= len(row.flashcard_data or []):
+            continue
+        card = row.flashcard_data[row.card_index]
+        cards.append({
+            "flashcard_id": row.flashcard_id,
+            "card_index": row.card_index,
+            "video_id": row.video_id,
+            "front": card["front"],
+            "back": card["back"],
+            "next_due": row.next_due,
+            "repetitions": row.repetitions,
+            "interval_days": row.interval_days,
+            "ease_factor": row.ease_factor,
+        })
+    return cards
+
+async def record_reviews(db: AsyncSession, user_id: int, answers: list[ReviewAnswer]) -> list[ReviewState]:
+    """
+    Applies a batch of answers, in order, to the cards' SM-2 schedules and
+    writes them with one INSERT ... ON CONFLICT DO UPDATE against the
+    (user_id, flashcard_id, card_index) unique index, then commits. Cards
+    not queued yet are added. Raises LookupError for cards that don't exist.
+    """
+    if not answers:
+        return []
+
+    flashcard_ids = {answer.flashcard_id for answer in answers}
+    sizes = {
+        flashcard_id: len(cards or [])
+        for flashcard_id, cards in (await db.execute(
+            select(Flashcard.id, Flashcard.flashcard_data).where(Flashcard.id.in_(flashcard_ids))
+        )).all()
+    }
+    unknown = sorted({
+        (answer.flashcard_id, answer.card_index) for answer in answers
+        if answer.card_index >= sizes.get(answer.flashcard_id, 0)
+    })
+    if unknown:
+        raise LookupError(f"Unknown flashcard(s): {', '.join(f'{f}/{i}' for f, i in unknown)}")
+
+    states = {
+        (state.flashcard_id, state.card_index): {column: getattr(state, column) for column in REVIEW_SCHEDULE_COLUMNS}
+        for state in (await db.scalars(
+            select(ReviewState).where(ReviewState.user_id == user_id, ReviewState.flashcard_id.in_(flashcard_ids))
+        )).all()
+    }
+
+    now = datetime.utcnow()
+    touched = {}
+    for answer in answers:
+        key = (answer.flashcard_id, answer.card_index)
+        state = states.get(key) or {"repetitions": 0, "interval_days": 0, "ease_factor": SM2_INITIAL_EASE, "lapses": 0}
+        reviewed_at = answer.reviewed_at or now
+        if reviewed_at.tzinfo is not None:
+            # Stored as naive UTC, like every other timestamp
+            reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        repetitions, interval_days, ease_factor = sm2_schedule(
+            state["repetitions"], state["interval_days"], state["ease_factor"], answer.quality
+        )
+        states[key] = touched[key] = {
+            "repetitions": repetitions,
+            "interval_days": interval_days,
+            "ease_factor": ease_factor,
+            # A lapse is forgetting a card that had been learned
+            "lapses": state["lapses"] + (1 if answer.quality < 3 and state["repetitions"] else 0),
+            "next_due": reviewed_at + timedelta(days=interval_days),
+            "last_reviewed_at": reviewed_at,
+            "last_quality": answer.quality,
+        }
+
+    insert = _UPSERT_DIALECTS[db.bind.dialect.name]
+    stmt = insert(ReviewState)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ReviewState.user_id, ReviewState.flashcard_id, ReviewState.card_index],
+        set_={column: stmt.excluded[column] for column in REVIEW_SCHEDULE_COLUMNS},
+    ).returning(ReviewState, sort_by_parameter_order=True)
+
+    # Bulk (executemany) form, as in enroll_review_cards: one cached statement, sent in batches
+    reviewed = (await db.scalars(stmt, [
+        {"user_id": user_id, "flashcard_id": flashcard_id, "card_index": card_index, **state}
+        for (flashcard_id, card_index), state in touched.items()
+    ], execution_options={"populate_existing": True})).all()
+    await db.commit()
+    return reviewed
+
+# --- Course Catalog (Keyset Pagination) ---
+
+COURSE_PAGE_SIZE = int(os.getenv("COURSE_PAGE_SIZE", "20"))
+COURSE_PAGE_SIZE_MAX = int(os.getenv("COURSE_PAGE_SIZE_MAX", "100"))
+
+async def get_courses_page(
+    db: AsyncSession,
+    limit: int = COURSE_PAGE_SIZE,
+    cursor: int | None = None,
+    newest_first: bool = False,
+) -> tuple[list, int | None]:
+    """
+    Fetches one page of the catalog, keyed on Course.id, loading only the
+    listed columns. `cursor` is the last id of the previous page.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+
+    Ids are assigned in insertion order, so newest_first (id descending)
+    lists the most recently added courses first.
+    """
+    limit = max(1, min(limit, COURSE_PAGE_SIZE_MAX))
+    query = select(Course.id, Course.title, Course.description)
+
+    if newest_first:
+        if cursor is not None:
+            query = query.where(Course.id < cursor)
+        query = query.order_by(Course.id.desc())
+    else:
+        if cursor is not None:
+            query = query.where(Course.id > cursor)
+        query = query.order_by(Course.id.asc())
+
+    # Fetch one extra row to learn whether another page exists
+    rows = (await db.execute(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+# ------------------------------------------------------------------
+# --- COURSE READ PATH ---
+# ------------------------------------------------------------------
+
+async def load_course_tree(db: AsyncSession, course_id: int) -> Course | None:
+    """
+    Loads a course with all videos, quizzes and flashcards in a fixed number
+    of queries (one per level) instead of lazy-loading per video.
+    """
+    result = await db.execute(
+        select(Course).options(
+            selectinload(Course.videos).selectinload(Video.quizzes),
+            selectinload(Course.videos).selectinload(Video.flashcards),
+        ).where(Course.id == course_id)
+    )
+    return result.scalars().first()
+
+def _project(items: list | None, fields: tuple[str, ...]) -> list[dict]:
+    # Keep exactly the fields the response schema exposes (e.g. drop 'explaination')
+    return [{field: item[field] for field in fields} for item in items or []]
+
+QUIZ_QUESTION_FIELDS = tuple(QuizQuestion.model_fields)
+FLASHCARD_ITEM_FIELDS = tuple(FlashcardItem.model_fields)
+
+def serialize_course(course: Course) -> bytes:
+    """
+    Renders a loaded course tree as CourseSchema JSON with orjson. Quiz and
+    flashcard content was validated when it was written (see models.ValidatedJSONList),
+    so it is projected straight into the payload without Pydantic re-validation.
+    """
+    payload = {
+        "id": course.id,
+        "title": course.title,
+        "description": course.description,
+        "playlist_id": course.playlist_id,
+        "thumbnail_url": course.thumbnail_url,
+        "videos": [
+            {
+                "id": video.id,
+                "course_id": video.course_id,
+                "order_index": video.order_index,
+                "title": video.title,
+                "youtube_id": video.youtube_id,
+                "duration_seconds": video.duration_seconds,
+                "quizzes": [
+                    {
+                        "id": quiz.id,
+                        "video_id": quiz.video_id,
+                        "question_data": _project(quiz.question_data, QUIZ_QUESTION_FIELDS),
+                    }
+                    for quiz in video.quizzes
+                ],
+                "flashcards": [
+                    {
+                        "id": flashcard.id,
+                        "video_id": flashcard.video_id,
+                        "flashcard_data": _project(flashcard.flashcard_data, FLASHCARD_ITEM_FIELDS),
+                    }
+                    for flashcard in video.flashcards
+                ],
+            }
+            for video in sorted(course.videos, key=lambda v: (v.order_index is None, v.order_index, v.id))
+        ],
+    }
+    return orjson.dumps(payload)
+
+async def get_course_payload(db: AsyncSession, course_id: int) -> bytes | None:
+    """Returns the serialized course, from the payload cache when possible. None if not found."""
+    payload = course_cache.get(course_id)
+    if payload is not None:
+        return payload
+
+    course = await load_course_tree(db, course_id)
+    if course is None:
+        return None
+    payload = serialize_course(course)
+    course_cache.put(course_id, payload)
+    return payload
@@ -0,0 +1,70 @@
+# tests/conftest.py
+
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+# The app reads its configuration at import: point it at a throwaway
+# database, and keep generation out of the test process
+_DATA_DIR = Path(tempfile.mkdtemp(prefix="upskiller-tests-"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_DATA_DIR / 'test.db'}"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["GENERATION_RUNNER"] = "external"
+
+import httpx
+import pytest
+
+TEST_PASSWORD = "testpassword123"
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    return main.app
+
+@pytest.fixture(scope="session")
+async def client(app):
+    """
+    An HTTP client talking to the app in process. Startup and shutdown run
+    once for the whole session, as they do once per worker in production.
+    """
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+@pytest.fixture
+async def auth_headers(client):
+    """Registers a fresh user and returns its Authorization header."""
+    email = f"user-{uuid.uuid4().hex[:8]}@example.com"
+    response = await client.post("/api/auth/register", json={"email": email, "password": TEST_PASSWORD})
+    response.raise_for_status()
+    response = await client.post("/api/auth/login", data={"username": email, "password": TEST_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def course(anyio_backend, client):
+    """
+    A course with ten videos. Returns (course_id, [video_id, ...]). Sync tests
+    can use it too: anyio_backend is what lets them start the async client.
+    """
+    from database import SessionLocal
+    from models import Course, Video
+
+    db = SessionLocal()
+    try:
+        course = Course(title="Test Course", description="For tests.")
+        course.videos = [
+            Video(order_index=index, title=f"Video {index}", youtube_id=uuid.uuid4().hex[:11], duration_seconds=60)
+            for index in range(10)
+        ]
+        db.add(course)
+        db.commit()
+        return course.id, [video.id for video in course.videos]
+    finally:
+        db.close()
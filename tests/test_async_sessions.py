@@ -0,0 +1,84 @@
+# tests/test_async_sessions.py
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+import database
+import main
+
+pytestmark = pytest.mark.anyio
+
+# A query that keeps SQLite busy for a noticeable fraction of a second
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 3000000) SELECT count(*) FROM n"
+)
+
+async def test_slow_query_does_not_block_other_requests(client, auth_headers, course, monkeypatch):
+    """While one request waits on a slow query, other requests are served to completion."""
+    list_courses = main.get_courses_page
+    query_started = asyncio.Event()
+
+    async def slow_courses_page(db, **kwargs):
+        query_started.set()
+        await db.execute(SLOW_QUERY)
+        return await list_courses(db, **kwargs)
+
+    monkeypatch.setattr(main, "get_courses_page", slow_courses_page)
+    finished = []
+
+    async def slow_request():
+        response = await client.get("/api/courses", headers=auth_headers)
+        finished.append("slow")
+        return response
+
+    async def fast_requests():
+        await query_started.wait()
+        course_id, video_ids = course
+        responses = [
+            await client.get(f"/api/courses/{course_id}", headers=auth_headers),
+            await client.post(
+                "/api/progress", json={"video_id": video_ids[0], "quiz_score": 80, "is_completed": True},
+                headers=auth_headers
+            ),
+            await client.get("/api/progress", headers=auth_headers),
+        ]
+        finished.append("fast")
+        return responses
+
+    slow, fast = await asyncio.gather(slow_request(), fast_requests())
+
+    assert slow.status_code == 200
+    assert [response.status_code for response in fast] == [200, 200, 200]
+    assert finished == ["fast", "slow"]
+
+async def test_each_request_gets_its_own_session(app, client, auth_headers, course):
+    """Concurrent requests never share an AsyncSession, and each one is closed out when its request ends."""
+    sessions = []
+
+    async def recording_db():
+        async for session in database.get_async_db():
+            sessions.append(session)
+            yield session
+
+    app.dependency_overrides[database.get_async_db] = recording_db
+    try:
+        _, video_ids = course
+        responses = await asyncio.gather(*(
+            client.post(
+                "/api/progress", json={"video_id": video_id, "quiz_score": index, "is_completed": index % 2 == 0},
+                headers=auth_headers
+            )
+            for index, video_id in enumerate(video_ids)
+        ))
+    finally:
+        app.dependency_overrides.pop(database.get_async_db)
+
+    assert [response.status_code for response in responses] == [200] * len(video_ids)
+    assert len({id(session) for session in sessions}) == len(video_ids)
+    assert not any(session.in_transaction() for session in sessions)
+
+    # Every session committed its own write
+    progress = (await client.get("/api/progress", headers=auth_headers)).json()
+    assert sorted(row["video_id"] for row in progress) == sorted(video_ids)
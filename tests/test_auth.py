@@ -0,0 +1,78 @@
+# tests/test_auth.py
+
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from jose import JWTError
+from sqlalchemy import update
+
+import auth_utils
+from auth_utils import create_access_token, decode_access_token, principal_cache
+from conftest import TEST_PASSWORD
+from database import SessionLocal, engine
+from models import User
+
+async def login(client) -> tuple[dict, int]:
+    """Registers and logs in a fresh user. Returns (headers, user_id)."""
+    email = f"user-{uuid.uuid4().hex[:8]}@example.com"
+    (await client.post("/api/auth/register", json={"email": email, "password": TEST_PASSWORD})).raise_for_status()
+    response = await client.post("/api/auth/login", data={"username": email, "password": TEST_PASSWORD})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}, decode_access_token(token)["uid"]
+
+def test_token_is_verified_once(monkeypatch):
+    token = create_access_token({"sub": "cached@example.com", "uid": 1})
+    calls = []
+    decode = auth_utils.jwt.decode
+    monkeypatch.setattr(auth_utils.jwt, "decode", lambda *args, **kwargs: calls.append(1) or decode(*args, **kwargs))
+
+    assert decode_access_token(token) == decode_access_token(token)
+    assert len(calls) == 1
+
+def test_cached_token_expires_with_the_token():
+    token = create_access_token({"sub": "short@example.com", "uid": 1}, expires_delta=timedelta(seconds=1))
+    decode_access_token(token)
+    time.sleep(2)
+    with pytest.raises(JWTError):
+        decode_access_token(token)
+
+@pytest.mark.anyio
+async def test_core_update_deactivates_a_cached_user(client):
+    headers, user_id = await login(client)
+    assert (await client.get("/api/progress", headers=headers)).status_code == 200
+    assert principal_cache.get(user_id) is not None
+
+    with engine.begin() as conn:
+        conn.execute(update(User.__table__).where(User.__table__.c.id == user_id).values(is_active=False))
+
+    response = await client.get("/api/progress", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+@pytest.mark.anyio
+async def test_bulk_orm_update_drops_a_cached_user(client):
+    headers, user_id = await login(client)
+    assert (await client.get("/api/progress", headers=headers)).status_code == 200
+
+    with SessionLocal() as db:
+        db.execute(update(User).where(User.id == user_id).values(email=f"renamed-{user_id}@example.com"))
+        db.commit()
+    assert principal_cache.get(user_id) is None
+
+    # The token's email no longer matches the account
+    assert (await client.get("/api/progress", headers=headers)).status_code == 401
+
+@pytest.mark.anyio
+async def test_cached_principal_must_match_the_token_email(client):
+    headers, user_id = await login(client)
+    assert (await client.get("/api/progress", headers=headers)).status_code == 200
+    cached = principal_cache.get(user_id)
+
+    # A principal cached under another email is not trusted for this token
+    principal_cache.put(user_id, cached.model_copy(update={"email": "someone-else@example.com", "is_active": False}))
+
+    assert (await client.get("/api/progress", headers=headers)).status_code == 200
+    assert principal_cache.get(user_id).email == cached.email
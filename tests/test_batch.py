@@ -0,0 +1,52 @@
+# tests/test_batch.py
+
+import uuid
+
+import pytest
+
+import ai_pipeline
+from batch import create_batch, arun_batch
+from database import SessionLocal
+from models import Flashcard, Quiz, Video
+
+pytestmark = pytest.mark.anyio
+
+QUIZ = {"video_title": "Batch Video", "quiz": [{"question": "Q?", "options": ["a", "b"], "correct": 0}]}
+FLASHCARDS = {"video_title": "Batch Video", "flashcards": [{"front": "F", "back": "B"}]}
+
+async def test_video_missing_a_content_type_is_retried_on_resume(client, monkeypatch):
+    """A video saved without its flashcards fails the batch and is generated again when it resumes."""
+    youtube_ids = [uuid.uuid4().hex[:11] for _ in range(2)]
+    calls = []
+
+    async def fake_generate(youtube_id, force_refresh=False, mode=None):
+        calls.append(youtube_id)
+        # The first video's flashcard chain fails on the first run only
+        if youtube_id == youtube_ids[0] and calls.count(youtube_id) == 1:
+            return QUIZ, None
+        return QUIZ, FLASHCARDS
+
+    monkeypatch.setattr(ai_pipeline, "agenerate_all_content", fake_generate)
+    with SessionLocal() as db:
+        batch = create_batch(db, {
+            "title": "Batch Course",
+            "playlist_id": f"PL{uuid.uuid4().hex}",
+            "videos": [{"youtube_id": youtube_id, "order_index": index} for index, youtube_id in enumerate(youtube_ids)],
+        }, concurrency=2)
+        batch_id = batch.id
+
+    first = await arun_batch(batch_id)
+    assert first["status"] == "failed"
+    assert first["completed_video_ids"] == [youtube_ids[1]]
+    assert list(first["errors"]) == [youtube_ids[0]]
+
+    resumed = await arun_batch(batch_id)
+    assert resumed["status"] == "succeeded"
+    assert sorted(resumed["completed_video_ids"]) == sorted(youtube_ids)
+    assert calls.count(youtube_ids[0]) == 2
+    assert calls.count(youtube_ids[1]) == 1
+
+    with SessionLocal() as db:
+        video = db.query(Video).filter(Video.youtube_id == youtube_ids[0]).one()
+        assert db.query(Quiz).filter(Quiz.video_id == video.id).count() == 1
+        assert db.query(Flashcard).filter(Flashcard.video_id == video.id).count() == 1
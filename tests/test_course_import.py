@@ -0,0 +1,60 @@
+# tests/test_course_import.py
+
+import io
+import json
+import uuid
+
+import pytest
+
+import course_import
+from course_cache import course_cache
+from course_import import iter_json, import_manifests
+
+def manifest(title: str, course_id: int | None = None) -> dict:
+    data = {
+        "title": title,
+        "description": "Imported in a test.",
+        "playlist_id": f"PL{uuid.uuid4().hex}",
+        "videos": [
+            {"order_index": 1, "title": f"{title} 1", "youtube_id": uuid.uuid4().hex[:11], "duration_seconds": 60,
+             "quiz": [{"question": "Q?", "options": ["a", "b"], "correct": 1}]},
+        ],
+    }
+    if course_id is not None:
+        data["id"] = course_id
+    return data
+
+@pytest.mark.parametrize("chunk", [1, 7, 64 * 1024])
+def test_json_array_is_split_into_manifests(monkeypatch, chunk):
+    monkeypatch.setattr(course_import, "JSON_READ_CHUNK", chunk)
+    # Brackets, braces, commas and escaped quotes inside strings must not split a manifest
+    manifests = [manifest(f'Course {index} "quoted" [x], {{y}} \\') for index in range(3)]
+    text = "\n [\n" + ",\n  ".join(json.dumps(m, indent=1) for m in manifests) + "\n]\n"
+
+    items = list(iter_json(io.StringIO(text), "courses.json"))
+
+    assert [label for label, _ in items] == ["courses.json[0]", "courses.json[1]", "courses.json[2]"]
+    assert [json.loads(item) for _, item in items] == manifests
+
+def test_single_json_manifest_is_one_item():
+    text = json.dumps(manifest("Only"))
+    assert list(iter_json(io.StringIO(text), "course.json")) == [("course.json", text)]
+
+@pytest.mark.parametrize("text", ['[{"title": "a"}', '[{"title": "a"} {"title": "b"}]'])
+def test_malformed_json_array_is_rejected(text):
+    with pytest.raises(ValueError):
+        list(iter_json(io.StringIO(text), "bad.json"))
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_imported_courses_are_invalidated_in_the_calling_process(anyio_backend, client, workers):
+    """The pool's workers have their own caches: the parent invalidates what they imported."""
+    course_ids = [900_000 + workers * 10 + index for index in range(3)]
+    for course_id in course_ids:
+        course_cache.put(course_id, b'{"stale": true}')
+
+    items = [(str(course_id), json.dumps(manifest(f"Imported {course_id}", course_id))) for course_id in course_ids]
+    result = import_manifests(items, workers=workers)
+
+    assert result["errors"] == {}
+    assert result["courses"] == len(course_ids)
+    assert all(course_cache.get(course_id) is None for course_id in course_ids)
@@ -0,0 +1,63 @@
+# tests/test_generated_content.py
+
+import uuid
+
+import pytest
+
+from database import SessionLocal
+from generation_config import GENERATION_VERSION
+from jobs import JobQueue
+from models import GenerationJob
+from services import save_generated_content, get_generated_content, INCOMPLETE_GENERATION
+
+QUIZ = {"video_title": "Test Video", "quiz": [{"question": "Q?", "options": ["a", "b"], "correct": 0}]}
+FLASHCARDS = {"video_title": "Test Video", "flashcards": [{"front": "F", "back": "B"}]}
+
+@pytest.fixture
+def db(anyio_backend, client):
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.mark.parametrize("quiz_data, flashcard_data", [(QUIZ, None), (None, FLASHCARDS)])
+def test_partial_content_is_regenerated_on_next_submit(db, quiz_data, flashcard_data):
+    """When one content type failed, the course is saved but not stamped with GENERATION_VERSION."""
+    youtube_id = uuid.uuid4().hex[:11]
+    course = save_generated_content(db, quiz_data, flashcard_data, youtube_id, GENERATION_VERSION)
+
+    generated = get_generated_content(db, youtube_id)
+    assert generated.course_id == course.id
+    assert generated.generation_version == INCOMPLETE_GENERATION
+
+    job = JobQueue(session_factory=SessionLocal, inline=False).submit(db, youtube_id, dispatch=False)
+    assert job.status == "queued"
+
+def job_count(db, youtube_id: str) -> int:
+    return db.query(GenerationJob).filter(GenerationJob.youtube_id == youtube_id).count()
+
+def test_complete_content_is_not_regenerated(db):
+    """Requests for a generated video write nothing and return a succeeded job for its course."""
+    youtube_id = uuid.uuid4().hex[:11]
+    course = save_generated_content(db, QUIZ, FLASHCARDS, youtube_id, GENERATION_VERSION)
+
+    assert get_generated_content(db, youtube_id).generation_version == GENERATION_VERSION
+
+    queue = JobQueue(session_factory=SessionLocal, inline=False)
+    for _ in range(3):
+        job = queue.submit(db, youtube_id, dispatch=False)
+        assert job.status == "succeeded"
+        assert job.course_id == course.id
+    assert job_count(db, youtube_id) == 0
+
+def test_generated_video_returns_the_job_that_generated_it(db):
+    youtube_id = uuid.uuid4().hex[:11]
+    queue = JobQueue(session_factory=SessionLocal, inline=False)
+    job = queue.submit(db, youtube_id, dispatch=False)
+    assert queue.claim(db, job.id)
+    finished = queue.finish(job.id, QUIZ, FLASHCARDS)
+    db.expire_all()  # finish() ran in its own session
+
+    again = queue.submit(db, youtube_id, dispatch=False)
+
+    assert (again.id, again.status, again.course_id) == (job.id, "succeeded", finished.course_id)
+    assert job_count(db, youtube_id) == 1
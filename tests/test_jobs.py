@@ -0,0 +1,87 @@
+# tests/test_jobs.py
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import ai_pipeline
+from database import SessionLocal
+from jobs import JobQueue
+from leases import JOB_LEASE_SECONDS, expire_leases, owner_id
+from models import GenerationJob
+
+QUIZ = {"video_title": "Job Video", "quiz": [{"question": "Q?", "options": ["a", "b"], "correct": 0}]}
+FLASHCARDS = {"video_title": "Job Video", "flashcards": [{"front": "F", "back": "B"}]}
+
+@pytest.fixture
+def db(anyio_backend, client):
+    # anyio_backend lets a sync test start the app (client is an async fixture)
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def queue():
+    return JobQueue(session_factory=SessionLocal, inline=False)
+
+def job_state(job_id: str) -> tuple:
+    with SessionLocal() as db:
+        job = db.get(GenerationJob, job_id)
+        return job.status, job.claimed_by
+
+def take_over(job_id: str, owner: str, seconds_ago: float):
+    """Makes the job look claimed by `owner`, last renewed `seconds_ago`."""
+    heartbeat = datetime.utcnow() - timedelta(seconds=seconds_ago)
+    with SessionLocal() as db:
+        db.query(GenerationJob).filter(GenerationJob.id == job_id).update({
+            GenerationJob.status: "running",
+            GenerationJob.claimed_by: owner,
+            GenerationJob.started_at: heartbeat,
+            GenerationJob.heartbeat_at: heartbeat,
+        })
+        db.commit()
+
+def test_a_video_has_one_active_job(db, queue):
+    youtube_id = uuid.uuid4().hex[:11]
+    job = queue.submit(db, youtube_id, dispatch=False)
+    assert job.status == "queued"
+    assert queue.submit(db, youtube_id, dispatch=False).id == job.id
+
+def test_a_job_is_claimed_once(db, queue):
+    job = queue.submit(db, uuid.uuid4().hex[:11], dispatch=False)
+
+    assert queue.claim(db, job.id)
+    assert job_state(job.id) == ("running", owner_id())
+    assert not queue.claim(db, job.id)
+
+def test_only_expired_leases_are_requeued(db, queue):
+    live = queue.submit(db, uuid.uuid4().hex[:11], dispatch=False)
+    dead = queue.submit(db, uuid.uuid4().hex[:11], dispatch=False)
+    take_over(live.id, "other-host:1:alive", seconds_ago=1)
+    take_over(dead.id, "other-host:2:dead", seconds_ago=JOB_LEASE_SECONDS + 1)
+
+    assert expire_leases(db) >= 1
+
+    assert job_state(live.id) == ("running", "other-host:1:alive")
+    assert job_state(dead.id) == ("queued", None)
+
+def test_a_recovered_job_runs_to_completion(db, queue, monkeypatch):
+    youtube_id = uuid.uuid4().hex[:11]
+    monkeypatch.setattr(ai_pipeline, "generate_all_content", lambda youtube_id, force_refresh=False, mode=None: (QUIZ, FLASHCARDS))
+    job = queue.submit(db, youtube_id, dispatch=False)
+    take_over(job.id, "other-host:3:dead", seconds_ago=JOB_LEASE_SECONDS + 1)
+
+    # A worker can't take over a job that is still running
+    queue._run(job.id)
+    assert job_state(job.id)[0] == "running"
+
+    queue.recover()
+    assert job_state(job.id) == ("queued", None)
+    queue._run(job.id)
+
+    db.expire_all()
+    job = db.get(GenerationJob, job.id)
+    assert (job.status, job.claimed_by) == ("succeeded", owner_id())
+    assert job.course_id is not None
+    assert job.finished_at >= job.started_at
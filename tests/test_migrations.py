@@ -0,0 +1,39 @@
+# tests/test_migrations.py
+
+import json
+
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import migrate
+
+def test_json_migration_keeps_foreign_keys_to_rebuilt_tables(tmp_path):
+    """
+    On a database from before the migrations, create_all() adds review_states
+    (referencing flashcards) before 0001 rebuilds flashcards; the reference
+    must still name flashcards afterwards.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE courses (id INTEGER PRIMARY KEY, title VARCHAR, description TEXT, playlist_id VARCHAR, thumbnail_url VARCHAR)"))
+        conn.execute(text("CREATE TABLE videos (id INTEGER PRIMARY KEY, course_id INTEGER REFERENCES courses (id), order_index INTEGER, title VARCHAR, youtube_id VARCHAR, duration_seconds INTEGER)"))
+        conn.execute(text("CREATE TABLE quizzes (id INTEGER PRIMARY KEY, video_id INTEGER REFERENCES videos (id), question_data TEXT)"))
+        conn.execute(text("CREATE TABLE flashcards (id INTEGER PRIMARY KEY, video_id INTEGER NOT NULL REFERENCES videos (id), flashcard_data TEXT NOT NULL)"))
+        conn.execute(text("INSERT INTO courses (id, title) VALUES (1, 'Legacy')"))
+        conn.execute(text("INSERT INTO videos (id, course_id, order_index, title, youtube_id) VALUES (1, 1, 1, 'Legacy 1', 'abcdefghijk')"))
+        conn.execute(text("INSERT INTO quizzes (id, video_id, question_data) VALUES (1, 1, :data)"),
+                     {"data": json.dumps(json.dumps([{"question": "Q?", "options": ["a", "b"], "correct": 0}]))})
+        conn.execute(text("INSERT INTO flashcards (id, video_id, flashcard_data) VALUES (7, 1, :data)"),
+                     {"data": json.dumps([{"front": "F", "back": "B"}])})
+
+    migrate(engine)
+
+    schema = inspect(engine)
+    referred = {fk["referred_table"] for fk in schema.get_foreign_keys("review_states")}
+    assert referred == {"users", "flashcards"}
+    assert {fk["referred_table"] for fk in schema.get_foreign_keys("flashcards")} == {"videos"}
+    assert "ix_flashcards_video_id" in {index["name"] for index in schema.get_indexes("flashcards")}
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id, flashcard_data FROM flashcards")).one() == (7, '[{"front": "F", "back": "B"}]')
+        assert json.loads(conn.execute(text("SELECT question_data FROM quizzes")).scalar_one())[0]["question"] == "Q?"
+        assert not conn.execute(text("SELECT name FROM sqlite_master WHERE sql LIKE '%_legacy%'")).all()
+    engine.dispose()
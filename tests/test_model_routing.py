@@ -0,0 +1,136 @@
+# tests/test_model_routing.py
+
+import json
+from typing import Any
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ValidationError
+
+import ai_pipeline
+from ai_pipeline import GeneratedFlashcards, GeneratedQuiz, QUIZ_SYSTEM_PROMPT
+from benchmarks.fakes import fake_flashcards, fake_quiz
+from generation_engine import LLMProvider
+from metrics import LLM_ROUTED_GENERATIONS
+
+pytestmark = pytest.mark.anyio
+
+FLASH, PRO = ai_pipeline.MODEL_TIERS[0], ai_pipeline.MODEL_TIERS[-1]
+
+class ScriptedChatModel(BaseChatModel):
+    """Answers with a quiz that is valid, or invalid, or raises, as the provider's script says."""
+
+    model: str
+    provider: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.provider.calls.append((self.model, " ".join(str(message.content) for message in messages)))
+        script = self.provider.script.get(self.model, [])
+        outcome = script.pop(0) if script else "valid"
+        if outcome == "error":
+            raise RuntimeError("model unavailable")
+        quiz = fake_quiz()
+        if outcome == "invalid":
+            quiz[0]["options"].pop()
+        message = AIMessage(content=json.dumps({"video_title": "Test Video", "quiz": quiz}))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+class ScriptedProvider(LLMProvider):
+    name = "scripted"
+
+    def __init__(self):
+        self.script: dict[str, list[str]] = {}
+        self.calls: list[tuple[str, str]] = []
+
+    def chat_model(self, model: str) -> ScriptedChatModel:
+        return ScriptedChatModel(model=model, provider=self)
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(ai_pipeline, "REPAIR_ATTEMPTS", 1)
+    engine = ai_pipeline.get_engine()
+    previous, provider = engine.provider, ScriptedProvider()
+    engine.set_provider(provider)
+    yield provider
+    engine.set_provider(previous)
+
+async def generate_quiz() -> dict:
+    return await ai_pipeline._generate_routed("quiz", GeneratedQuiz, QUIZ_SYSTEM_PROMPT, "transcript", timeout=10)
+
+def routed(model: str, outcome: str) -> float:
+    return LLM_ROUTED_GENERATIONS.labels("quiz", model, outcome)._value.get()
+
+# --- Strict validation ---
+
+@pytest.mark.parametrize("break_quiz", [
+    lambda quiz: quiz[0]["options"].pop(),
+    lambda quiz: quiz[0].update(correct=4),
+    lambda quiz: quiz[0].update(options=["Same", "same ", "Other", "Another"]),
+    lambda quiz: quiz[0]["options"].__setitem__(2, " "),
+    lambda quiz: quiz[1].update(question=quiz[0]["question"]),
+    lambda quiz: quiz.pop(),
+])
+def test_quiz_semantic_rules_are_enforced(break_quiz):
+    quiz = fake_quiz()
+    GeneratedQuiz.model_validate({"video_title": "Video", "quiz": quiz})
+    break_quiz(quiz)
+    with pytest.raises(ValidationError):
+        GeneratedQuiz.model_validate({"video_title": "Video", "quiz": quiz})
+
+def test_flashcards_need_five_distinct_fronts():
+    cards = fake_flashcards()
+    GeneratedFlashcards.model_validate({"video_title": "Video", "flashcards": cards})
+    with pytest.raises(ValidationError):
+        GeneratedFlashcards.model_validate({"video_title": "Video", "flashcards": cards[:4]})
+    cards[1]["front"] = cards[0]["front"].upper()
+    with pytest.raises(ValidationError):
+        GeneratedFlashcards.model_validate({"video_title": "Video", "flashcards": cards})
+
+# --- Routing ---
+
+async def test_valid_answer_from_the_cheap_model_is_used(provider):
+    output = await generate_quiz()
+    assert output["generated_by"] == FLASH
+    assert [model for model, _ in provider.calls] == [FLASH]
+
+async def test_invalid_answer_is_repaired_on_the_same_model(provider):
+    provider.script = {FLASH: ["invalid"]}
+    before = routed(FLASH, "repaired")
+
+    output = await generate_quiz()
+
+    assert output["generated_by"] == FLASH
+    assert [model for model, _ in provider.calls] == [FLASH, FLASH]
+    # The repair prompt carries the validation problems
+    assert "Your previous answer is not valid" in provider.calls[1][1]
+    assert "quiz.0.options" in provider.calls[1][1]
+    assert routed(FLASH, "repaired") == before + 1
+
+async def test_escalates_to_pro_after_a_failed_repair(provider):
+    provider.script = {FLASH: ["invalid", "invalid"]}
+    before = routed(PRO, "escalated")
+
+    output = await generate_quiz()
+
+    assert output["generated_by"] == PRO
+    assert [model for model, _ in provider.calls] == [FLASH, FLASH, PRO]
+    assert "Your previous answer is not valid" not in provider.calls[2][1]
+    assert routed(PRO, "escalated") == before + 1
+
+async def test_model_error_escalates_without_a_repair(provider):
+    provider.script = {FLASH: ["error"]}
+    output = await generate_quiz()
+    assert output["generated_by"] == PRO
+    assert [model for model, _ in provider.calls] == [FLASH, PRO]
+
+async def test_no_valid_answer_on_any_tier_fails(provider):
+    provider.script = {FLASH: ["invalid", "invalid"], PRO: ["invalid", "invalid"]}
+    with pytest.raises(RuntimeError, match="no valid output"):
+        await generate_quiz()
+    assert len(provider.calls) == 4
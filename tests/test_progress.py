@@ -0,0 +1,35 @@
+# tests/test_progress.py
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def course_summary(client, auth_headers, course_id):
+    response = await client.get(f"/api/progress/courses/{course_id}", headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+async def test_course_summary_follows_every_kind_of_progress_change(client, auth_headers, course):
+    """The incrementally maintained summary always equals an aggregate over the user's progress rows."""
+    course_id, video_ids = course
+    writes = [
+        # New rows, one of them sent twice in the batch (the last item wins)
+        [(video_ids[0], 80, True), (video_ids[1], 40, False), (video_ids[2], 10, True), (video_ids[2], 90, True)],
+        # Rescoring, un-completing and completing existing rows, plus a new one
+        [(video_ids[0], 60, True), (video_ids[1], 40, True), (video_ids[2], 90, False), (video_ids[3], 0, False)],
+        # Resubmitting unchanged progress changes nothing but the activity time
+        [(video_ids[0], 60, True)],
+    ]
+    for batch in writes:
+        response = await client.post("/api/progress/batch", headers=auth_headers, json=[
+            {"video_id": video_id, "quiz_score": score, "is_completed": completed} for video_id, score, completed in batch
+        ])
+        assert response.status_code == 200
+
+        rows = (await client.get("/api/progress", headers=auth_headers)).json()
+        summary = await course_summary(client, auth_headers, course_id)
+        assert summary["completed_count"] == sum(row["is_completed"] for row in rows)
+        assert summary["average_score"] == pytest.approx(sum(row["quiz_score"] for row in rows) / len(rows))
+        assert summary["total_videos"] == len(video_ids)
+
+    assert (summary["completed_count"], summary["average_score"]) == (2, 47.5)
@@ -0,0 +1,82 @@
+# tests/test_progress_upsert.py
+
+import anyio
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import UserProgress
+
+pytestmark = pytest.mark.anyio
+
+def progress_rows(video_ids: list[int]) -> list[tuple]:
+    with SessionLocal() as db:
+        return db.execute(
+            select(UserProgress.user_id, UserProgress.video_id, UserProgress.quiz_score, UserProgress.is_completed)
+            .where(UserProgress.video_id.in_(video_ids))
+            .order_by(UserProgress.video_id)
+        ).all()
+
+async def test_replaying_a_batch_changes_nothing(client, auth_headers, course):
+    """Sending the same batch twice leaves one row per video with the same values."""
+    _, video_ids = course
+    batch = [{"video_id": video_id, "quiz_score": 10 * index, "is_completed": index % 2 == 0}
+             for index, video_id in enumerate(video_ids)]
+
+    first = await client.post("/api/progress/batch", headers=auth_headers, json=batch)
+    assert first.status_code == 200
+    rows = progress_rows(video_ids)
+    second = await client.post("/api/progress/batch", headers=auth_headers, json=batch)
+    assert second.status_code == 200
+
+    assert second.json() == first.json()
+    assert progress_rows(video_ids) == rows
+    assert [(video_id, score, completed) for _, video_id, score, completed in rows] == [
+        (item["video_id"], item["quiz_score"], item["is_completed"]) for item in batch
+    ]
+
+async def test_first_completion_time_is_kept(client, auth_headers, course):
+    _, video_ids = course
+    item = {"video_id": video_ids[0], "quiz_score": 50, "is_completed": True}
+    await client.post("/api/progress", headers=auth_headers, json=item)
+    with SessionLocal() as db:
+        completed_at = db.scalar(select(UserProgress.completed_at).where(UserProgress.video_id == video_ids[0]))
+    assert completed_at is not None
+
+    await client.post("/api/progress", headers=auth_headers, json={**item, "quiz_score": 90})
+    with SessionLocal() as db:
+        assert db.scalar(select(UserProgress.completed_at).where(UserProgress.video_id == video_ids[0])) == completed_at
+
+async def test_concurrent_submissions_for_one_video_leave_one_row(client, auth_headers, course):
+    """Racing single and batch submissions for the same video never duplicate its row."""
+    _, video_ids = course
+    responses = []
+
+    async def submit(score: int):
+        if score % 2:
+            response = await client.post("/api/progress", headers=auth_headers,
+                                         json={"video_id": video_ids[0], "quiz_score": score, "is_completed": False})
+        else:
+            response = await client.post("/api/progress/batch", headers=auth_headers,
+                                         json=[{"video_id": video_ids[0], "quiz_score": score, "is_completed": False}])
+        responses.append(response)
+
+    async with anyio.create_task_group() as tg:
+        for score in range(10):
+            tg.start_soon(submit, score)
+
+    assert [response.status_code for response in responses] == [200] * 10
+    rows = progress_rows(video_ids)
+    assert len(rows) == 1
+    assert rows[0].quiz_score in range(10)
+
+def test_duplicate_rows_are_rejected(course):
+    """The (user_id, video_id) unique index backs the upsert."""
+    _, video_ids = course
+    with SessionLocal() as db:
+        db.add_all([UserProgress(user_id=1, video_id=video_ids[0]), UserProgress(user_id=1, video_id=video_ids[0])])
+        with pytest.raises(IntegrityError):
+            db.commit()
+        db.rollback()
+        assert db.scalar(select(func.count()).where(UserProgress.video_id == video_ids[0])) == 0
@@ -0,0 +1,75 @@
+# tests/test_reviews.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.fakes import fake_flashcards
+from database import SessionLocal
+from models import Flashcard
+from services import sm2_schedule, SM2_INITIAL_EASE, SM2_MIN_EASE
+
+def test_sm2_intervals_grow_with_each_correct_answer():
+    state = (0, 0, SM2_INITIAL_EASE)
+    schedule = []
+    for _ in range(4):
+        state = sm2_schedule(*state, quality=5)
+        schedule.append(state)
+
+    assert [(repetitions, interval) for repetitions, interval, _ in schedule] == [(1, 1), (2, 6), (3, 16), (4, 45)]
+    assert [ease for _, _, ease in schedule] == pytest.approx([2.6, 2.7, 2.8, 2.9])
+
+def test_sm2_forgetting_starts_the_card_over():
+    repetitions, interval, ease = sm2_schedule(3, 16, 2.5, quality=2)
+    assert (repetitions, interval) == (0, 1)
+    assert ease == pytest.approx(2.5 - 0.32)
+    # A hesitant but correct answer keeps the interval growing, at a lower ease
+    assert sm2_schedule(2, 6, 2.5, quality=3) == (3, 15, pytest.approx(2.36))
+
+def test_sm2_ease_never_drops_below_the_floor():
+    state = (0, 0, SM2_INITIAL_EASE)
+    for _ in range(10):
+        state = sm2_schedule(*state, quality=0)
+    assert state == (0, 1, SM2_MIN_EASE)
+    # Recovering from the floor still works
+    assert sm2_schedule(*state, quality=5)[2] == pytest.approx(SM2_MIN_EASE + 0.1)
+
+@pytest.fixture
+def flashcard_id(course):
+    _, video_ids = course
+    with SessionLocal() as db:
+        flashcard = Flashcard(video_id=video_ids[0], flashcard_data=fake_flashcards())
+        db.add(flashcard)
+        db.commit()
+        return flashcard.id
+
+@pytest.mark.anyio
+async def test_due_cards_come_most_overdue_first(client, auth_headers, course, flashcard_id):
+    _, video_ids = course
+    now = datetime.utcnow()
+    # Cards 0-3 forgotten on different days (due a day later), card 4 remembered just now
+    answers = [
+        {"flashcard_id": flashcard_id, "card_index": index, "quality": 0,
+         "reviewed_at": (now - timedelta(days=10 - index)).isoformat()}
+        for index in (2, 0, 3, 1)
+    ] + [{"flashcard_id": flashcard_id, "card_index": 4, "quality": 5}]
+    response = await client.post("/api/review", headers=auth_headers, json=answers)
+    assert response.status_code == 200
+
+    # Completing the video queues its cards, but keeps the schedules they already have
+    await client.post("/api/progress", headers=auth_headers,
+                      json={"video_id": video_ids[0], "quiz_score": 100, "is_completed": True})
+
+    due = (await client.get("/api/review/due", headers=auth_headers)).json()
+    assert [card["card_index"] for card in due] == [0, 1, 2, 3]
+    assert due[0]["front"] == "Synthetic term 1"
+    assert [card["next_due"] for card in due] == sorted(card["next_due"] for card in due)
+
+    first_two = (await client.get("/api/review/due", params={"limit": 2}, headers=auth_headers)).json()
+    assert [card["card_index"] for card in first_two] == [0, 1]
+
+@pytest.mark.anyio
+async def test_answers_for_unknown_cards_are_rejected(client, auth_headers, flashcard_id):
+    response = await client.post("/api/review", headers=auth_headers,
+                                 json=[{"flashcard_id": flashcard_id, "card_index": 5, "quality": 4}])
+    assert response.status_code == 404
@@ -0,0 +1,56 @@
+# tests/test_search.py
+
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from database import SessionLocal
+from models import SearchDocument
+
+pytestmark = pytest.mark.anyio
+
+async def test_best_match_ranks_first_however_many_newer_matches(client, auth_headers, course):
+    """Ranking covers the whole match set, not just the most recently indexed documents."""
+    course_id, _ = course
+    word = f"term{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        # The strongest match is indexed first, then thousands of weaker ones
+        db.execute(insert(SearchDocument), [{"kind": "course", "course_id": course_id, "title": f"{word} {word}", "body": ""}])
+        db.execute(insert(SearchDocument), [
+            {"kind": "flashcard", "course_id": course_id, "position": index, "title": f"Card {index}", "body": f"mentions {word} once"}
+            for index in range(5000)
+        ])
+        db.commit()
+
+    response = await client.get("/api/search", params={"q": word, "limit": 5}, headers=auth_headers)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["kind"] == "course"
+    assert results[0]["title"] == f"<mark>{word}</mark> <mark>{word}</mark>"
+
+async def test_pages_cover_every_match_once_in_rank_order(client, auth_headers, course):
+    """Paging through a query whose matches all tie on some scores returns each match exactly once."""
+    course_id, _ = course
+    word = f"term{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        db.execute(insert(SearchDocument), [
+            {"kind": "flashcard", "course_id": course_id, "position": index,
+             "title": f"Card {index}" + (f" {word}" if index % 7 == 0 else ""), "body": f"about {word}"}
+            for index in range(250)
+        ])
+        db.commit()
+
+    results, cursor = [], 0
+    while cursor is not None:
+        response = await client.get("/api/search", params={"q": word, "limit": 40, "cursor": cursor}, headers=auth_headers)
+        assert response.status_code == 200
+        results += response.json()
+        cursor = int(response.headers["X-Next-Cursor"]) if "X-Next-Cursor" in response.headers else None
+
+    assert sorted(result["position"] for result in results) == list(range(250))
+    scores = [result["score"] for result in results]
+    assert scores == sorted(scores, reverse=True)
+    # Title matches (every 7th card) outrank body-only ones
+    assert {result["position"] for result in results[:36]} == set(range(0, 250, 7))
@@ -0,0 +1,72 @@
+# transcript_cache.py
+
+import os
+import json
+from typing import Iterable, Optional
+
+from database import SessionLocal
+from db_cache import DBCache
+from models import Transcript
+
+# --- Configuration ---
+TRANSCRIPT_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "1000"))
+
+# get_transcript() returns this placeholder when YouTube has no transcript.
+# It is only a prompt hint for the LLM and must never be persisted.
+TRANSCRIPT_UNAVAILABLE_PREFIX = "Transcript not available"
+
+# ------------------------------------------------------------------
+# --- TRANSCRIPT STORE ---
+# ------------------------------------------------------------------
+
+class TranscriptCache(DBCache):
+    """
+    A persistent, size-bounded LRU store of fetched transcripts keyed by
+    (youtube_id, language), backed by the `transcripts` table.
+    """
+
+    model = Transcript
+    stored_at = "fetched_at"
+
+    def __init__(self, session_factory=SessionLocal, ttl_seconds: int = TRANSCRIPT_CACHE_TTL_SECONDS,
+                 max_entries: int = TRANSCRIPT_CACHE_MAX_ENTRIES):
+        super().__init__(session_factory, ttl_seconds=ttl_seconds, max_size=max_entries)
+
+    def get(self, youtube_id: str, languages: Iterable[str]) -> Optional[dict]:
+        """
+        Returns the cached transcript in the first preferred language as
+        {"text", "snippets"}, or None. snippets may be None for old rows.
+        """
+        self._ensure_table()
+        languages = list(languages)
+        db = self.session_factory()
+        try:
+            rows = db.query(Transcript).filter(
+                Transcript.youtube_id == youtube_id,
+                Transcript.language.in_(languages)
+            ).all()
+            by_language = {row.language: row for row in rows}
+            row = self._first_fresh(db, [by_language.get(language) for language in languages])
+            if row is None:
+                return None
+            return {
+                "text": row.text,
+                "snippets": json.loads(row.snippets) if row.snippets else None,
+            }
+        finally:
+            db.close()
+
+    def put(self, youtube_id: str, language: str, text: str, snippets: Optional[list] = None) -> bool:
+        """Stores a transcript. Returns False if the text was refused (e.g. the fallback message)."""
+        if not text or text.startswith(TRANSCRIPT_UNAVAILABLE_PREFIX):
+            return False
+        self._store(
+            {"youtube_id": youtube_id, "language": language},
+            {"text": text, "snippets": json.dumps(snippets) if snippets is not None else None},
+        )
+        return True
+
+
+# Shared instance used by every generation pipeline
+transcript_cache = TranscriptCache()
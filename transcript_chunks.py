@@ -0,0 +1,78 @@
+# transcript_chunks.py
+
+import math
+
+# Gemini's tokenizer isn't available offline; ~4 characters per token is a
+# close enough estimate for English transcripts to size chunks and budgets.
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a piece of text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def format_timestamp(seconds: float) -> str:
+    """Formats seconds as H:MM:SS (or M:SS under an hour)."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+# ------------------------------------------------------------------
+# --- CHUNKING ---
+# ------------------------------------------------------------------
+
+def chunk_snippets(snippets: list[dict], chunk_tokens: int, overlap_tokens: int) -> list[dict]:
+    """
+    Groups transcript snippets ({"text", "start", "duration"}) into chunks of
+    about `chunk_tokens` tokens. Each chunk repeats the trailing
+    ~`overlap_tokens` of the previous one so ideas split across a boundary
+    are seen whole at least once.
+
+    Returns [{"text", "start", "end", "tokens"}], with start/end in seconds.
+    """
+    chunks = []
+    current: list[dict] = []
+    current_tokens = 0
+
+    def close_chunk():
+        chunks.append({
+            "text": " ".join(s["text"] for s in current),
+            "start": current[0]["start"],
+            "end": current[-1]["start"] + current[-1].get("duration", 0),
+            "tokens": current_tokens,
+        })
+
+    for snippet in snippets:
+        tokens = estimate_tokens(snippet["text"]) + 1
+        if current and current_tokens + tokens > chunk_tokens:
+            close_chunk()
+            # Seed the next chunk with the tail of this one
+            overlap: list[dict] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = estimate_tokens(previous["text"]) + 1
+                if overlap_size + size > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current, current_tokens = overlap, overlap_size
+        current.append(snippet)
+        current_tokens += tokens
+
+    if current:
+        close_chunk()
+    return chunks
+
+def select_within_budget(chunks: list[dict], token_budget: int) -> list[dict]:
+    """
+    Keeps the total input under `token_budget` by sampling chunks evenly
+    across the video, so cost stays flat however long the video is.
+    """
+    total = sum(chunk["tokens"] for chunk in chunks)
+    if total <= token_budget or len(chunks) <= 1:
+        return chunks
+
+    average = total / len(chunks)
+    keep = max(1, int(token_budget // average))
+    step = len(chunks) / keep
+    return [chunks[int(i * step)] for i in range(keep)]